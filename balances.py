@@ -0,0 +1,88 @@
+import config
+from events import decode_receipt
+
+
+class BalanceTracker:
+    """Keeps exact native and token balances for one wallet from the receipts of its own transactions"""
+    def __init__(self, address, tokens=None):
+        self.address = address.lower()
+        self.wphrs = config.WPHRS_ADDRESS.lower()
+        self.router = config.SWAP_ROUTER_ADDRESS.lower()
+        tokens = tokens or [config.WPHRS_ADDRESS, config.USDC_ADDRESS]
+        self.native = None
+        self.tokens = {token.lower(): None for token in tokens}
+        self.stale = True
+
+    def seed(self, web3):
+        """Read starting balances from the chain (the only RPC calls the tracker makes)"""
+        checksum_address = web3.to_checksum_address(self.address)
+        self.native = web3.eth.get_balance(checksum_address)
+        for token in self.tokens:
+            contract = web3.eth.contract(address=web3.to_checksum_address(token), abi=config.ERC20_ABI)
+            self.tokens[token] = contract.functions.balanceOf(checksum_address).call()
+        self.stale = False
+
+    def invalidate(self):
+        """Mark balances unknown, e.g. when a transaction's receipt could not be fetched"""
+        self.stale = True
+
+    def native_balance(self):
+        return self.native
+
+    def token_balance(self, token):
+        return self.tokens.get(token.lower())
+
+    def _credit(self, token, amount):
+        if token in self.tokens and self.tokens[token] is not None:
+            self.tokens[token] += amount
+
+    def apply_receipt(self, receipt, value=0, gas_price=None):
+        """
+        Update balances from a receipt of a transaction sent by this wallet
+
+        Parameters:
+        - receipt: Transaction receipt
+        - value: Native value attached to the transaction
+        - gas_price: Gas price we paid, used when the receipt has no effectiveGasPrice
+
+        Returns:
+        - Dict of token address -> balance change seen in the receipt logs
+        """
+        changes = {}
+        sender = str(receipt.get("from", self.address)).lower()
+
+        if sender == self.address and self.native is not None:
+            effective_gas_price = receipt.get("effectiveGasPrice") or gas_price or 0
+            gas_fee = receipt.get("gasUsed", 0) * effective_gas_price
+            self.native -= gas_fee
+            if receipt.get("status") == 1:
+                self.native -= value
+
+        if receipt.get("status") != 1:
+            return changes
+
+        for event in decode_receipt(receipt, events=("Transfer", "Deposit", "Withdrawal")):
+            token = event["address"]
+            args = event["args"]
+
+            if event["event"] == "Transfer" and "value" in args:
+                if args["from"] == self.address:
+                    changes[token] = changes.get(token, 0) - args["value"]
+                if args["to"] == self.address:
+                    changes[token] = changes.get(token, 0) + args["value"]
+            elif token == self.wphrs and event["event"] == "Deposit" and args["dst"] == self.address:
+                # Wrapping our own native balance, the native side is already covered by value
+                changes[token] = changes.get(token, 0) + args["wad"]
+            elif token == self.wphrs and event["event"] == "Withdrawal" and args["src"] == self.address:
+                # Unwrapping back to native
+                changes[token] = changes.get(token, 0) - args["wad"]
+                if self.native is not None:
+                    self.native += args["wad"]
+            elif (token == self.wphrs and event["event"] == "Withdrawal" and args["src"] == self.router
+                    and sender == self.address and self.native is not None):
+                # unwrapWETH9 inside our own swap multicall, the router forwards the native amount to us
+                self.native += args["wad"]
+
+        for token, amount in changes.items():
+            self._credit(token, amount)
+        return changes
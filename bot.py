@@ -6,11 +6,28 @@ import sys
 import json
 import datetime
 from datetime import datetime
-from web3 import Web3, Account
+from web3 import Account
 from colorama import Fore, Style, init
 import shutil  # For terminal width detection
 from eth_account.messages import encode_defunct
 import config  # Import configuration
+from keystore import WalletRegistry
+from simulation import TransactionSimulator
+from calldata import PreparedCall, encode_approve, encode_exact_input_single, encode_mint, encode_multicall
+from permit import PermitSigner, self_permit_call
+from executor import Operation, TxExecutor
+from disperse import get_disperse_address, batch_send
+from recipients import RecipientStore
+from tx_errors import classify_error, retry_policy, bump_gas_price, is_already_known
+from resilience import backoff_delay, call_with_retry, is_transient_response
+from rpc_pool import send_raw_transaction
+from web3_factory import connect
+from pacing import PacingScheduler, endpoint_of, set_wallet_label, wallet_label, write_lines
+from tx_records import recorder, report_lines
+from metrics import metrics
+from read_cache import enable_read_cache
+from tokens import token_registry_for
+from confirmations import PendingTracker, TransactionReplaced
 
 init()
 
@@ -110,26 +127,28 @@ def print_banner():
 
 def log_info(message):
     timestamp = datetime.now().strftime("%H:%M:%S")
-    print(f"{Fore.BLUE}[{timestamp}] [INFO]{Style.RESET_ALL} ℹ️  {message}")
+    write_lines(f"{Fore.BLUE}[{timestamp}] {wallet_label()}[INFO]{Style.RESET_ALL} ℹ️  {message}")
 
 def log_success(message):
     timestamp = datetime.now().strftime("%H:%M:%S")
-    print(f"{Fore.GREEN}[{timestamp}] [SUCCESS]{Style.RESET_ALL} ✅ {message}")
+    write_lines(f"{Fore.GREEN}[{timestamp}] {wallet_label()}[SUCCESS]{Style.RESET_ALL} ✅ {message}")
 
 def log_error(message):
     timestamp = datetime.now().strftime("%H:%M:%S")
-    print(f"{Fore.RED}[{timestamp}] [ERROR]{Style.RESET_ALL} ❌ {message}")
+    write_lines(f"{Fore.RED}[{timestamp}] {wallet_label()}[ERROR]{Style.RESET_ALL} ❌ {message}")
 
 def log_transaction(tx_number, total_txs, tx_amount, recipient_addr, tx_hash):
     timestamp = datetime.now().strftime("%H:%M:%S")
     progress = f"[{tx_number}/{total_txs}]"
     progress_bar = create_progress_bar(tx_number, total_txs)
     
-    print(f"\n{Fore.YELLOW}[{timestamp}] {progress} {progress_bar}{Style.RESET_ALL}")
-    print(f"  {Fore.CYAN}Amount:{Style.RESET_ALL} {tx_amount} PHRS")
-    print(f"  {Fore.CYAN}To:{Style.RESET_ALL} {Fore.MAGENTA}{recipient_addr}{Style.RESET_ALL}")
-    print(f"  {Fore.CYAN}Hash:{Style.RESET_ALL} {Fore.BLUE}{tx_hash}{Style.RESET_ALL}")
-    print(f"  {Fore.CYAN}Explorer:{Style.RESET_ALL} {config.EXPLORER}{tx_hash}")
+    write_lines(
+        f"\n{Fore.YELLOW}[{timestamp}] {wallet_label()}{progress} {progress_bar}{Style.RESET_ALL}",
+        f"  {Fore.CYAN}Amount:{Style.RESET_ALL} {tx_amount} PHRS",
+        f"  {Fore.CYAN}To:{Style.RESET_ALL} {Fore.MAGENTA}{recipient_addr}{Style.RESET_ALL}",
+        f"  {Fore.CYAN}Hash:{Style.RESET_ALL} {Fore.BLUE}{tx_hash}{Style.RESET_ALL}",
+        f"  {Fore.CYAN}Explorer:{Style.RESET_ALL} {config.EXPLORER}{tx_hash}",
+    )
 
 def create_progress_bar(current, total, bar_length=20):
     progress = min(1.0, current / total)
@@ -183,48 +202,36 @@ def get_current_gas_price(web3_instance):
 def print_section_header(title):
     terminal_width = shutil.get_terminal_size().columns
     padding = max(0, (terminal_width - len(title) - 4) // 2)
-    print(f"\n{Fore.CYAN}{'═' * padding} {title} {'═' * padding}{Style.RESET_ALL}\n")
+    write_lines(f"\n{Fore.CYAN}{'═' * padding} {title} {'═' * padding}{Style.RESET_ALL}\n")
 
-def print_summary_box(stats, elapsed_time, final_balance):
+def print_summary_box(stats, elapsed_time, final_balance, title="TRANSACTION SUMMARY"):
     terminal_width = shutil.get_terminal_size().columns
     box_width = min(60, terminal_width - 4)
     
-    print(f"\n{Fore.CYAN}{'═' * box_width}{Style.RESET_ALL}")
-    print(f"{Fore.CYAN}║{Fore.YELLOW} TRANSACTION SUMMARY {' ' * (box_width - 21)}{Fore.CYAN}║{Style.RESET_ALL}")
-    print(f"{Fore.CYAN}{'═' * box_width}{Style.RESET_ALL}")
-    print(f"{Fore.CYAN}║{Style.RESET_ALL} Total transactions:     {Fore.WHITE}{stats['successful_txs'] + stats['failed_txs']}{' ' * (box_width - 29)}{Fore.CYAN}║{Style.RESET_ALL}")
-    print(f"{Fore.CYAN}║{Style.RESET_ALL} Successful transactions: {Fore.GREEN}{stats['successful_txs']}{' ' * (box_width - 29)}{Fore.CYAN}║{Style.RESET_ALL}")
-    print(f"{Fore.CYAN}║{Style.RESET_ALL} Failed transactions:     {Fore.RED}{stats['failed_txs']}{' ' * (box_width - 29)}{Fore.CYAN}║{Style.RESET_ALL}")
-    print(f"{Fore.CYAN}║{Style.RESET_ALL} Total PHRS sent:         {Fore.YELLOW}{stats['total_phrs_sent']:.6f}{' ' * (box_width - 36)}{Fore.CYAN}║{Style.RESET_ALL}")
-    print(f"{Fore.CYAN}║{Style.RESET_ALL} Time elapsed:            {elapsed_time:.2f} seconds{' ' * (box_width - 33)}{Fore.CYAN}║{Style.RESET_ALL}")
-    print(f"{Fore.CYAN}║{Style.RESET_ALL} Final balance:           {Fore.GREEN}{final_balance:.6f}{Style.RESET_ALL} PHRS{' ' * (box_width - 37)}{Fore.CYAN}║{Style.RESET_ALL}")
-    print(f"{Fore.CYAN}{'═' * box_width}{Style.RESET_ALL}")
+    # One write, so wallets finishing together do not mix their boxes
+    write_lines(
+        f"\n{Fore.CYAN}{'═' * box_width}{Style.RESET_ALL}",
+        f"{Fore.CYAN}║{Fore.YELLOW} {title} {' ' * max(0, box_width - len(title) - 2)}{Fore.CYAN}║{Style.RESET_ALL}",
+        f"{Fore.CYAN}{'═' * box_width}{Style.RESET_ALL}",
+        f"{Fore.CYAN}║{Style.RESET_ALL} Total transactions:     {Fore.WHITE}{stats['successful_txs'] + stats['failed_txs']}{' ' * (box_width - 29)}{Fore.CYAN}║{Style.RESET_ALL}",
+        f"{Fore.CYAN}║{Style.RESET_ALL} Successful transactions: {Fore.GREEN}{stats['successful_txs']}{' ' * (box_width - 29)}{Fore.CYAN}║{Style.RESET_ALL}",
+        f"{Fore.CYAN}║{Style.RESET_ALL} Failed transactions:     {Fore.RED}{stats['failed_txs']}{' ' * (box_width - 29)}{Fore.CYAN}║{Style.RESET_ALL}",
+        f"{Fore.CYAN}║{Style.RESET_ALL} Total PHRS sent:         {Fore.YELLOW}{stats['total_phrs_sent']:.6f}{' ' * (box_width - 36)}{Fore.CYAN}║{Style.RESET_ALL}",
+        f"{Fore.CYAN}║{Style.RESET_ALL} Time elapsed:            {elapsed_time:.2f} seconds{' ' * (box_width - 33)}{Fore.CYAN}║{Style.RESET_ALL}",
+        f"{Fore.CYAN}║{Style.RESET_ALL} Final balance:           {Fore.GREEN}{final_balance:.6f}{Style.RESET_ALL} PHRS{' ' * (box_width - 37)}{Fore.CYAN}║{Style.RESET_ALL}",
+        f"{Fore.CYAN}{'═' * box_width}{Style.RESET_ALL}",
+    )
 
-def load_private_keys(filename="private_key.txt"):
-    """Load all private keys from file"""
-    if not os.path.exists(filename):
-        log_error(f"File {filename} not found")
-        return []
-    
-    with open(filename, "r") as file:
-        keys = [line.strip() for line in file if line.strip()]
-    
-    if not keys:
-        log_error(f"No private keys found in {filename}")
-        return []
-    
-    return keys
-
-def display_wallets(web3, private_keys):
+def display_wallets(web3, addresses):
     """Display all available wallets with addresses and balances"""
     print(f"\n{Fore.CYAN}{'═' * 70}{Style.RESET_ALL}")
     print(f"{Fore.CYAN}║ {'#':^4} │ {'Wallet Address':^42} │ {'Balance':^15} ║{Style.RESET_ALL}")
     print(f"{Fore.CYAN}{'═' * 70}{Style.RESET_ALL}")
     
-    for idx, key in enumerate(private_keys):
+    for idx, address in enumerate(addresses):
         try:
-            account = Account.from_key(key)
-            address = account.address
+            if address is None:
+                raise ValueError("Invalid private key")
             balance_wei = web3.eth.get_balance(address)
             balance = web3.from_wei(balance_wei, 'ether')
             print(f"{Fore.CYAN}║ {idx+1:^4} │ {Fore.YELLOW}{address}{Fore.CYAN} │ {Fore.GREEN}{balance:.6f} PHRS{Fore.CYAN} ║{Style.RESET_ALL}")
@@ -389,7 +396,7 @@ def daily_check_in(address, jwt_token, proxy_manager=None):
             
         return False
 
-def swap_tokens(web3, private_key, amount_phrs):
+def swap_tokens(web3, private_key, amount_phrs, simulator=None, permit_signer=None):
     """Swap PHRS for USDC using Pharos DEX"""
     log_info(f"Preparing to swap {amount_phrs} PHRS for USDC...")
     
@@ -399,50 +406,25 @@ def swap_tokens(web3, private_key, amount_phrs):
         amount_in_wei = web3.to_wei(amount_phrs, 'ether')
         
         # Get contracts with checksummed addresses
-        token = web3.eth.contract(
-            address=web3.to_checksum_address(config.WPHRS_ADDRESS), 
-            abi=config.ERC20_ABI
-        )
         router = web3.eth.contract(
             address=web3.to_checksum_address(config.SWAP_ROUTER_ADDRESS), 
             abi=config.SWAP_ROUTER_ABI
         )
         
-        # Get current nonce
-        nonce = web3.eth.get_transaction_count(address)
+        operations = []
         
-        # First approve tokens to router with checksummed address
-        approve_tx = token.functions.approve(
-            web3.to_checksum_address(config.SWAP_ROUTER_ADDRESS), 
-            amount_in_wei
-        ).build_transaction({
-            'from': address,
-            'nonce': nonce,
-            'gas': 100000,
-            'gasPrice': web3.eth.gas_price,
-            'chainId': config.CHAIN_ID
-        })
+        # Sign a permit when the token supports it, otherwise fall back to an approve transaction
+        permit = None
+        if permit_signer is not None:
+            permit = permit_signer.sign_permit(private_key, config.WPHRS_ADDRESS, config.SWAP_ROUTER_ADDRESS, amount_in_wei)
         
-        signed_approve = web3.eth.account.sign_transaction(approve_tx, private_key=private_key)
-        
-        # Handle different web3.py versions
-        if hasattr(signed_approve, 'rawTransaction'):
-            raw_tx = signed_approve.rawTransaction
-        elif hasattr(signed_approve, 'raw_transaction'):
-            raw_tx = signed_approve.raw_transaction
-        else:
-            raise AttributeError("Could not find raw transaction data in signed transaction")
-            
-        tx_hash = web3.eth.send_raw_transaction(raw_tx)
-        log_info(f"Approval transaction sent: {web3.to_hex(tx_hash)}")
-        
-        # Wait for approval to be mined
-        receipt = web3.eth.wait_for_transaction_receipt(tx_hash)
-        if receipt.status != 1:
-            log_error("Approval transaction failed")
-            return None
-            
-        log_success("Token approval confirmed")
+        if permit is None:
+            # Approve tokens to router, sent back to back with the swap
+            operations.append(Operation(
+                "approve",
+                PreparedCall(web3, config.WPHRS_ADDRESS, encode_approve(config.SWAP_ROUTER_ADDRESS, amount_in_wei)),
+                {'gas': 100000}
+            ))
         
         # Prepare swap parameters with checksummed addresses
         swap_params = {
@@ -455,134 +437,72 @@ def swap_tokens(web3, private_key, amount_phrs):
             "sqrtPriceLimitX96": 0
         }
         
-        # Build and sign swap transaction
-        swap_tx = router.functions.exactInputSingle(
-            swap_params
-        ).build_transaction({
-            'from': address,
-            'nonce': nonce + 1,
-            'gas': 300000,
-            'gasPrice': web3.eth.gas_price,
-            'chainId': config.CHAIN_ID
-        })
-        
-        signed_swap = web3.eth.account.sign_transaction(swap_tx, private_key=private_key)
-        
-        # Handle different web3.py versions
-        if hasattr(signed_swap, 'rawTransaction'):
-            raw_swap_tx = signed_swap.rawTransaction
-        elif hasattr(signed_swap, 'raw_transaction'):
-            raw_swap_tx = signed_swap.raw_transaction
+        if permit is not None:
+            # selfPermit grants the allowance in the same transaction as the swap
+            swap_call = PreparedCall(web3, router.address, encode_multicall([
+                self_permit_call(router, permit),
+                encode_exact_input_single(swap_params)
+            ]))
         else:
-            raise AttributeError("Could not find raw transaction data in signed transaction")
-            
-        swap_tx_hash = web3.eth.send_raw_transaction(raw_swap_tx)
-        log_info(f"Swap transaction sent: {web3.to_hex(swap_tx_hash)}")
+            swap_call = PreparedCall(web3, router.address, encode_exact_input_single(swap_params))
+        
+        operations.append(Operation("swap", swap_call, {'gas': 300000}, depends_on=[op.name for op in operations]))
         
-        # Wait for swap to be mined
-        swap_receipt = web3.eth.wait_for_transaction_receipt(swap_tx_hash)
-        if swap_receipt.status != 1:
-            log_error("Swap transaction failed")
+        results = TxExecutor(web3, private_key, simulator=simulator).run(operations)
+        swap_result = results["swap"]
+        if swap_result["status"] != "success":
+            log_error(f"Swap transaction failed: {swap_result['error']}")
             return None
             
         log_success(f"Successfully swapped {amount_phrs} PHRS for USDC!")
-        return web3.to_hex(swap_tx_hash)
+        return swap_result["tx_hash"]
         
     except Exception as e:
         log_error(f"Error during token swap: {str(e)}")
         return None
 
-def add_liquidity(web3, private_key, amount_phrs):
+def add_liquidity(web3, private_key, amount_phrs, simulator=None, permit_signer=None):
     """Add liquidity to the PHRS-USDC pool"""
     log_info(f"Preparing to add liquidity with {amount_phrs} PHRS...")
     
     try:
         account = web3.eth.account.from_key(private_key)
         address = account.address
-        amount_in_wei = web3.to_wei(amount_phrs, 'ether')
+        
+        # Same whole-token amount of each side, scaled by each token's own decimals
+        tokens = token_registry_for(web3)
+        amount0_in_wei = tokens.to_base_units(config.WPHRS_ADDRESS, amount_phrs)
+        amount1_in_wei = tokens.to_base_units(config.USDC_ADDRESS, amount_phrs)
         
         # Get contracts with checksummed addresses
-        token0 = web3.eth.contract(
-            address=web3.to_checksum_address(config.WPHRS_ADDRESS), 
-            abi=config.ERC20_ABI
-        )
-        token1 = web3.eth.contract(
-            address=web3.to_checksum_address(config.USDC_ADDRESS), 
-            abi=config.ERC20_ABI
-        )
         position_manager = web3.eth.contract(
             address=web3.to_checksum_address(config.POSITION_MANAGER_ADDRESS), 
             abi=config.POSITION_MANAGER_ABI
         )
         
-        # Get current nonce
-        nonce = web3.eth.get_transaction_count(address)
+        operations = []
         
-        # First approve tokens to position manager with checksummed address
-        approve_tx0 = token0.functions.approve(
-            web3.to_checksum_address(config.POSITION_MANAGER_ADDRESS), 
-            amount_in_wei
-        ).build_transaction({
-            'from': address,
-            'nonce': nonce,
-            'gas': 100000,
-            'gasPrice': web3.eth.gas_price,
-            'chainId': config.CHAIN_ID
-        })
+        # Permits replace the approve transactions for tokens that support EIP-2612
+        permit0 = None
+        permit1 = None
+        if permit_signer is not None:
+            permit0 = permit_signer.sign_permit(private_key, config.WPHRS_ADDRESS, config.POSITION_MANAGER_ADDRESS, amount0_in_wei)
+            permit1 = permit_signer.sign_permit(private_key, config.USDC_ADDRESS, config.POSITION_MANAGER_ADDRESS, amount1_in_wei)
         
-        signed_approve0 = web3.eth.account.sign_transaction(approve_tx0, private_key=private_key)
+        # Approvals are queued rather than awaited, the whole flow lands in one block
+        if permit0 is None:
+            operations.append(Operation(
+                "approve_token0",
+                PreparedCall(web3, config.WPHRS_ADDRESS, encode_approve(config.POSITION_MANAGER_ADDRESS, amount0_in_wei)),
+                {'gas': 100000}
+            ))
         
-        # Handle different web3.py versions
-        if hasattr(signed_approve0, 'rawTransaction'):
-            raw_tx0 = signed_approve0.rawTransaction
-        elif hasattr(signed_approve0, 'raw_transaction'):
-            raw_tx0 = signed_approve0.raw_transaction
-        else:
-            raise AttributeError("Could not find raw transaction data in signed transaction")
-            
-        tx_hash0 = web3.eth.send_raw_transaction(raw_tx0)
-        log_info(f"Token0 approval transaction sent: {web3.to_hex(tx_hash0)}")
-        
-        # Wait for approval to be mined
-        receipt0 = web3.eth.wait_for_transaction_receipt(tx_hash0)
-        if receipt0.status != 1:
-            log_error("Token0 approval transaction failed")
-            return None
-            
-        log_success("Token0 approval confirmed")
-        
-        # Approve token1 with checksummed address
-        approve_tx1 = token1.functions.approve(
-            web3.to_checksum_address(config.POSITION_MANAGER_ADDRESS), 
-            amount_in_wei  # Use same amount for simplicity
-        ).build_transaction({
-            'from': address,
-            'nonce': nonce + 1,
-            'gas': 100000,
-            'gasPrice': web3.eth.gas_price,
-            'chainId': config.CHAIN_ID
-        })
-        
-        signed_approve1 = web3.eth.account.sign_transaction(approve_tx1, private_key=private_key)
-        
-        # Handle different web3.py versions
-        if hasattr(signed_approve1, 'rawTransaction'):
-            raw_tx1 = signed_approve1.rawTransaction
-        elif hasattr(signed_approve1, 'raw_transaction'):
-            raw_tx1 = signed_approve1.raw_transaction
-        else:
-            raise AttributeError("Could not find raw transaction data in signed transaction")
-            
-        tx_hash1 = web3.eth.send_raw_transaction(raw_tx1)
-        log_info(f"Token1 approval transaction sent: {web3.to_hex(tx_hash1)}")
-        
-        # Wait for approval to be mined
-        receipt1 = web3.eth.wait_for_transaction_receipt(tx_hash1)
-        if receipt1.status != 1:
-            log_error("Token1 approval transaction failed")
-            return None
-            
-        log_success("Token1 approval confirmed")
+        if permit1 is None:
+            operations.append(Operation(
+                "approve_token1",
+                PreparedCall(web3, config.USDC_ADDRESS, encode_approve(config.POSITION_MANAGER_ADDRESS, amount1_in_wei)),
+                {'gas': 100000}
+            ))
         
         # Prepare liquidity parameters with checksummed addresses
         current_timestamp = int(time.time())
@@ -594,55 +514,80 @@ def add_liquidity(web3, private_key, amount_phrs):
             "fee": 3000,  # 0.3% fee tier
             "tickLower": -60000,  # Wide range
             "tickUpper": 60000,   # Wide range
-            "amount0Desired": amount_in_wei,
-            "amount1Desired": amount_in_wei,  # Using same amount for both tokens
+            "amount0Desired": amount0_in_wei,
+            "amount1Desired": amount1_in_wei,
             "amount0Min": 0,
             "amount1Min": 0,
             "recipient": address,
             "deadline": deadline
         }
         
-        # Build and sign mint transaction
-        mint_tx = position_manager.functions.mint(
-            mint_params
-        ).build_transaction({
-            'from': address,
-            'nonce': nonce + 2,
-            'gas': 500000,
-            'gasPrice': web3.eth.gas_price,
-            'chainId': config.CHAIN_ID
-        })
-        
-        signed_mint = web3.eth.account.sign_transaction(mint_tx, private_key=private_key)
-        
-        # Handle different web3.py versions
-        if hasattr(signed_mint, 'rawTransaction'):
-            raw_mint_tx = signed_mint.rawTransaction
-        elif hasattr(signed_mint, 'raw_transaction'):
-            raw_mint_tx = signed_mint.raw_transaction
+        # selfPermit calls go ahead of the mint in one multicall
+        permit_calls = [self_permit_call(position_manager, permit) for permit in (permit0, permit1) if permit is not None]
+        if permit_calls:
+            mint_call = PreparedCall(web3, position_manager.address, encode_multicall(permit_calls + [encode_mint(mint_params)]))
         else:
-            raise AttributeError("Could not find raw transaction data in signed transaction")
-            
-        mint_tx_hash = web3.eth.send_raw_transaction(raw_mint_tx)
-        log_info(f"Liquidity addition transaction sent: {web3.to_hex(mint_tx_hash)}")
+            mint_call = PreparedCall(web3, position_manager.address, encode_mint(mint_params))
+        
+        operations.append(Operation("mint", mint_call, {'gas': 500000}, depends_on=[op.name for op in operations]))
         
-        # Wait for transaction to be mined
-        mint_receipt = web3.eth.wait_for_transaction_receipt(mint_tx_hash)
-        if mint_receipt.status != 1:
-            log_error("Liquidity addition transaction failed")
+        results = TxExecutor(web3, private_key, simulator=simulator).run(operations)
+        mint_result = results["mint"]
+        if mint_result["status"] != "success":
+            log_error(f"Liquidity addition transaction failed: {mint_result['error']}")
             return None
             
         log_success(f"Successfully added liquidity with {amount_phrs} PHRS!")
-        return web3.to_hex(mint_tx_hash)
+        return mint_result["tx_hash"]
         
     except Exception as e:
         log_error(f"Error during liquidity addition: {str(e)}")
         return None
 
-def process_wallet(web3, private_key, valid_recipients, tx_config, wallet_index, total_wallets, proxy_manager=None):
-    """Process a single wallet with the given configuration"""
+def send_batch_transfers(web3, private_key, valid_recipients, tx_config, tx_stats):
+    """Pay num_transactions random recipients through the disperse contract, BATCH_SEND_MAX_RECIPIENTS per transaction"""
+    payments = []
+    for _ in range(tx_config["num_transactions"]):
+        recipient_address = valid_recipients.random()
+        tx_amount_phrs = round(random.uniform(tx_config["min_phrs_amount"], tx_config["max_phrs_amount"]), 6)
+        payments.append((recipient_address, web3.to_wei(tx_amount_phrs, 'ether'), tx_amount_phrs))
+    
+    try:
+        contract_address = get_disperse_address(web3, private_key)
+    except Exception as error:
+        log_error(f"Could not get disperse contract: {str(error)}")
+        tx_stats["failed_txs"] += len(payments)
+        return
+    
+    chunk_size = config.BATCH_SEND_MAX_RECIPIENTS
+    for start in range(0, len(payments), chunk_size):
+        chunk = payments[start:start + chunk_size]
+        try:
+            receipt = batch_send(
+                web3,
+                private_key,
+                [(recipient, amount_wei) for recipient, amount_wei, _ in chunk],
+                contract_address,
+                gas_price=tx_config["gas_price_wei"]
+            )
+            if receipt.status != 1:
+                raise Exception(f"Batch transaction failed with status {receipt.status}")
+            
+            log_success(f"Paid {len(chunk)} recipients in block {receipt.blockNumber}")
+            tx_stats["successful_txs"] += len(chunk)
+            tx_stats["total_phrs_sent"] += sum(amount for _, _, amount in chunk)
+        except Exception as error:
+            log_error(f"Batch send error: {str(error)}")
+            tx_stats["failed_txs"] += len(chunk)
+
+def process_wallet(web3, private_key, valid_recipients, tx_config, wallet_index, total_wallets, proxy_manager=None, scheduler=None):
+    """Process a single wallet with the given configuration, pacing its operations with scheduler"""
+    scheduler = scheduler or PacingScheduler(workers=1)
     wallet = Account.from_key(private_key)
     wallet_address = wallet.address
+    if scheduler.workers > 1:
+        # Wallets run side by side, tell their log lines apart
+        set_wallet_label(f"W{wallet_index+1} {wallet_address[:10]}")
     
     print_section_header(f"PROCESSING WALLET {wallet_index+1}/{total_wallets}: {wallet_address}")
     log_info(f"Wallet address: {Fore.GREEN}{wallet_address}{Style.RESET_ALL}")
@@ -693,32 +638,42 @@ def process_wallet(web3, private_key, valid_recipients, tx_config, wallet_index,
     gas_limit = tx_config["gas_limit"]
     task_id = tx_config["task_id"]
 
+    # Payout-style runs: one disperse call per chunk instead of one transfer per recipient.
+    # Batched payments are internal calls, so they are not submitted for task verification.
+    if tx_config.get("batch_send") and num_transactions > 0:
+        print_section_header("BATCH SEND")
+        send_batch_transfers(web3, private_key, valid_recipients, tx_config, tx_stats)
+        num_transactions = 0
+
     # Process transactions with retry mechanism
     for tx_index in range(num_transactions):
+        # At most one transfer per wait_time_seconds on average; time spent on the last one counts
+        scheduler.pace((wallet_address, "transfer"), wait_time_seconds, endpoint_of(web3))
+        record = recorder.start("transfer", f"transfer {tx_index + 1}/{num_transactions}", wallet_address)
+        recorder.activate(record)
+        
         # Add retry mechanism
         max_retries = 3  # Maximum number of retry attempts
         retry_count = 0
+        retry_delay = 0
         success = False
+        broadcast = False
+
+        # Fixed across retries, so a resend after a network error is the same transaction
+        recipient_address = valid_recipients.random()
+        tx_amount_phrs = round(random.uniform(min_phrs_amount, max_phrs_amount), 6)
+        tx_amount_wei = web3.to_wei(tx_amount_phrs, 'ether')
         
         while not success and retry_count < max_retries:
             try:
                 if retry_count > 0:
                     log_info(f"Retrying transaction {tx_index+1}/{num_transactions} (Attempt {retry_count+1}/{max_retries})")
-                    # Add exponential backoff for retries
-                    backoff_time = retry_count * 5
-                    log_info(f"Waiting {backoff_time} seconds before retry...")
-                    time.sleep(backoff_time)
+                    if retry_delay:
+                        log_info(f"Waiting {retry_delay} seconds before retry...")
+                        time.sleep(retry_delay)
                 
-                recipient_address = random.choice(valid_recipients)
-                tx_amount_phrs = round(random.uniform(min_phrs_amount, max_phrs_amount), 6)
-                tx_amount_wei = web3.to_wei(tx_amount_phrs, 'ether')
                 log_info(f"Preparing transaction to {recipient_address} with {tx_amount_phrs} PHRS")
                 
-                # Get fresh nonce for retry attempts
-                if retry_count > 0:
-                    current_nonce = web3.eth.get_transaction_count(wallet_address)
-                    log_info(f"Updated nonce to: {current_nonce + tx_index}")
-                
                 transaction = {
                     'to': recipient_address,
                     'value': tx_amount_wei,
@@ -728,6 +683,7 @@ def process_wallet(web3, private_key, valid_recipients, tx_config, wallet_index,
                     'chainId': config.CHAIN_ID,
                 }
                 signed_transaction = web3.eth.account.sign_transaction(transaction, private_key=private_key)
+                record.mark("signed")
                 log_info("Transaction signed successfully")
                 
                 # Fix for different web3.py versions (handle both attribute names)
@@ -739,78 +695,113 @@ def process_wallet(web3, private_key, valid_recipients, tx_config, wallet_index,
                 else:
                     raise AttributeError("Could not find raw transaction data in signed transaction object")
                     
-                tx_hash = web3.eth.send_raw_transaction(raw_tx)
+                try:
+                    tx_hash = send_raw_transaction(web3, raw_tx)
+                except Exception as send_error:
+                    if not is_already_known(classify_error(send_error)):
+                        raise
+                    # The identical transaction from an earlier attempt is already in the pool
+                    tx_hash = signed_transaction.hash
+                broadcast = True
                 tx_hash_hex = web3.to_hex(tx_hash)
+                record.sent(tx_hash_hex, transaction['nonce'], endpoint_of(web3))
                 log_transaction(tx_index+1, num_transactions, tx_amount_phrs, recipient_address, tx_hash_hex)
                 
-                # Wait for transaction confirmation with timeout and retry
+                # Wait for transaction confirmation with timeout and retry; an evicted
+                # transaction is re-sent by the tracker instead of waiting out the timeout
+                pending_tracker = PendingTracker(web3)
+                pending_tracker.track(tx_hash, raw_tx, wallet_address, transaction['nonce'])
                 receipt = None
                 receipt_retries = 2
                 for receipt_attempt in range(receipt_retries):
                     try:
-                        receipt = web3.eth.wait_for_transaction_receipt(tx_hash, timeout=120)
+                        receipt = pending_tracker.wait_for_receipt(tx_hash, timeout=120)
                         break
+                    except TransactionReplaced:
+                        # Waiting longer cannot help, the retry below resyncs the nonce
+                        raise
                     except Exception as receipt_error:
                         if receipt_attempt < receipt_retries - 1:
                             log_error(f"Error waiting for receipt: {str(receipt_error)}. Retrying...")
-                            time.sleep(10)
+                            time.sleep(backoff_delay(receipt_attempt, base=5))
                         else:
                             raise
                 
+                included_at, confirmed_at = pending_tracker.receipt_times(tx_hash, receipt)
+                record.apply_receipt(receipt, included_at, confirmed_at, gas_price_wei)
                 if receipt.status != 1:
-                    raise Exception(f"Transaction failed with status {receipt.status}")
+                    raise Exception(f"Transaction execution reverted with status {receipt.status}")
                     
                 log_success(f"Transaction confirmed in block {receipt.blockNumber}")
                 
-                # Use proxy for verification if available
-                proxies = None
-                if proxy_manager and proxy_manager.has_proxies():
-                    proxies = proxy_manager.format_for_requests()
-                    
                 verification_url = (
                     f"https://api.pharosnetwork.xyz/task/verify?"
                     f"address={wallet_address}&task_id={task_id}&tx_hash={tx_hash_hex}"
                 )
-                verify_retries = 2
-                for verify_attempt in range(verify_retries):
-                    try:
-                        response = requests.post(verification_url, headers=api_headers, proxies=proxies, timeout=30)
-                        if response.ok:
-                            response_json = response.json()
-                            log_success(f"Verification successful: {response_json}")
-                            tx_stats["successful_txs"] += 1
-                            tx_stats["total_phrs_sent"] += tx_amount_phrs
-                            success = True
-                            break
-                        else:
-                            log_error(f"Verification failed: {response.status_code} | {response.text}")
-                            if verify_attempt < verify_retries - 1:
-                                log_info(f"Retrying verification...")
-                                time.sleep(5)
-                            else:
-                                tx_stats["failed_txs"] += 1
-                                
-                        # Rotate proxy on verification failure
-                        if proxy_manager and proxy_manager.has_proxies():
-                            proxy_manager.rotate_proxy(force=True)
-                    except Exception as verify_error:
-                        log_error(f"Verification error: {str(verify_error)}")
-                        if verify_attempt < verify_retries - 1:
-                            log_info(f"Retrying verification...")
-                            time.sleep(5)
-                        else:
-                            tx_stats["failed_txs"] += 1
+
+                def verify():
+                    # Use proxy for verification if available
+                    proxies = None
+                    if proxy_manager and proxy_manager.has_proxies():
+                        proxies = proxy_manager.format_for_requests()
+                    return requests.post(verification_url, headers=api_headers, proxies=proxies, timeout=30)
+
+                def before_verify_retry(attempt, outcome):
+                    if isinstance(outcome, Exception):
+                        log_error(f"Verification error: {str(outcome)}")
+                    else:
+                        log_error(f"Verification failed: {outcome.status_code} | {outcome.text}")
+                    log_info(f"Retrying verification...")
+                    # Rotate proxy on verification failure
+                    if proxy_manager and proxy_manager.has_proxies():
+                        proxy_manager.rotate_proxy(force=True)
+
+                try:
+                    response = call_with_retry(
+                        config.API_HOST, verify, attempts=2,
+                        should_retry=is_transient_response, on_retry=before_verify_retry
+                    )
+                    if response.ok:
+                        response_json = response.json()
+                        log_success(f"Verification successful: {response_json}")
+                        tx_stats["successful_txs"] += 1
+                        tx_stats["total_phrs_sent"] += tx_amount_phrs
+                        success = True
+                    else:
+                        log_error(f"Verification failed: {response.status_code} | {response.text}")
+                        tx_stats["failed_txs"] += 1
+                except Exception as verify_error:
+                    log_error(f"Verification error: {str(verify_error)}")
+                    tx_stats["failed_txs"] += 1
                 
                 # Mark as success if we got this far
                 if not success:
                     success = True
                     
             except Exception as error:
-                log_error(f"Transaction error: {str(error)}")
+                failure = classify_error(error)
+                policy = retry_policy(failure["kind"])
+                log_error(f"Transaction error ({failure['kind']}): {failure['message']}")
                 retry_count += 1
+                record.retries = retry_count
+                # Network errors back off with jitter, the other classes retry at their policy delay
+                retry_delay = backoff_delay(retry_count - 1) if policy["action"] == "retry" else policy["delay"]
+                if policy["action"] == "abort":
+                    # Fails the same way on every attempt
+                    retry_count = max_retries
+                elif policy["action"] == "resync_nonce":
+                    current_nonce = web3.eth.get_transaction_count(wallet_address, 'pending') - tx_index
+                    log_info(f"Updated nonce to: {current_nonce + tx_index}")
+                elif policy["action"] == "bump_fee":
+                    gas_price_wei = bump_gas_price(gas_price_wei)
+                    log_info(f"Raised gas price to {web3.from_wei(gas_price_wei, 'gwei')} gwei")
                 if retry_count >= max_retries:
-                    log_error(f"Failed to complete transaction after {max_retries} attempts")
+                    log_error(f"Failed to complete transaction after {retry_count} attempt(s)")
                     tx_stats["failed_txs"] += 1
+                    record.fail(failure["message"])
+                    if not broadcast:
+                        # The nonce was never used, the next transaction takes it
+                        current_nonce -= 1
                 # Rotate proxy on error if available
                 if proxy_manager and proxy_manager.has_proxies():
                     proxy_manager.rotate_proxy(force=True)
@@ -819,26 +810,24 @@ def process_wallet(web3, private_key, valid_recipients, tx_config, wallet_index,
                 break
         
         if tx_index < num_transactions - 1:
-            remaining = num_transactions - (tx_index + 1)
-            log_info(f"Waiting {wait_time_seconds} seconds before next transaction. Remaining: {remaining}")
-            time.sleep(wait_time_seconds)
+            log_info(f"Remaining transactions: {num_transactions - (tx_index + 1)}")
+    recorder.activate()
 
     # Perform token swaps if enabled
     perform_swaps = tx_config["perform_swaps"]
     num_swaps = tx_config["num_swaps"]
+    simulator = TransactionSimulator(web3) if config.SIMULATE_TRANSACTIONS else None
+    permit_signer = PermitSigner(web3) if config.USE_PERMIT else None
     
     if perform_swaps and num_swaps > 0:
         print_section_header("TOKEN SWAPS")
         for swap_index in range(num_swaps):
+            scheduler.pace((wallet_address, "swap"), wait_time_seconds // 2, endpoint_of(web3))
             swap_amount = round(random.uniform(min_phrs_amount, max_phrs_amount), 6)
             log_info(f"Swap #{swap_index + 1}/{num_swaps}: {swap_amount} PHRS to USDC")
-            swap_tx_hash = swap_tokens(web3, private_key, swap_amount)
+            swap_tx_hash = swap_tokens(web3, private_key, swap_amount, simulator, permit_signer)
             if swap_tx_hash:
                 log_success(f"Swap transaction completed: {swap_tx_hash}")
-            if swap_index < num_swaps - 1:
-                wait_time = wait_time_seconds // 2
-                log_info(f"Waiting {wait_time} seconds before next swap...")
-                time.sleep(wait_time)
                 
     # Add liquidity if enabled
     add_liquidity_pools = tx_config["add_liquidity_pools"]
@@ -847,104 +836,86 @@ def process_wallet(web3, private_key, valid_recipients, tx_config, wallet_index,
     if add_liquidity_pools and num_lp_adds > 0:
         print_section_header("LIQUIDITY PROVISION")
         for lp_index in range(num_lp_adds):
+            scheduler.pace((wallet_address, "lp"), wait_time_seconds // 2, endpoint_of(web3))
             lp_amount = round(random.uniform(min_phrs_amount * 5, max_phrs_amount * 5), 6)  # Use larger amount for LPs
             log_info(f"LP Addition #{lp_index + 1}/{num_lp_adds}: {lp_amount} PHRS")
-            lp_tx_hash = add_liquidity(web3, private_key, lp_amount)
+            lp_tx_hash = add_liquidity(web3, private_key, lp_amount, simulator, permit_signer)
             if lp_tx_hash:
                 log_success(f"Liquidity addition completed: {lp_tx_hash}")
-            if lp_index < num_lp_adds - 1:
-                wait_time = wait_time_seconds // 2
-                log_info(f"Waiting {wait_time} seconds before next LP addition...")
-                time.sleep(wait_time)
 
     elapsed_time = time.time() - start_time
     final_balance_wei = web3.eth.get_balance(wallet_address)
     final_balance_phrs = web3.from_wei(final_balance_wei, 'ether')
     
-    print_summary_box(tx_stats, elapsed_time, final_balance_phrs)
+    print_summary_box(tx_stats, elapsed_time, final_balance_phrs, f"TRANSACTION SUMMARY FOR WALLET {wallet_index+1}/{total_wallets}")
     return tx_stats
 
 def main():
     print_banner()
-    required_files = ["private_key.txt", "recipients.txt"]
+    required_files = ["recipients.txt"]
     for file_path in required_files:
         if not check_file_exists(file_path):
             sys.exit(1)
 
-    # Load all private keys
-    private_keys = load_private_keys()
-    if not private_keys:
-        log_error("No valid private keys found in private_key.txt")
+    # Wallet addresses come from encrypted keystores (or private_key.txt); keys are decrypted on use
+    wallets = WalletRegistry().load()
+    if not wallets:
+        log_error(f"No wallets found in {config.KEYSTORE_DIR}/ or private_key.txt")
         sys.exit(1)
-    log_success(f"Loaded {len(private_keys)} wallets from private_key.txt")
+    log_success(f"Loaded {len(wallets)} wallets from {config.KEYSTORE_DIR + '/' if wallets.source == 'keystore' else 'private_key.txt'}")
     
     # Load proxies if available
     proxies = load_proxies()
     proxy_manager = ProxyManager(proxies)
 
     log_info("Connecting to Pharos Testnet...")
-    rpc_endpoints = [
-        "https://testnet.dplabs-internal.com",
-        "https://pharos-testnet.rpc.caldera.xyz/http",
-        "https://pharos-testnet-rpc.stress.run",
-        "https://pharos.rpc.thirdweb.com"
-    ]
     web3 = None
     connected = False
     
     # Try connections with proxies first if available
     if proxy_manager.has_proxies():
-        for endpoint in rpc_endpoints:
+        for attempt in range(3):
             try:
                 proxy_settings = proxy_manager.format_for_web3()
-                log_info(f"Trying endpoint {endpoint} with proxy {proxy_manager.get_current_proxy()}")
+                log_info(f"Trying RPC endpoints with proxy {proxy_manager.get_current_proxy()}")
                 
-                # Create HTTP provider with proxy settings
-                provider = Web3.HTTPProvider(
-                    endpoint,
-                    request_kwargs={'proxies': proxy_settings}
-                )
-                web3 = Web3(provider)
-                
-                if web3.is_connected():
-                    connected = True
-                    log_success(f"Connected to Pharos Testnet via {endpoint} using proxy")
-                    break
-                    
-                # Try next proxy if available
-                proxy_manager.rotate_proxy(force=True)
+                # One provider over all endpoints: unhealthy ones are skipped per request
+                web3 = connect(config.RPC_ENDPOINTS, request_kwargs={'proxies': proxy_settings})
+                connected = True
+                log_success(f"Connected to Pharos Testnet via {web3.provider.endpoint_uri} using proxy")
+                break
                 
             except Exception as error:
-                log_error(f"Connection to {endpoint} with proxy failed: {str(error)}")
+                log_error(f"Connection with proxy failed: {str(error)}")
                 proxy_manager.rotate_proxy(force=True)
     
     # Fall back to direct connection if proxy connection failed
     if not connected:
-        for endpoint in rpc_endpoints:
-            try:
-                log_info(f"Trying direct connection to endpoint: {endpoint}")
-                web3 = Web3(Web3.HTTPProvider(endpoint))
-                if web3.is_connected():
-                    connected = True
-                    log_success(f"Connected to Pharos Testnet via {endpoint}")
-                    break
-            except Exception as error:
-                log_error(f"Connection to {endpoint} failed: {str(error)}")
+        try:
+            log_info("Trying direct connection to RPC endpoints")
+            web3 = connect(config.RPC_ENDPOINTS)
+            connected = True
+            log_success(f"Connected to Pharos Testnet via {web3.provider.endpoint_uri}")
+        except Exception as error:
+            log_error(f"Connection to RPC endpoints failed: {str(error)}")
     
     if not connected or web3 is None:
         log_error("Failed to connect to any Pharos Testnet RPC endpoints")
         sys.exit(1)
     
+    # Repeated reads within a block (gas price, balances, allowances, pool state) are served locally
+    enable_read_cache(web3)
+    
     # Display available wallets
-    display_wallets(web3, private_keys)
+    display_wallets(web3, wallets.addresses)
     
     # Wallet selection
     print(f"\n{Fore.YELLOW}Select wallet to use:{Style.RESET_ALL}")
-    print(f"  {Fore.CYAN}[1-{len(private_keys)}] Specific wallet{Style.RESET_ALL}")
-    print(f"  {Fore.CYAN}[0] All wallets (run sequentially){Style.RESET_ALL}")
+    print(f"  {Fore.CYAN}[1-{len(wallets)}] Specific wallet{Style.RESET_ALL}")
+    print(f"  {Fore.CYAN}[0] All wallets (run side by side){Style.RESET_ALL}")
     
     wallet_choice = -1
-    while wallet_choice < 0 or wallet_choice > len(private_keys):
+    while wallet_choice < 0 or wallet_choice > len(wallets):
         try:
             wallet_choice = int(input(f"{Fore.GREEN}Enter choice: {Style.RESET_ALL}"))
         except ValueError:
@@ -953,30 +924,25 @@ def main():
     # Process single wallet or all wallets
     wallets_to_process = []
     if wallet_choice == 0:
-        log_info("Running with all wallets sequentially")
-        wallets_to_process = list(range(len(private_keys)))
+        log_info("Running with all wallets side by side")
+        wallets_to_process = list(range(len(wallets)))
     else:
         log_info(f"Running with wallet #{wallet_choice}")
         wallets_to_process = [wallet_choice - 1]
+    
+    # Decrypt only the selected wallets, all of them in parallel before the run starts
+    wallets.unlock(wallets_to_process)
 
     # Load recipients
     try:
-        with open("recipients.txt", "r") as recipients_file:
-            raw_addresses = [line.strip() for line in recipients_file if line.strip()]
-        valid_recipients = []
-        invalid_recipients = []
-        for addr in raw_addresses:
-            try:
-                checksum_addr = web3.to_checksum_address(addr)
-                valid_recipients.append(checksum_addr)
-            except ValueError:
-                invalid_recipients.append(addr)
-        if invalid_recipients:
-            log_error(f"Found {len(invalid_recipients)} invalid addresses (skipping them)")
-            for addr in invalid_recipients[:5]:
+        # Validated once into a memory-mapped cache, rebuilt only when recipients.txt changes
+        valid_recipients = RecipientStore("recipients.txt").load()
+        if valid_recipients.invalid_count:
+            log_error(f"Found {valid_recipients.invalid_count} invalid addresses (skipping them)")
+            for addr in valid_recipients.invalid_samples:
                 log_error(f"Invalid address: {addr}")
-            if len(invalid_recipients) > 5:
-                log_error(f"... and {len(invalid_recipients) - 5} more")
+            if valid_recipients.invalid_count > 5 and valid_recipients.invalid_samples:
+                log_error(f"... and {valid_recipients.invalid_count - 5} more")
         if not valid_recipients:
             log_error("No valid recipient addresses found in recipients.txt")
             sys.exit(1)
@@ -999,6 +965,7 @@ def main():
         gas_input = input(f"  {Fore.CYAN}Gas price in gwei [{network_gas_gwei:.2f}]:{Style.RESET_ALL} ")
         gas_price_wei = web3.to_wei(float(gas_input) if gas_input else network_gas_gwei, 'gwei')
         gas_limit = int(input(f"  {Fore.CYAN}Gas limit [21000]:{Style.RESET_ALL} ") or "21000")
+        batch_send_mode = input(f"  {Fore.CYAN}Send transfers in batches via disperse contract (y/n) [n]:{Style.RESET_ALL} ").lower() == 'y'
         
         # DeFi features
         perform_swaps = input(f"  {Fore.CYAN}Perform token swaps (y/n) [n]:{Style.RESET_ALL} ").lower() == 'y'
@@ -1016,6 +983,7 @@ def main():
             "wait_time_seconds": wait_time_seconds,
             "gas_price_wei": gas_price_wei,
             "gas_limit": gas_limit,
+            "batch_send": batch_send_mode,
             "perform_swaps": perform_swaps,
             "num_swaps": num_swaps,
             "add_liquidity_pools": add_liquidity_pools,
@@ -1037,20 +1005,25 @@ def main():
     
     start_time = time.time()
     
+    # Wallets run side by side (PACING_WORKERS at a time, starts spaced by WALLET_START_INTERVAL);
+    # each paces its own operations, so one wallet's waits are filled with the others' work
+    scheduler = PacingScheduler()
+    jobs = []
     for idx, wallet_idx in enumerate(wallets_to_process):
-        private_key = private_keys[wallet_idx]
-        stats = process_wallet(web3, private_key, valid_recipients, tx_config, idx, len(wallets_to_process), proxy_manager)
-        
+        private_key = wallets.private_key(wallet_idx)
+        if private_key is None:
+            log_error(f"Skipping wallet #{wallet_idx + 1}: key not available")
+            continue
+        jobs.append(lambda private_key=private_key, idx=idx: process_wallet(
+            web3, private_key, valid_recipients, tx_config, idx, len(wallets_to_process), proxy_manager, scheduler
+        ))
+    
+    for stats in scheduler.run(jobs):
         if stats:
             overall_stats["successful_wallets"] += 1
             overall_stats["successful_txs"] += stats["successful_txs"]
             overall_stats["failed_txs"] += stats["failed_txs"]
             overall_stats["total_phrs_sent"] += stats["total_phrs_sent"]
-        
-        # Wait between wallets - FIXED: time.time(10) to time.sleep(10) 
-        if idx < len(wallets_to_process) - 1:
-            log_info(f"Waiting 10 seconds before processing next wallet...")
-            time.sleep(10)  # Fixed from time.time(10)
     
     total_elapsed_time = time.time() - start_time
     
@@ -1063,6 +1036,26 @@ def main():
         print(f"{Fore.YELLOW}Total PHRS sent: {Fore.GREEN}{overall_stats['total_phrs_sent']:.6f}{Style.RESET_ALL}")
         print(f"{Fore.YELLOW}Total elapsed time: {Fore.CYAN}{total_elapsed_time:.2f} seconds{Style.RESET_ALL}")
     
+    # Endpoint health: request counts, failures, 429 pauses and where each concurrency limit settled
+    print_section_header("ENDPOINT METRICS")
+    for line in metrics.summary_lines():
+        print(f"{Fore.YELLOW}{line}{Style.RESET_ALL}")
+    try:
+        metrics.write(config.METRICS_FILE)
+        log_info(f"Metrics written to {config.METRICS_FILE}")
+    except Exception as error:
+        log_error(f"Failed to write metrics: {str(error)}")
+    
+    # Per-stage timing of every transaction; `python tx_records.py report` shows it again later
+    print_section_header("TRANSACTION TIMING")
+    for line in report_lines(recorder.rows()):
+        print(f"{Fore.YELLOW}{line}{Style.RESET_ALL}")
+    try:
+        count = recorder.write_jsonl(config.TX_RECORDS_FILE)
+        log_info(f"{count} transaction records appended to {config.TX_RECORDS_FILE}")
+    except Exception as error:
+        log_error(f"Failed to write transaction records: {str(error)}")
+    
     log_success("Script execution completed!")
 
 if __name__ == "__main__":
@@ -0,0 +1,158 @@
+from web3 import Web3
+from web3_factory import chain_id_for
+
+# Signatures of the functions sent on every run; selectors are worked out once at import
+SIGNATURES = {
+    "approve": "approve(address,uint256)",
+    "transfer": "transfer(address,uint256)",
+    "exactInputSingle": "exactInputSingle((address,address,uint24,address,uint256,uint256,uint160))",
+    "exactInput": "exactInput((bytes,address,uint256,uint256))",
+    "multicall": "multicall(bytes[])",
+    "mint": "mint((address,address,uint24,int24,int24,uint256,uint256,uint256,uint256,address,uint256))",
+    "decreaseLiquidity": "decreaseLiquidity((uint256,uint128,uint256,uint256,uint256))",
+    "collect": "collect((uint256,address,uint128,uint128))",
+}
+SELECTORS = {name: bytes(Web3.keccak(text=signature)[:4]) for name, signature in SIGNATURES.items()}
+
+
+def _uint(value, bits=256):
+    if isinstance(value, bool) or not isinstance(value, int) or not 0 <= value < 1 << bits:
+        raise ValueError(f"{value!r} is not a valid uint{bits}")
+    return value.to_bytes(32, "big")
+
+
+def _int(value, bits):
+    if isinstance(value, bool) or not isinstance(value, int) or not -(1 << (bits - 1)) <= value < 1 << (bits - 1):
+        raise ValueError(f"{value!r} is not a valid int{bits}")
+    return (value % (1 << 256)).to_bytes(32, "big")
+
+
+def _address(value):
+    raw = bytes.fromhex(value[2:] if value.startswith(("0x", "0X")) else value) if isinstance(value, str) else bytes(value)
+    if len(raw) != 20:
+        raise ValueError(f"{value!r} is not a valid address")
+    return b"\x00" * 12 + raw
+
+
+def _bytes(value):
+    if isinstance(value, str):
+        return bytes.fromhex(value[2:] if value.startswith("0x") else value)
+    return bytes(value)
+
+
+def _dynamic_bytes(data):
+    """Length word followed by the data, zero-padded to a whole word"""
+    return _uint(len(data)) + data + b"\x00" * (-len(data) % 32)
+
+
+def _hex(name, body):
+    return "0x" + (SELECTORS[name] + body).hex()
+
+
+def encode_approve(spender, amount):
+    return _hex("approve", _address(spender) + _uint(amount))
+
+
+def encode_transfer(to, amount):
+    return _hex("transfer", _address(to) + _uint(amount))
+
+
+def encode_exact_input_single(params):
+    """SwapRouter02 exactInputSingle, params as passed to the web3 contract function"""
+    return _hex("exactInputSingle", b"".join((
+        _address(params["tokenIn"]),
+        _address(params["tokenOut"]),
+        _uint(params["fee"], 24),
+        _address(params["recipient"]),
+        _uint(params["amountIn"]),
+        _uint(params["amountOutMinimum"]),
+        _uint(params["sqrtPriceLimitX96"], 160),
+    )))
+
+
+def encode_exact_input(params):
+    """SwapRouter02 exactInput; the path is the only dynamic field, so it goes after the four head words"""
+    return _hex("exactInput", b"".join((
+        _uint(32),  # offset of the tuple
+        _uint(4 * 32),  # offset of path inside the tuple
+        _address(params["recipient"]),
+        _uint(params["amountIn"]),
+        _uint(params["amountOutMinimum"]),
+        _dynamic_bytes(_bytes(params["path"])),
+    )))
+
+
+def encode_multicall(calls):
+    """multicall(bytes[]) over already encoded calls (hex strings or bytes)"""
+    items = [_dynamic_bytes(_bytes(call)) for call in calls]
+    offsets = []
+    position = 32 * len(items)
+    for item in items:
+        offsets.append(_uint(position))
+        position += len(item)
+    return _hex("multicall", _uint(32) + _uint(len(items)) + b"".join(offsets) + b"".join(items))
+
+
+def encode_mint(params):
+    """NonfungiblePositionManager mint"""
+    return _hex("mint", b"".join((
+        _address(params["token0"]),
+        _address(params["token1"]),
+        _uint(params["fee"], 24),
+        _int(params["tickLower"], 24),
+        _int(params["tickUpper"], 24),
+        _uint(params["amount0Desired"]),
+        _uint(params["amount1Desired"]),
+        _uint(params["amount0Min"]),
+        _uint(params["amount1Min"]),
+        _address(params["recipient"]),
+        _uint(params["deadline"]),
+    )))
+
+
+def encode_decrease_liquidity(params):
+    """NonfungiblePositionManager decreaseLiquidity"""
+    return _hex("decreaseLiquidity", b"".join((
+        _uint(params["tokenId"]),
+        _uint(params["liquidity"], 128),
+        _uint(params["amount0Min"]),
+        _uint(params["amount1Min"]),
+        _uint(params["deadline"]),
+    )))
+
+
+def encode_collect(params):
+    """NonfungiblePositionManager collect"""
+    return _hex("collect", b"".join((
+        _uint(params["tokenId"]),
+        _address(params["recipient"]),
+        _uint(params["amount0Max"], 128),
+        _uint(params["amount1Max"], 128),
+    )))
+
+
+class PreparedCall:
+    """
+    Contract call with its calldata already encoded
+
+    Stands in for a web3 ContractFunction wherever only build_transaction() is used (e.g. as
+    an Operation call), and builds the same transaction without the ABI lookup and validation.
+    """
+    def __init__(self, web3, to, data):
+        self.web3 = web3
+        self.to = Web3.to_checksum_address(to)
+        self.data = data
+
+    def build_transaction(self, transaction=None):
+        """Transaction dict with 'to' and 'data' set; missing value, gas price, chain id and gas are filled in from the node"""
+        tx = dict(transaction or {})
+        tx['to'] = self.to
+        tx['data'] = self.data
+        tx.setdefault('value', 0)
+        if 'gasPrice' not in tx and 'maxFeePerGas' not in tx:
+            tx['gasPrice'] = self.web3.eth.gas_price
+        if 'chainId' not in tx:
+            tx['chainId'] = chain_id_for(self.web3)
+        if 'gas' not in tx:
+            tx['gas'] = self.web3.eth.estimate_gas(tx)
+        return tx
@@ -5,6 +5,9 @@ RPC_URL = "https://testnet.dplabs-internal.com"
 CHAIN_ID = 688688
 EXPLORER = "https://testnet.pharosscan.xyz/tx/"
 
+# Run swaps and mints through eth_call before signing and drop the ones that would revert
+SIMULATE_TRANSACTIONS = True
+
 # Contract addresses (all properly checksummed)
 WPHRS_ADDRESS = "0x76aaada469d23216be5f7c596fa25f282ff9b364"
 USDC_ADDRESS = "0xad902cf99c2de2f1ba5ec4d642fd7e49cae9ee37"
@@ -193,9 +196,201 @@ SWAP_ROUTER_ABI = [
     ],
     "stateMutability": "payable",
     "type": "function"
+  },
+  {
+    "inputs": [],
+    "name": "refundETH",
+    "outputs": [],
+    "stateMutability": "payable",
+    "type": "function"
+  },
+  {
+    "inputs": [
+      {
+        "internalType": "uint256",
+        "name": "amountMinimum",
+        "type": "uint256"
+      },
+      {
+        "internalType": "address",
+        "name": "recipient",
+        "type": "address"
+      }
+    ],
+    "name": "unwrapWETH9",
+    "outputs": [],
+    "stateMutability": "payable",
+    "type": "function"
+  },
+  {
+    "inputs": [
+      {
+        "internalType": "address",
+        "name": "token",
+        "type": "address"
+      },
+      {
+        "internalType": "uint256",
+        "name": "value",
+        "type": "uint256"
+      },
+      {
+        "internalType": "uint256",
+        "name": "deadline",
+        "type": "uint256"
+      },
+      {
+        "internalType": "uint8",
+        "name": "v",
+        "type": "uint8"
+      },
+      {
+        "internalType": "bytes32",
+        "name": "r",
+        "type": "bytes32"
+      },
+      {
+        "internalType": "bytes32",
+        "name": "s",
+        "type": "bytes32"
+      }
+    ],
+    "name": "selfPermit",
+    "outputs": [],
+    "stateMutability": "payable",
+    "type": "function"
   }
 ]
 
 POSITION_MANAGER_ABI = [
-    {"inputs":[{"components":[{"internalType":"address","name":"token0","type":"address"},{"internalType":"address","name":"token1","type":"address"},{"internalType":"uint24","name":"fee","type":"uint24"},{"internalType":"int24","name":"tickLower","type":"int24"},{"internalType":"int24","name":"tickUpper","type":"int24"},{"internalType":"uint256","name":"amount0Desired","type":"uint256"},{"internalType":"uint256","name":"amount1Desired","type":"uint256"},{"internalType":"uint256","name":"amount0Min","type":"uint256"},{"internalType":"uint256","name":"amount1Min","type":"uint256"},{"internalType":"address","name":"recipient","type":"address"},{"internalType":"uint256","name":"deadline","type":"uint256"}],"internalType":"struct INonfungiblePositionManager.MintParams","name":"params","type":"tuple"}],"name":"mint","outputs":[{"internalType":"uint256","name":"tokenId","type":"uint256"},{"internalType":"uint128","name":"liquidity","type":"uint128"},{"internalType":"uint256","name":"amount0","type":"uint256"},{"internalType":"uint256","name":"amount1","type":"uint256"}],"stateMutability":"payable","type":"function"}
-]
\ No newline at end of file
+    {"inputs":[{"components":[{"internalType":"address","name":"token0","type":"address"},{"internalType":"address","name":"token1","type":"address"},{"internalType":"uint24","name":"fee","type":"uint24"},{"internalType":"int24","name":"tickLower","type":"int24"},{"internalType":"int24","name":"tickUpper","type":"int24"},{"internalType":"uint256","name":"amount0Desired","type":"uint256"},{"internalType":"uint256","name":"amount1Desired","type":"uint256"},{"internalType":"uint256","name":"amount0Min","type":"uint256"},{"internalType":"uint256","name":"amount1Min","type":"uint256"},{"internalType":"address","name":"recipient","type":"address"},{"internalType":"uint256","name":"deadline","type":"uint256"}],"internalType":"struct INonfungiblePositionManager.MintParams","name":"params","type":"tuple"}],"name":"mint","outputs":[{"internalType":"uint256","name":"tokenId","type":"uint256"},{"internalType":"uint128","name":"liquidity","type":"uint128"},{"internalType":"uint256","name":"amount0","type":"uint256"},{"internalType":"uint256","name":"amount1","type":"uint256"}],"stateMutability":"payable","type":"function"},
+    {"inputs":[{"internalType":"uint256","name":"tokenId","type":"uint256"}],"name":"positions","outputs":[{"internalType":"uint96","name":"nonce","type":"uint96"},{"internalType":"address","name":"operator","type":"address"},{"internalType":"address","name":"token0","type":"address"},{"internalType":"address","name":"token1","type":"address"},{"internalType":"uint24","name":"fee","type":"uint24"},{"internalType":"int24","name":"tickLower","type":"int24"},{"internalType":"int24","name":"tickUpper","type":"int24"},{"internalType":"uint128","name":"liquidity","type":"uint128"},{"internalType":"uint256","name":"feeGrowthInside0LastX128","type":"uint256"},{"internalType":"uint256","name":"feeGrowthInside1LastX128","type":"uint256"},{"internalType":"uint128","name":"tokensOwed0","type":"uint128"},{"internalType":"uint128","name":"tokensOwed1","type":"uint128"}],"stateMutability":"view","type":"function"},
+    {"inputs":[{"components":[{"internalType":"uint256","name":"tokenId","type":"uint256"},{"internalType":"uint128","name":"liquidity","type":"uint128"},{"internalType":"uint256","name":"amount0Min","type":"uint256"},{"internalType":"uint256","name":"amount1Min","type":"uint256"},{"internalType":"uint256","name":"deadline","type":"uint256"}],"internalType":"struct INonfungiblePositionManager.DecreaseLiquidityParams","name":"params","type":"tuple"}],"name":"decreaseLiquidity","outputs":[{"internalType":"uint256","name":"amount0","type":"uint256"},{"internalType":"uint256","name":"amount1","type":"uint256"}],"stateMutability":"payable","type":"function"},
+    {"inputs":[{"components":[{"internalType":"uint256","name":"tokenId","type":"uint256"},{"internalType":"address","name":"recipient","type":"address"},{"internalType":"uint128","name":"amount0Max","type":"uint128"},{"internalType":"uint128","name":"amount1Max","type":"uint128"}],"internalType":"struct INonfungiblePositionManager.CollectParams","name":"params","type":"tuple"}],"name":"collect","outputs":[{"internalType":"uint256","name":"amount0","type":"uint256"},{"internalType":"uint256","name":"amount1","type":"uint256"}],"stateMutability":"payable","type":"function"},
+    {"inputs":[{"internalType":"address","name":"owner","type":"address"}],"name":"balanceOf","outputs":[{"internalType":"uint256","name":"","type":"uint256"}],"stateMutability":"view","type":"function"},
+    {"inputs":[{"internalType":"address","name":"owner","type":"address"},{"internalType":"uint256","name":"index","type":"uint256"}],"name":"tokenOfOwnerByIndex","outputs":[{"internalType":"uint256","name":"","type":"uint256"}],"stateMutability":"view","type":"function"},
+    {"inputs":[{"internalType":"bytes[]","name":"data","type":"bytes[]"}],"name":"multicall","outputs":[{"internalType":"bytes[]","name":"results","type":"bytes[]"}],"stateMutability":"payable","type":"function"},
+    {"inputs":[{"internalType":"address","name":"token","type":"address"},{"internalType":"uint256","name":"value","type":"uint256"},{"internalType":"uint256","name":"deadline","type":"uint256"},{"internalType":"uint8","name":"v","type":"uint8"},{"internalType":"bytes32","name":"r","type":"bytes32"},{"internalType":"bytes32","name":"s","type":"bytes32"}],"name":"selfPermit","outputs":[],"stateMutability":"payable","type":"function"}
+]
+
+# EIP-2612 getters used to check permit support and read permit nonces
+ERC20_PERMIT_ABI = [
+    {"inputs":[],"name":"name","outputs":[{"internalType":"string","name":"","type":"string"}],"stateMutability":"view","type":"function"},
+    {"inputs":[],"name":"version","outputs":[{"internalType":"string","name":"","type":"string"}],"stateMutability":"view","type":"function"},
+    {"inputs":[],"name":"DOMAIN_SEPARATOR","outputs":[{"internalType":"bytes32","name":"","type":"bytes32"}],"stateMutability":"view","type":"function"},
+    {"inputs":[{"internalType":"address","name":"owner","type":"address"}],"name":"nonces","outputs":[{"internalType":"uint256","name":"","type":"uint256"}],"stateMutability":"view","type":"function"}
+]
+
+# Token metadata read once per token by tokens.TokenRegistry
+TOKEN_METADATA_ABI = [
+    {"inputs":[],"name":"decimals","outputs":[{"internalType":"uint8","name":"","type":"uint8"}],"stateMutability":"view","type":"function"},
+    {"inputs":[],"name":"symbol","outputs":[{"internalType":"string","name":"","type":"string"}],"stateMutability":"view","type":"function"}
+]
+
+FACTORY_ABI = [
+    {"inputs":[{"internalType":"address","name":"tokenA","type":"address"},{"internalType":"address","name":"tokenB","type":"address"},{"internalType":"uint24","name":"fee","type":"uint24"}],"name":"getPool","outputs":[{"internalType":"address","name":"pool","type":"address"}],"stateMutability":"view","type":"function"}
+]
+
+QUOTER_ABI = [
+    {"inputs":[{"internalType":"bytes","name":"path","type":"bytes"},{"internalType":"uint256","name":"amountIn","type":"uint256"}],"name":"quoteExactInput","outputs":[{"internalType":"uint256","name":"amountOut","type":"uint256"},{"internalType":"uint160[]","name":"sqrtPriceX96AfterList","type":"uint160[]"},{"internalType":"uint32[]","name":"initializedTicksCrossedList","type":"uint32[]"},{"internalType":"uint256","name":"gasEstimate","type":"uint256"}],"stateMutability":"nonpayable","type":"function"}
+]
+
+POOL_ABI = [
+    {"inputs":[],"name":"slot0","outputs":[{"internalType":"uint160","name":"sqrtPriceX96","type":"uint160"},{"internalType":"int24","name":"tick","type":"int24"},{"internalType":"uint16","name":"observationIndex","type":"uint16"},{"internalType":"uint16","name":"observationCardinality","type":"uint16"},{"internalType":"uint16","name":"observationCardinalityNext","type":"uint16"},{"internalType":"uint8","name":"feeProtocol","type":"uint8"},{"internalType":"bool","name":"unlocked","type":"bool"}],"stateMutability":"view","type":"function"},
+    {"inputs":[],"name":"liquidity","outputs":[{"internalType":"uint128","name":"","type":"uint128"}],"stateMutability":"view","type":"function"},
+    {"inputs":[],"name":"feeGrowthGlobal0X128","outputs":[{"internalType":"uint256","name":"","type":"uint256"}],"stateMutability":"view","type":"function"},
+    {"inputs":[],"name":"feeGrowthGlobal1X128","outputs":[{"internalType":"uint256","name":"","type":"uint256"}],"stateMutability":"view","type":"function"},
+    {"inputs":[],"name":"fee","outputs":[{"internalType":"uint24","name":"","type":"uint24"}],"stateMutability":"view","type":"function"},
+    {"inputs":[],"name":"tickSpacing","outputs":[{"internalType":"int24","name":"","type":"int24"}],"stateMutability":"view","type":"function"},
+    {"inputs":[],"name":"token0","outputs":[{"internalType":"address","name":"","type":"address"}],"stateMutability":"view","type":"function"},
+    {"inputs":[],"name":"token1","outputs":[{"internalType":"address","name":"","type":"address"}],"stateMutability":"view","type":"function"},
+    {"inputs":[{"internalType":"int16","name":"wordPosition","type":"int16"}],"name":"tickBitmap","outputs":[{"internalType":"uint256","name":"","type":"uint256"}],"stateMutability":"view","type":"function"},
+    {"inputs":[{"internalType":"int24","name":"tick","type":"int24"}],"name":"ticks","outputs":[{"internalType":"uint128","name":"liquidityGross","type":"uint128"},{"internalType":"int128","name":"liquidityNet","type":"int128"},{"internalType":"uint256","name":"feeGrowthOutside0X128","type":"uint256"},{"internalType":"uint256","name":"feeGrowthOutside1X128","type":"uint256"},{"internalType":"int56","name":"tickCumulativeOutside","type":"int56"},{"internalType":"uint160","name":"secondsPerLiquidityOutsideX128","type":"uint160"},{"internalType":"uint32","name":"secondsOutside","type":"uint32"},{"internalType":"bool","name":"initialized","type":"bool"}],"stateMutability":"view","type":"function"}
+]
+
+# Route finder settings
+ROUTE_TOKENS = [WPHRS_ADDRESS, USDC_ADDRESS, USDT_ADDRESS]
+FEE_TIERS = [100, 500, 3000, 10000]
+ROUTE_MAX_HOPS = 2
+ROUTE_CACHE_FILE = "route_cache.json"
+ROUTE_CACHE_TTL = 6 * 60 * 60  # seconds before pool graph is rediscovered
+
+# Local event indexer settings
+INDEXER_DB = "indexer.db"
+# First block scanned for wallets without a checkpoint, e.g. the position manager's deployment block.
+# None starts INDEXER_LOOKBACK_BLOCKS back from the head instead of scanning from genesis.
+INDEXER_START_BLOCK = None
+INDEXER_LOOKBACK_BLOCKS = 200000
+INDEXER_INITIAL_RANGE = 2000  # blocks per eth_getLogs request, adapted at runtime
+INDEXER_MAX_RANGE = 50000
+INDEXER_NETWORK_RETRIES = 5  # eth_getLogs retries after timeouts or connection errors, at the same range
+
+# Sign EIP-2612 permits instead of sending approve transactions where the token supports it
+USE_PERMIT = True
+PERMIT_DEADLINE = 20 * 60  # seconds a signed permit stays valid
+
+# Batch-send (disperse) contract used for payout-style transfer runs
+DISPERSE_CACHE_FILE = "disperse.json"  # deployed contract address per chain
+BATCH_SEND_MAX_RECIPIENTS = 100  # payments per batch transaction
+
+# Packed, validated copy of recipients.txt (rebuilt when the source file changes)
+RECIPIENTS_CACHE_FILE = "recipients.bin"
+
+# Encrypted wallet keystores (V3 JSON); private_key.txt is only used when this directory is empty
+KEYSTORE_DIR = "keystore"
+KEYSTORE_PASSWORD_ENV = "KEYSTORE_PASSWORD"  # read from the environment, otherwise prompted
+
+# RPC endpoints in order of preference, and resilience settings for RPC/API calls
+RPC_ENDPOINTS = [
+    "https://testnet.dplabs-internal.com",
+    "https://pharos-testnet.rpc.caldera.xyz/http",
+    "https://pharos-testnet-rpc.stress.run",
+    "https://pharos.rpc.thirdweb.com"
+]
+API_HOST = "api.pharosnetwork.xyz"
+BACKOFF_BASE = 1  # seconds, first backoff ceiling (full jitter)
+BACKOFF_CAP = 30  # seconds, largest backoff ceiling
+BREAKER_FAILURE_THRESHOLD = 3  # consecutive failures before an endpoint is skipped
+BREAKER_RESET_TIMEOUT = 30  # seconds before a skipped endpoint gets a probe request
+RETRY_BUDGET_RATIO = 0.2  # retries allowed per request, averaged over time
+
+# Adaptive (AIMD) concurrency limit per endpoint, lowered on 429/timeouts and raised on success
+LIMITER_INITIAL = 4  # in-flight requests per endpoint at start
+LIMITER_MIN = 1
+LIMITER_MAX = 32
+LIMITER_OVERLOAD_PAUSE = 1  # seconds to pause an endpoint after a 429 without Retry-After
+RETRY_AFTER_MAX = 60  # longest Retry-After honored, in seconds
+METRICS_FILE = "metrics.json"  # written at the end of a bot run
+
+# New block notifications for confirmation tracking (eth_subscribe newHeads, needs websocket-client);
+# set WS_RPC_URL to None to always poll eth_blockNumber over HTTP
+WS_RPC_URL = "wss://testnet.dplabs-internal.com"
+WS_HEAD_TIMEOUT = 30  # seconds without a new block before the subscription is reconnected
+HEAD_POLL_INTERVAL = 2  # seconds between eth_blockNumber polls while the subscription is down
+DROP_CHECK_INTERVAL = 12  # seconds between mempool checks of an unmined transaction (dropped/replaced)
+
+# Send each signed transaction to every healthy RPC endpoint at once (first acceptance wins)
+BROADCAST_FANOUT = True
+
+# Block-scoped cache for eth_call/balance/gas price reads (emptied on every new block)
+USE_READ_CACHE = True
+READ_CACHE_SIZE = 4096  # entries, least recently used are evicted first
+
+# Local V3 swap simulation (v3_sim.py): pools are read once per block and quoted in-process
+USE_LOCAL_QUOTES = True
+V3_SIM_WORDS = 2  # tick bitmap words loaded on each side of the current price (256 * tickSpacing ticks each)
+MAX_PRICE_IMPACT = 0.05  # swap legs are shrunk until their simulated price impact (fee included) is below this
+SWAP_SLIPPAGE = 0.02  # amountOutMinimum = simulated output minus this share; None keeps it at 0
+
+# Token decimals/symbols, fetched once per token and kept on disk
+TOKEN_CACHE_FILE = "tokens.json"
+
+# Run pacing (pacing.py): wallets run side by side and operations take tokens instead of fixed sleeps
+PACING_WORKERS = 4  # wallets processed at the same time
+WALLET_START_INTERVAL = 10  # seconds between wallet starts, on average
+ENDPOINT_OPS_PER_SECOND = 2  # operations started per second through one RPC endpoint, all wallets together
+ENDPOINT_OPS_BURST = 4  # operations an idle endpoint lets through at once
+SWAP_PACING_JITTER = 0.2  # swap spacing varies between 0.8x and 1.2x the configured wait
+
+# Lifecycle timing of every transaction (tx_records.py), appended at the end of each bot/swap run
+TX_RECORDS_FILE = "tx_records.jsonl"
@@ -0,0 +1,346 @@
+import json
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from datetime import datetime
+from web3.exceptions import TimeExhausted
+import config
+from resilience import backoff_delay
+from rpc_pool import send_raw_transaction
+
+# Where an unconfirmed transaction stands
+MINED = "mined"
+PENDING = "pending"
+DROPPED = "dropped"
+REPLACED = "replaced"
+
+# New heads whose arrival time is kept, for the inclusion times of transaction records
+HEAD_ARRIVALS_KEPT = 256
+
+try:
+    import websocket  # websocket-client, optional: without it heads are polled over HTTP
+except ImportError:
+    websocket = None
+
+
+def log_info(message):
+    timestamp = datetime.now().strftime("%H:%M:%S")
+    print(f"[{timestamp}] [INFO] ℹ️  {message}")
+
+def log_error(message):
+    timestamp = datetime.now().strftime("%H:%M:%S")
+    print(f"[{timestamp}] [ERROR] ❌ {message}")
+
+
+class HeadWatcher:
+    """
+    Latest block number, pushed by a WebSocket newHeads subscription
+
+    A background thread keeps the subscription open and reconnects with jittered backoff.
+    While it is down (or when no WS_RPC_URL / websocket-client is available) waiters poll
+    eth_blockNumber over HTTP instead. Listeners registered with on_new_head() are called
+    with every new block number, e.g. to drop per-block caches.
+    """
+    def __init__(self, web3, ws_url=None, poll_interval=None):
+        self.web3 = web3
+        self.ws_url = ws_url if ws_url is not None else config.WS_RPC_URL
+        self.poll_interval = poll_interval or config.HEAD_POLL_INTERVAL
+        self.block_number = None
+        self.ws_connected = False
+        self._listeners = []
+        self._arrivals = OrderedDict()  # block number -> when it was first seen
+        self._arrivals_trimmed = False
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._thread = None
+        self._ws = None
+
+    def start(self):
+        if self._thread is None and self.ws_url and websocket is not None:
+            self._thread = threading.Thread(target=self._run, name="head-watcher", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        ws = self._ws
+        if ws is not None:
+            try:
+                ws.close()
+            except Exception:
+                pass
+
+    def on_new_head(self, callback):
+        """Call callback(block_number) for every new head"""
+        self._listeners.append(callback)
+
+    def _on_head(self, number):
+        with self._cond:
+            if self.block_number is not None and number <= self.block_number:
+                return
+            self.block_number = number
+            self._arrivals[number] = time.time()
+            if len(self._arrivals) > HEAD_ARRIVALS_KEPT:
+                self._arrivals.popitem(last=False)
+                self._arrivals_trimmed = True
+            self._cond.notify_all()
+        for callback in list(self._listeners):
+            try:
+                callback(number)
+            except Exception as e:
+                log_error(f"New head listener failed: {str(e)}")
+
+    def _listen(self):
+        ws = websocket.create_connection(self.ws_url, timeout=config.WS_HEAD_TIMEOUT)
+        self._ws = ws
+        try:
+            ws.send(json.dumps({"jsonrpc": "2.0", "id": 1, "method": "eth_subscribe", "params": ["newHeads"]}))
+            reply = json.loads(ws.recv())
+            if "error" in reply:
+                raise ConnectionError(f"newHeads subscription refused: {reply['error']}")
+
+            self.ws_connected = True
+            log_info(f"Following new blocks over {self.ws_url}")
+            while not self._stop.is_set():
+                # A receive timeout means no block for WS_HEAD_TIMEOUT seconds: treat the socket as dead
+                message = json.loads(ws.recv())
+                head = (message.get("params") or {}).get("result")
+                if isinstance(head, dict) and head.get("number"):
+                    self._on_head(int(head["number"], 16))
+        finally:
+            self.ws_connected = False
+            self._ws = None
+            with self._cond:
+                # Wake waiters so they switch to polling right away
+                self._cond.notify_all()
+            try:
+                ws.close()
+            except Exception:
+                pass
+
+    def _run(self):
+        attempt = 0
+        while not self._stop.is_set():
+            connected_at = time.time()
+            try:
+                self._listen()
+            except Exception as e:
+                # Logged once per outage, not for every failed reconnect
+                if attempt == 0 and not self._stop.is_set():
+                    log_error(f"newHeads subscription lost ({str(e)}), polling over HTTP until it reconnects")
+            if time.time() - connected_at > config.WS_HEAD_TIMEOUT:
+                attempt = 0
+            self._stop.wait(backoff_delay(attempt, cap=config.BACKOFF_CAP))
+            attempt += 1
+
+    def seen_at(self, number):
+        """When a head at or above block number was first seen, None if that is not known (any more)"""
+        with self._cond:
+            for head, seen in self._arrivals.items():
+                if head >= number:
+                    # Older heads were dropped, so a later one may not be the first to include number
+                    if self._arrivals_trimmed and head == next(iter(self._arrivals)) and head > number:
+                        return None
+                    return seen
+        return None
+
+    def poll(self):
+        """Read the head over HTTP, returns the block number (None if the call failed)"""
+        try:
+            self._on_head(self.web3.eth.block_number)
+        except Exception:
+            pass
+        return self.block_number
+
+    def wait_for_block(self, after=None, timeout=None):
+        """
+        Wait for a head newer than `after`
+
+        Parameters:
+        - after: Block number already handled (None waits for any head)
+        - timeout: Seconds to wait at most
+
+        Returns:
+        - Latest known block number (not newer than `after` when the timeout passed)
+        """
+        deadline = time.time() + timeout if timeout is not None else None
+        while True:
+            with self._cond:
+                if self.block_number is not None and (after is None or self.block_number > after):
+                    return self.block_number
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    return self.block_number
+                if self.ws_connected:
+                    # The wait also wakes when the socket drops, then polling takes over
+                    self._cond.wait(timeout=remaining)
+                    continue
+
+            number = self.poll()
+            if number is not None and (after is None or number > after):
+                return number
+            sleep = self.poll_interval if remaining is None else min(self.poll_interval, remaining)
+            time.sleep(max(sleep, 0))
+
+
+_watchers = weakref.WeakKeyDictionary()
+_watchers_lock = threading.Lock()
+
+
+def head_watcher_for(web3):
+    """Shared, started HeadWatcher for a Web3 instance"""
+    with _watchers_lock:
+        watcher = _watchers.get(web3)
+        if watcher is None:
+            watcher = HeadWatcher(web3).start()
+            _watchers[web3] = watcher
+        return watcher
+
+
+class TransactionReplaced(Exception):
+    """Our nonce was taken by a different transaction, so this one can never be mined"""
+
+
+class PendingTracker:
+    """
+    Resolves receipts of sent transactions once per new block instead of on a fixed poll
+
+    Transactions registered with track() are also checked every DROP_CHECK_INTERVAL seconds
+    while unmined: one that no node knows any more is re-sent right away (same signed bytes,
+    so at worst the node answers 'already known'), and one whose nonce was used by another
+    transaction stops being waited for.
+    """
+    def __init__(self, web3, head_watcher=None):
+        self.web3 = web3
+        self.heads = head_watcher or head_watcher_for(web3)
+        self.sent = {}
+        self.outcomes = {}
+        self.mined_at = {}  # hash -> when its receipt was read
+
+    def _hex(self, tx_hash):
+        return (tx_hash if isinstance(tx_hash, str) else self.web3.to_hex(tx_hash)).lower()
+
+    def _fetch(self, tx_hash):
+        try:
+            return self.web3.eth.get_transaction_receipt(tx_hash)
+        except Exception:
+            # Not mined yet (TransactionNotFound) or a transient RPC error
+            return None
+
+    def track(self, tx_hash, raw_tx, sender, nonce):
+        """Remember a sent transaction so it can be checked for eviction and re-sent"""
+        self.sent[self._hex(tx_hash)] = {"raw": raw_tx, "from": sender, "nonce": nonce, "resent": 0}
+        self.outcomes[self._hex(tx_hash)] = PENDING
+
+    def status(self, tx_hash):
+        """
+        Where an unconfirmed transaction stands
+
+        Returns:
+        - MINED, PENDING (a node still has it), REPLACED (its nonce went to another
+          transaction) or DROPPED (no node has it and the nonce is still free)
+        """
+        if self._fetch(tx_hash) is not None:
+            return MINED
+        try:
+            if self.web3.eth.get_transaction(tx_hash) is not None:
+                return PENDING
+        except Exception:
+            # TransactionNotFound
+            pass
+
+        sent = self.sent.get(self._hex(tx_hash))
+        if sent is None:
+            return DROPPED
+        try:
+            if self.web3.eth.get_transaction_count(sent["from"], 'latest') > sent["nonce"]:
+                # The nonce is used: either ours was mined just now or something else took it
+                return MINED if self._fetch(tx_hash) is not None else REPLACED
+            if self.web3.eth.get_transaction_count(sent["from"], 'pending') > sent["nonce"]:
+                return REPLACED
+        except Exception:
+            return PENDING
+        return DROPPED
+
+    def _resend(self, tx_hash):
+        sent = self.sent[self._hex(tx_hash)]
+        sent["resent"] += 1
+        try:
+            send_raw_transaction(self.web3, sent["raw"])
+            log_info(f"Transaction {self._hex(tx_hash)} was dropped from the mempool, re-sent it")
+        except Exception as e:
+            # 'already known' means some node still had it, anything else shows up on the next check
+            log_info(f"Re-sending dropped transaction {self._hex(tx_hash)}: {str(e)}")
+
+    def _check_unmined(self, tx_hashes):
+        for tx_hash in tx_hashes:
+            if self._hex(tx_hash) not in self.sent:
+                continue
+            outcome = self.status(tx_hash)
+            self.outcomes[self._hex(tx_hash)] = outcome
+            if outcome == DROPPED:
+                self._resend(tx_hash)
+            elif outcome == REPLACED:
+                log_error(f"Transaction {self._hex(tx_hash)} was replaced by another transaction with the same nonce")
+
+    def wait_for_receipts(self, tx_hashes, timeout):
+        """
+        Wait until every hash has a receipt (or was replaced) or the timeout passes
+
+        Parameters:
+        - tx_hashes: Transaction hashes
+        - timeout: Seconds to wait at most
+
+        Returns:
+        - Dict of hash -> receipt, None for hashes still pending or replaced (see outcomes)
+        """
+        receipts = {tx_hash: None for tx_hash in tx_hashes}
+        deadline = time.time() + timeout
+        next_check = time.time() + config.DROP_CHECK_INTERVAL
+        seen = self.heads.block_number
+        while True:
+            for tx_hash in receipts:
+                if receipts[tx_hash] is None:
+                    receipts[tx_hash] = self._fetch(tx_hash)
+                    if receipts[tx_hash] is not None:
+                        self.outcomes[self._hex(tx_hash)] = MINED
+                        self.mined_at[self._hex(tx_hash)] = time.time()
+            unmined = [
+                tx_hash for tx_hash, receipt in receipts.items()
+                if receipt is None and self.outcomes.get(self._hex(tx_hash)) != REPLACED
+            ]
+            now = time.time()
+            if not unmined or now >= deadline:
+                return receipts
+
+            if now >= next_check:
+                self._check_unmined(unmined)
+                next_check = time.time() + config.DROP_CHECK_INTERVAL
+                continue
+
+            # Receipts can only appear with a new block; wake up for the next eviction check as well
+            latest = self.heads.wait_for_block(after=seen, timeout=min(deadline, next_check) - now)
+            if latest is not None:
+                seen = latest
+
+    def receipt_times(self, tx_hash, receipt):
+        """
+        (included, confirmed) Unix times of a mined transaction
+
+        confirmed is when its receipt was read, included when its block was first seen as a new
+        head (never after confirmed; the same as confirmed when the head was not seen).
+        """
+        confirmed = self.mined_at.get(self._hex(tx_hash)) or time.time()
+        seen = self.heads.seen_at(receipt.get("blockNumber") or 0)
+        return (min(seen, confirmed) if seen is not None else confirmed), confirmed
+
+    def wait_for_receipt(self, tx_hash, timeout=120):
+        """Drop-in for web3.eth.wait_for_transaction_receipt (raises TimeExhausted on timeout)"""
+        receipt = self.wait_for_receipts([tx_hash], timeout)[tx_hash]
+        if receipt is None:
+            tx_hash_hex = self._hex(tx_hash)
+            if self.outcomes.get(tx_hash_hex) == REPLACED:
+                raise TransactionReplaced(f"Transaction {tx_hash_hex} was replaced by another transaction with the same nonce")
+            raise TimeExhausted(f"Transaction {tx_hash_hex} is not in the chain after {timeout} seconds")
+        return receipt
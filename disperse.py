@@ -0,0 +1,191 @@
+import json
+import os
+from datetime import datetime
+from web3 import Account
+import config
+from confirmations import PendingTracker
+from rpc_pool import send_raw_transaction
+from pacing import endpoint_of
+from tx_records import recorder
+
+# Minimal disperse contract, hand-assembled. Calldata is a packed list of 32-byte entries,
+# each (recipient address << 96 | amount as uint96). Every entry is paid with CALL, any
+# failed payment reverts the whole batch, and msg.value minus the total is refunded to
+# the caller. There is no selector and no storage.
+#
+#   CALLDATASIZE PUSH1 0x1f AND PUSH1 fail JUMPI        ; calldata must be whole entries
+#   PUSH1 0 PUSH1 0                                     ; [offset, total]
+# loop:
+#   JUMPDEST CALLDATASIZE DUP2 LT ISZERO PUSH1 end JUMPI
+#   DUP1 CALLDATALOAD                                   ; [entry, offset, total]
+#   DUP1 PUSH1 0xa0 SHL PUSH1 0xa0 SHR                  ; amount = low 96 bits
+#   SWAP1 PUSH1 0x60 SHR                                ; recipient = high 160 bits
+#   DUP2 DUP5 ADD SWAP4 POP                             ; total += amount
+#   PUSH1 0 PUSH1 0 PUSH1 0 PUSH1 0 DUP6 DUP6 GAS CALL
+#   ISZERO PUSH1 fail JUMPI
+#   POP POP PUSH1 0x20 ADD PUSH1 loop JUMP
+# end:
+#   JUMPDEST POP CALLVALUE SUB                          ; refund = msg.value - total
+#   DUP1 ISZERO PUSH1 done JUMPI                        ; (underflow makes the refund CALL fail)
+#   PUSH1 0 PUSH1 0 PUSH1 0 PUSH1 0 DUP5 CALLER GAS CALL
+#   ISZERO PUSH1 fail JUMPI
+# done:
+#   JUMPDEST STOP
+# fail:
+#   JUMPDEST PUSH1 0 DUP1 REVERT
+DISPERSE_RUNTIME = bytes.fromhex(
+    "36601f16605857600060005b36811015603d5780358060a01b60a01c9060601c"
+    "8184019350600060006000600085855af1156058575050602001600b565b5034"
+    "038015605657600060006000600084335af1156058575b005b600080fd"
+)
+
+# Constructor: copy the runtime that follows the 12-byte init prefix and return it
+DISPERSE_INIT = bytes.fromhex("605d600c600039605d6000f3") + DISPERSE_RUNTIME
+
+MAX_AMOUNT = (1 << 96) - 1
+
+# Upper bound per payment when the node cannot estimate gas (value CALL to a fresh account)
+GAS_PER_RECIPIENT = 40000
+
+
+def log_info(message):
+    timestamp = datetime.now().strftime("%H:%M:%S")
+    print(f"[{timestamp}] [INFO] ℹ️  {message}")
+
+def log_success(message):
+    timestamp = datetime.now().strftime("%H:%M:%S")
+    print(f"[{timestamp}] [SUCCESS] ✅ {message}")
+
+def log_error(message):
+    timestamp = datetime.now().strftime("%H:%M:%S")
+    print(f"[{timestamp}] [ERROR] ❌ {message}")
+
+def encode_batch(payments):
+    """
+    Pack (recipient, amount_wei) pairs into disperse calldata
+
+    Parameters:
+    - payments: List of (address, amount in wei)
+
+    Returns:
+    - Calldata bytes, 32 bytes per payment
+    """
+    data = b""
+    for recipient, amount in payments:
+        if not 0 <= amount <= MAX_AMOUNT:
+            raise ValueError(f"Amount {amount} does not fit in 96 bits")
+        data += bytes.fromhex(recipient[2:]) + amount.to_bytes(12, "big")
+    return data
+
+def _load_cache():
+    if not os.path.exists(config.DISPERSE_CACHE_FILE):
+        return {}
+    try:
+        with open(config.DISPERSE_CACHE_FILE, "r") as f:
+            return json.load(f)
+    except Exception:
+        return {}
+
+def _save_cache(cache):
+    try:
+        with open(config.DISPERSE_CACHE_FILE, "w") as f:
+            json.dump(cache, f, indent=2)
+    except Exception as e:
+        log_error(f"Failed to save disperse cache: {str(e)}")
+
+def _send(web3, private_key, tx, record=None):
+    signed = web3.eth.account.sign_transaction(tx, private_key=private_key)
+    if record is not None:
+        record.mark("signed")
+
+    # Handle different web3.py versions
+    if hasattr(signed, 'rawTransaction'):
+        raw_tx = signed.rawTransaction
+    elif hasattr(signed, 'raw_transaction'):
+        raw_tx = signed.raw_transaction
+    else:
+        raise AttributeError("Could not find raw transaction data in signed transaction")
+
+    return send_raw_transaction(web3, raw_tx)
+
+def deploy_disperse(web3, private_key):
+    """Deploy the disperse contract (works the same against a local dev node) and return its address"""
+    address = Account.from_key(private_key).address
+    tx = {
+        'from': address,
+        'data': "0x" + DISPERSE_INIT.hex(),
+        'nonce': web3.eth.get_transaction_count(address, 'pending'),
+        'gas': 100000,
+        'gasPrice': web3.eth.gas_price,
+        'chainId': config.CHAIN_ID
+    }
+    tx_hash = _send(web3, private_key, tx)
+    log_info(f"Disperse deployment sent: {web3.to_hex(tx_hash)}")
+
+    receipt = PendingTracker(web3).wait_for_receipt(tx_hash, timeout=180)
+    if receipt.status != 1 or not receipt.contractAddress:
+        raise Exception("Disperse deployment failed")
+
+    log_success(f"Disperse contract deployed at {receipt.contractAddress}")
+    return receipt.contractAddress
+
+def get_disperse_address(web3, private_key):
+    """Disperse contract for the current chain, deployed once and remembered in DISPERSE_CACHE_FILE"""
+    cache = _load_cache()
+    chain_key = str(config.CHAIN_ID)
+    cached = cache.get(chain_key)
+
+    # Trust the cache only if the deployed code is still ours (dev chains get reset)
+    if cached and bytes(web3.eth.get_code(web3.to_checksum_address(cached))) == DISPERSE_RUNTIME:
+        return web3.to_checksum_address(cached)
+
+    contract_address = deploy_disperse(web3, private_key)
+    cache[chain_key] = contract_address
+    _save_cache(cache)
+    return contract_address
+
+def batch_send(web3, private_key, payments, contract_address, gas_price=None, nonce=None):
+    """
+    Pay many recipients in one transaction through the disperse contract
+
+    Parameters:
+    - web3: Web3 instance
+    - private_key: Sender private key
+    - payments: List of (address, amount in wei), at most BATCH_SEND_MAX_RECIPIENTS
+    - contract_address: Disperse contract address
+    - gas_price: Gas price in wei (default network price)
+    - nonce: Nonce to use (default pending transaction count)
+
+    Returns:
+    - Transaction receipt
+    """
+    address = Account.from_key(private_key).address
+    record = recorder.start("batch_send", f"batch send of {len(payments)}", address)
+    with recorder.active(record):
+        try:
+            tx = {
+                'from': address,
+                'to': web3.to_checksum_address(contract_address),
+                'value': sum(amount for _, amount in payments),
+                'data': "0x" + encode_batch(payments).hex(),
+                'gasPrice': gas_price or web3.eth.gas_price,
+                'nonce': nonce if nonce is not None else web3.eth.get_transaction_count(address, 'pending'),
+                'chainId': config.CHAIN_ID
+            }
+
+            try:
+                tx['gas'] = int(web3.eth.estimate_gas(tx) * 1.2)
+            except Exception:
+                tx['gas'] = 21000 + GAS_PER_RECIPIENT * len(payments)
+
+            tx_hash = _send(web3, private_key, tx, record)
+            record.sent(web3.to_hex(tx_hash), tx['nonce'], endpoint_of(web3))
+            log_info(f"Batch send of {len(payments)} payments sent: {web3.to_hex(tx_hash)}")
+            tracker = PendingTracker(web3)
+            receipt = tracker.wait_for_receipt(tx_hash, timeout=180)
+        except Exception as e:
+            record.fail(str(e))
+            raise
+        included_at, confirmed_at = tracker.receipt_times(tx_hash, receipt)
+        record.apply_receipt(receipt, included_at, confirmed_at, tx['gasPrice'])
+        return receipt
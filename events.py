@@ -0,0 +1,185 @@
+from web3 import Web3
+import config
+
+
+def _to_bytes(value):
+    if isinstance(value, (bytes, bytearray)):
+        return bytes(value)
+    if not value:
+        return b""
+    value = value[2:] if value.startswith("0x") else value
+    return bytes.fromhex(value)
+
+def _word(data, index):
+    return int.from_bytes(data[index * 32:(index + 1) * 32], "big")
+
+def _signed(value):
+    return value - (1 << 256) if value >= 1 << 255 else value
+
+def _address(word_bytes):
+    return "0x" + word_bytes[-20:].hex()
+
+def topic_for(signature):
+    """topic0 of an event signature, e.g. Transfer(address,address,uint256)"""
+    return bytes(Web3.keccak(text=signature))
+
+
+# Decoders get (topics, data) as bytes and return the args dict, or None when the log
+# does not have the expected shape. They never raise for malformed logs.
+
+def _decode_transfer(topics, data):
+    if len(topics) == 3 and len(data) >= 32:
+        return {"from": _address(topics[1]), "to": _address(topics[2]), "value": _word(data, 0)}
+    if len(topics) == 4:
+        # ERC721 Transfer (position NFTs), tokenId is indexed
+        return {"from": _address(topics[1]), "to": _address(topics[2]), "tokenId": _word(topics[3], 0)}
+    return None
+
+def _decode_approval(topics, data):
+    if len(topics) == 3 and len(data) >= 32:
+        return {"owner": _address(topics[1]), "spender": _address(topics[2]), "value": _word(data, 0)}
+    if len(topics) == 4:
+        return {"owner": _address(topics[1]), "approved": _address(topics[2]), "tokenId": _word(topics[3], 0)}
+    return None
+
+def _decode_deposit(topics, data):
+    if len(topics) != 2 or len(data) < 32:
+        return None
+    return {"dst": _address(topics[1]), "wad": _word(data, 0)}
+
+def _decode_withdrawal(topics, data):
+    if len(topics) != 2 or len(data) < 32:
+        return None
+    return {"src": _address(topics[1]), "wad": _word(data, 0)}
+
+def _decode_swap(topics, data):
+    if len(topics) != 3 or len(data) < 5 * 32:
+        return None
+    return {
+        "sender": _address(topics[1]),
+        "recipient": _address(topics[2]),
+        "amount0": _signed(_word(data, 0)),
+        "amount1": _signed(_word(data, 1)),
+        "sqrtPriceX96": _word(data, 2),
+        "liquidity": _word(data, 3),
+        "tick": _signed(_word(data, 4)),
+    }
+
+def _decode_pool_mint(topics, data):
+    if len(topics) != 4 or len(data) < 4 * 32:
+        return None
+    return {
+        "sender": _address(data[0:32]),
+        "owner": _address(topics[1]),
+        "tickLower": _signed(_word(topics[2], 0)),
+        "tickUpper": _signed(_word(topics[3], 0)),
+        "amount": _word(data, 1),
+        "amount0": _word(data, 2),
+        "amount1": _word(data, 3),
+    }
+
+def _decode_liquidity_change(topics, data):
+    if len(topics) != 2 or len(data) < 3 * 32:
+        return None
+    return {
+        "tokenId": _word(topics[1], 0),
+        "liquidity": _word(data, 0),
+        "amount0": _word(data, 1),
+        "amount1": _word(data, 2),
+    }
+
+def _decode_npm_collect(topics, data):
+    if len(topics) != 2 or len(data) < 3 * 32:
+        return None
+    return {
+        "tokenId": _word(topics[1], 0),
+        "recipient": _address(data[0:32]),
+        "amount0": _word(data, 1),
+        "amount1": _word(data, 2),
+    }
+
+
+TRANSFER_TOPIC = topic_for("Transfer(address,address,uint256)")
+APPROVAL_TOPIC = topic_for("Approval(address,address,uint256)")
+DEPOSIT_TOPIC = topic_for("Deposit(address,uint256)")
+WITHDRAWAL_TOPIC = topic_for("Withdrawal(address,uint256)")
+SWAP_TOPIC = topic_for("Swap(address,address,int256,int256,uint160,uint128,int24)")
+POOL_MINT_TOPIC = topic_for("Mint(address,address,int24,int24,uint128,uint256,uint256)")
+INCREASE_LIQUIDITY_TOPIC = topic_for("IncreaseLiquidity(uint256,uint128,uint256,uint256)")
+DECREASE_LIQUIDITY_TOPIC = topic_for("DecreaseLiquidity(uint256,uint128,uint256,uint256)")
+COLLECT_TOPIC = topic_for("Collect(uint256,address,uint256,uint256)")
+
+# topic0 -> (event name, decoder), built once at import
+EVENT_DECODERS = {
+    TRANSFER_TOPIC: ("Transfer", _decode_transfer),
+    APPROVAL_TOPIC: ("Approval", _decode_approval),
+    DEPOSIT_TOPIC: ("Deposit", _decode_deposit),
+    WITHDRAWAL_TOPIC: ("Withdrawal", _decode_withdrawal),
+    SWAP_TOPIC: ("Swap", _decode_swap),
+    POOL_MINT_TOPIC: ("Mint", _decode_pool_mint),
+    INCREASE_LIQUIDITY_TOPIC: ("IncreaseLiquidity", _decode_liquidity_change),
+    DECREASE_LIQUIDITY_TOPIC: ("DecreaseLiquidity", _decode_liquidity_change),
+    COLLECT_TOPIC: ("Collect", _decode_npm_collect),
+}
+
+
+def decode_log(log):
+    """
+    Decode a single log with the topic table
+
+    Parameters:
+    - log: Log entry from a receipt or eth_getLogs (AttributeDict or raw JSON dict)
+
+    Returns:
+    - Dict with 'event', 'address', 'args', 'block_number', 'log_index' and 'tx_hash', or None
+      when the log is not one of the known events
+    """
+    topics = log.get("topics") or []
+    if not topics:
+        return None
+    topic0 = _to_bytes(topics[0])
+    entry = EVENT_DECODERS.get(topic0)
+    if entry is None:
+        return None
+
+    name, decoder = entry
+    args = decoder([_to_bytes(topic) for topic in topics], _to_bytes(log.get("data")))
+    if args is None:
+        return None
+
+    block_number = log.get("blockNumber")
+    log_index = log.get("logIndex")
+    tx_hash = log.get("transactionHash")
+    return {
+        "event": name,
+        "address": str(log.get("address", "")).lower(),
+        "args": args,
+        "block_number": int(block_number, 16) if isinstance(block_number, str) else block_number,
+        "log_index": int(log_index, 16) if isinstance(log_index, str) else log_index,
+        "tx_hash": "0x" + _to_bytes(tx_hash).hex() if tx_hash else None,
+    }
+
+def decode_logs(logs, events=None, address=None):
+    """Decode many logs in one pass, optionally keeping only some event names or one emitter"""
+    address = address.lower() if address else None
+    decoded = []
+    for log in logs:
+        if address and str(log.get("address", "")).lower() != address:
+            continue
+        event = decode_log(log)
+        if event is None:
+            continue
+        if events and event["event"] not in events:
+            continue
+        decoded.append(event)
+    return decoded
+
+def decode_receipt(receipt, events=None, address=None):
+    """Decode every known event in a receipt"""
+    return decode_logs(receipt.get("logs", []), events, address)
+
+def find_position_id(receipt):
+    """Token ID of the position minted or increased in a NonfungiblePositionManager receipt"""
+    for event in decode_receipt(receipt, events=("IncreaseLiquidity",), address=config.POSITION_MANAGER_ADDRESS):
+        return event["args"]["tokenId"]
+    return None
@@ -0,0 +1,283 @@
+import time
+from datetime import datetime
+from web3 import Account
+import config
+from resilience import backoff_delay
+from confirmations import PendingTracker, REPLACED
+from rpc_pool import send_raw_transaction
+from pacing import endpoint_of
+from tx_records import recorder
+from tx_errors import classify_error, retry_policy, bump_gas_price, is_already_known
+
+
+def log_info(message):
+    timestamp = datetime.now().strftime("%H:%M:%S")
+    print(f"[{timestamp}] [INFO] ℹ️  {message}")
+
+def log_success(message):
+    timestamp = datetime.now().strftime("%H:%M:%S")
+    print(f"[{timestamp}] [SUCCESS] ✅ {message}")
+
+def log_error(message):
+    timestamp = datetime.now().strftime("%H:%M:%S")
+    print(f"[{timestamp}] [ERROR] ❌ {message}")
+
+
+class Operation:
+    """
+    One transaction in a flow
+
+    Parameters:
+    - name: Unique label used in logs and results
+    - call: Contract function call to build (e.g. token.functions.approve(...)), or None for a plain transfer
+    - tx_params: Transaction fields other than nonce ('gas', 'gasPrice', 'value', 'to' for plain transfers)
+    - depends_on: Names of operations that must come earlier in nonce order
+    """
+    def __init__(self, name, call=None, tx_params=None, depends_on=None):
+        self.name = name
+        self.call = call
+        self.tx_params = dict(tx_params or {})
+        self.depends_on = list(depends_on or [])
+
+
+def order_operations(operations):
+    """Topological order of the operations, keeping the given order between independent steps"""
+    by_name = {op.name: op for op in operations}
+    if len(by_name) != len(operations):
+        raise ValueError("Operation names must be unique")
+    for op in operations:
+        for dependency in op.depends_on:
+            if dependency not in by_name:
+                raise ValueError(f"{op.name} depends on unknown operation {dependency}")
+
+    ordered = []
+    placed = set()
+    while len(ordered) < len(operations):
+        progressed = False
+        for op in operations:
+            if op.name not in placed and all(dep in placed for dep in op.depends_on):
+                ordered.append(op)
+                placed.add(op.name)
+                progressed = True
+                break
+        if not progressed:
+            raise ValueError("Operations contain a dependency cycle")
+    return ordered
+
+
+class TxExecutor:
+    """Signs a DAG of operations with consecutive nonces, broadcasts them back to back and confirms them together"""
+    def __init__(self, web3, private_key, simulator=None, balance_tracker=None, timeout=180):
+        self.web3 = web3
+        self.private_key = private_key
+        self.address = Account.from_key(private_key).address
+        self.simulator = simulator
+        self.balance_tracker = balance_tracker
+        self.timeout = timeout
+
+    def _blocked_by(self, op, results):
+        return [dep for dep in op.depends_on if results[dep]["status"] in ("failed", "skipped")]
+
+    def _build(self, op, nonce, gas_price):
+        tx_params = {
+            'from': self.address,
+            'nonce': nonce,
+            'gasPrice': gas_price,
+            'chainId': config.CHAIN_ID
+        }
+        tx_params.update(op.tx_params)
+        if op.call is None:
+            return tx_params
+        return op.call.build_transaction(tx_params)
+
+    def _sign(self, tx):
+        signed = self.web3.eth.account.sign_transaction(tx, private_key=self.private_key)
+
+        # Handle different web3.py versions
+        if hasattr(signed, 'rawTransaction'):
+            raw_tx = signed.rawTransaction
+        elif hasattr(signed, 'raw_transaction'):
+            raw_tx = signed.raw_transaction
+        else:
+            raise AttributeError("Could not find raw transaction data in signed transaction")
+
+        return raw_tx, self.web3.to_hex(signed.hash)
+
+    def _broadcast(self, op, tx, record):
+        """Send a transaction, applying the retry policy of each error class; returns (tx_hash, tx, raw_tx)"""
+        attempt = 0
+        while True:
+            raw_tx, tx_hash = self._sign(tx)
+            record.mark("signed")
+            try:
+                send_raw_transaction(self.web3, raw_tx)
+                return tx_hash, tx, raw_tx
+            except Exception as e:
+                failure = classify_error(e)
+                if is_already_known(failure):
+                    # The node already has this exact signed transaction, e.g. from a send that timed out
+                    return tx_hash, tx, raw_tx
+
+                policy = retry_policy(failure["kind"])
+                attempt += 1
+                record.retries = attempt
+                if policy["action"] == "abort" or attempt >= policy["max_attempts"]:
+                    e.error_kind = failure["kind"]
+                    raise
+
+                log_info(f"{op.name}: {failure['kind']} ({failure['message']}), {policy['action']} and retry")
+                if policy["action"] == "bump_fee":
+                    tx = dict(tx, gasPrice=bump_gas_price(tx['gasPrice']))
+                elif policy["action"] == "resync_nonce":
+                    tx = dict(tx, nonce=self.web3.eth.get_transaction_count(self.address, 'pending'))
+                delay = backoff_delay(attempt - 1) if policy["action"] == "retry" else policy["delay"]
+                if delay:
+                    time.sleep(delay)
+
+    def _confirm(self, results, sent, tracker, records):
+        """Fetch receipts for every outstanding hash on each new block until all are mined or the timeout passes"""
+        names = {results[name]["tx_hash"]: name for name in sent}
+        # Receipt polling is shared by the whole flow, so are its RPC calls
+        with recorder.active(*[records[name] for name in sent]):
+            receipts = tracker.wait_for_receipts(list(names), self.timeout)
+
+        for tx_hash, name in names.items():
+            receipt = receipts[tx_hash]
+            if receipt is None and tracker.outcomes.get(tx_hash.lower()) == REPLACED:
+                # Its nonce was mined by another transaction, this step will never land
+                results[name]["status"] = "failed"
+                results[name]["error"] = "replaced by another transaction with the same nonce"
+                records[name].fail(results[name]["error"])
+                if self.balance_tracker is not None:
+                    self.balance_tracker.invalidate()
+                continue
+            if receipt is None:
+                # Still pending: the step may land later, so balances can no longer be trusted
+                results[name]["error"] = "not confirmed within timeout"
+                records[name].error = results[name]["error"]
+                if self.balance_tracker is not None:
+                    self.balance_tracker.invalidate()
+                continue
+
+            results[name]["receipt"] = receipt
+            included_at, confirmed_at = tracker.receipt_times(tx_hash, receipt)
+            records[name].apply_receipt(receipt, included_at, confirmed_at, results[name]["tx"].get('gasPrice'))
+            if receipt.status == 1:
+                results[name]["status"] = "success"
+            else:
+                results[name]["status"] = "failed"
+                results[name]["error"] = f"reverted in block {receipt.blockNumber}"
+
+            if self.balance_tracker is not None:
+                tx = results[name]["tx"]
+                self.balance_tracker.apply_receipt(receipt, value=tx.get('value', 0), gas_price=tx.get('gasPrice'))
+
+    def run(self, operations, nonce=None):
+        """
+        Execute a flow of dependent transactions
+
+        Parameters:
+        - operations: List of Operation
+        - nonce: Starting nonce (default: pending transaction count)
+
+        Returns:
+        - Dict of operation name -> {'status', 'tx_hash', 'receipt', 'error', 'blocked_by', 'tx', 'error_kind'}
+          where status is 'success', 'failed', 'sent' (unconfirmed) or 'skipped' (never broadcast),
+          and error_kind is the tx_errors class of a failed broadcast
+        """
+        ordered = order_operations(operations)
+        results = {
+            op.name: {"status": "skipped", "tx_hash": None, "receipt": None, "error": None, "blocked_by": [], "tx": None, "error_kind": None}
+            for op in ordered
+        }
+        # Lifecycle timing of every step, exported at the end of the run (see tx_records)
+        records = {op.name: recorder.start(op.name, op.name, self.address) for op in ordered}
+
+        with recorder.active(*records.values()):
+            if nonce is None:
+                nonce = self.web3.eth.get_transaction_count(self.address, 'pending')
+            gas_price = self.web3.eth.gas_price
+
+        sent = []
+        tracker = PendingTracker(self.web3)
+        broadcast_failed = None
+        for op in ordered:
+            result = results[op.name]
+            record = records[op.name]
+
+            with recorder.active(record):
+                if broadcast_failed is not None:
+                    # A failed broadcast may or may not have used its nonce, sending more could leave a gap
+                    result["error"] = f"not sent after {broadcast_failed} failed to broadcast"
+                    continue
+
+                blocked_by = self._blocked_by(op, results)
+                if blocked_by:
+                    result["blocked_by"] = blocked_by
+                    result["error"] = f"dependency {', '.join(blocked_by)} failed"
+                    continue
+
+                try:
+                    tx = self._build(op, nonce, gas_price)
+                except Exception as e:
+                    result["status"] = "failed"
+                    result["error"] = f"could not build transaction: {str(e)}"
+                    continue
+
+                # Steps with unconfirmed dependencies would see stale allowances, so only independent ones are dry-run
+                if self.simulator is not None and not op.depends_on:
+                    simulation = self.simulator.simulate(tx)
+                    if simulation["success"] is False:
+                        result["status"] = "failed"
+                        result["error"] = f"simulation reverted: {simulation['reason']}"
+                        log_error(f"{op.name}: {result['error']}, not sending")
+                        continue
+                    elif simulation["success"] is None:
+                        log_info(f"{op.name}: could not simulate ({simulation['reason']}), sending anyway")
+
+                try:
+                    result["tx_hash"], tx, raw_tx = self._broadcast(op, tx, record)
+                except Exception as e:
+                    result["status"] = "failed"
+                    result["error_kind"] = getattr(e, "error_kind", None)
+                    result["error"] = f"broadcast failed ({result['error_kind']}): {str(e)}"
+                    log_error(f"{op.name}: {result['error']}")
+                    broadcast_failed = op.name
+                    continue
+
+                result["status"] = "sent"
+                result["tx"] = tx
+                record.sent(result["tx_hash"], tx['nonce'], endpoint_of(self.web3))
+                sent.append(op.name)
+                tracker.track(result["tx_hash"], raw_tx, self.address, tx['nonce'])
+                log_info(f"{op.name} sent with nonce {tx['nonce']}: {result['tx_hash']}")
+                # A nonce resync may have moved this step, later steps follow it
+                nonce = tx['nonce'] + 1
+                gas_price = max(gas_price, tx['gasPrice'])
+
+        if sent:
+            self._confirm(results, sent, tracker, records)
+
+        for op in ordered:
+            if results[op.name]["status"] in ("failed", "skipped") and records[op.name].status in ("planned", "sent"):
+                records[op.name].fail(results[op.name]["error"], results[op.name]["status"])
+
+        # Report failures against every step that depended on them, directly or transitively
+        for op in ordered:
+            failed_deps = [
+                dep for dep in op.depends_on
+                if results[dep]["status"] in ("failed", "skipped") or results[dep]["blocked_by"]
+            ]
+            for dep in failed_deps:
+                if dep not in results[op.name]["blocked_by"]:
+                    results[op.name]["blocked_by"].append(dep)
+
+        for op in ordered:
+            result = results[op.name]
+            if result["status"] == "success":
+                log_success(f"{op.name} confirmed: {result['tx_hash']}")
+            elif result["status"] == "sent":
+                log_info(f"{op.name} still pending: {result['tx_hash']}")
+            else:
+                log_error(f"{op.name} {result['status']}: {result['error']}")
+        return results
@@ -10,6 +10,12 @@ import sys
 from datetime import datetime
 from colorama import Fore, Style, init
 from dotenv import load_dotenv
+from urllib.parse import urlparse
+
+# Shared resilience helpers live in the bot directory one level up
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from resilience import call_with_retry, is_transient_response
+from web3_factory import chain_id_for, lean_web3
 
 load_dotenv()
 init()
@@ -57,6 +63,7 @@ DEFAULT_WAIT_TIME = float(os.getenv("DEFAULT_WAIT_TIME", "3"))
 CLAIM_RETRIES = int(os.getenv("CLAIM_RETRIES", "3"))
 MAX_GAS_LIMIT = int(os.getenv("MAX_GAS_LIMIT", "21000"))
 WALLET_FILE = os.getenv("WALLET_FILE", "wallets.txt")
+API_HOST = urlparse(AUTH_API).netloc
 
 # HTTP request headers
 REQUEST_HEADERS = {
@@ -74,8 +81,8 @@ REQUEST_HEADERS = {
     "User-Agent": "Mozilla/5.0 (Linux; Android 10; K) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/137.0.0.0 Mobile Safari/537.36"
 }
 
-# Initialize web3 connection
-web3 = Web3(Web3.HTTPProvider(RPC_ENDPOINT))
+# Initialize web3 connection (only the middleware the bot needs; the chain is checked on connect)
+web3 = lean_web3(Web3.HTTPProvider(RPC_ENDPOINT))
 
 def load_proxies():
     """Load proxies from proxy.txt file"""
@@ -146,12 +153,12 @@ proxy_manager = ProxyManager()
 def check_rpc_connection():
     """Verify connection to RPC endpoint"""
     try:
-        if web3.is_connected():
-            log_success(f"Connected to RPC: {RPC_ENDPOINT}")
-            return True
-        else:
+        if not web3.is_connected():
             log_error(f"Failed to connect to RPC: {RPC_ENDPOINT}")
             return False
+        chain_id_for(web3, CHAIN_ID)
+        log_success(f"Connected to RPC: {RPC_ENDPOINT}")
+        return True
     except Exception as e:
         log_error(f"Error checking RPC connection: {str(e)}")
         return False
@@ -182,32 +189,32 @@ def login(address, signature, proxy=None, retries=3):
         "invite_code": REFERRAL_CODE
     }
     
-    for attempt in range(retries):
-        try:
-            response = requests.post(
-                AUTH_API, 
-                headers=REQUEST_HEADERS, 
-                params=login_params, 
-                proxies=proxy,
-                timeout=15
-            )
-            
-            if response.status_code == 200 and response.json().get("code") == 0:
-                log_success(f"Login successful for {address}")
-                return response.json().get("data").get("jwt")
-            
-            error_msg = response.json() if response.status_code == 200 else f"HTTP {response.status_code}"
-            log_error(f"Login failed (Attempt {attempt+1}/{retries}): {error_msg}")
-        
-        except Exception as e:
-            log_error(f"Login error (Attempt {attempt+1}/{retries}): {str(e)}")
+    def attempt_login():
+        return requests.post(
+            AUTH_API, 
+            headers=REQUEST_HEADERS, 
+            params=login_params, 
+            proxies=proxy,
+            timeout=15
+        )
+
+    def before_retry(attempt, outcome):
+        error_msg = str(outcome) if isinstance(outcome, Exception) else f"HTTP {outcome.status_code}"
+        log_error(f"Login failed (Attempt {attempt+1}/{retries}): {error_msg}")
+    
+    try:
+        # Only rate limits, server errors and connection problems are retried, with jittered backoff
+        response = call_with_retry(API_HOST, attempt_login, attempts=retries,
+                                   should_retry=is_transient_response, on_retry=before_retry)
+        if response.status_code == 200 and response.json().get("code") == 0:
+            log_success(f"Login successful for {address}")
+            return response.json().get("data").get("jwt")
         
-        if attempt < retries - 1:
-            delay = random.uniform(2, 4)
-            log_info(f"Waiting {delay:.1f} seconds before retry...")
-            time.sleep(delay)
+        error_msg = response.json() if response.status_code == 200 else f"HTTP {response.status_code}"
+        log_error(f"Login failed: {error_msg}")
+    except Exception as e:
+        log_error(f"Login error: {str(e)}")
     
-    log_error(f"Login failed after {retries} attempts")
     return None
 
 def claim_faucet(address, token, proxy=None):
@@ -215,31 +222,30 @@ def claim_faucet(address, token, proxy=None):
     headers = REQUEST_HEADERS.copy()
     headers["Authorization"] = f"Bearer {token}"
     
-    for attempt in range(CLAIM_RETRIES):
-        try:
-            response = requests.post(
-                f"{FAUCET_API}?address={address}", 
-                headers=headers, 
-                proxies=proxy,
-                timeout=15
-            )
-            
-            if response.status_code == 200 and response.json().get("code") == 0:
-                log_success(f"Successfully claimed faucet for {address}")
-                return True
-            
-            error_msg = response.json() if response.status_code == 200 else f"HTTP {response.status_code}"
-            log_error(f"Faucet claim failed (Attempt {attempt+1}/{CLAIM_RETRIES}): {error_msg}")
-        
-        except Exception as e:
-            log_error(f"Faucet claim error (Attempt {attempt+1}/{CLAIM_RETRIES}): {str(e)}")
+    def attempt_claim():
+        return requests.post(
+            f"{FAUCET_API}?address={address}", 
+            headers=headers, 
+            proxies=proxy,
+            timeout=15
+        )
+
+    def before_retry(attempt, outcome):
+        error_msg = str(outcome) if isinstance(outcome, Exception) else f"HTTP {outcome.status_code}"
+        log_error(f"Faucet claim failed (Attempt {attempt+1}/{CLAIM_RETRIES}): {error_msg}")
+    
+    try:
+        response = call_with_retry(API_HOST, attempt_claim, attempts=CLAIM_RETRIES,
+                                   should_retry=is_transient_response, on_retry=before_retry)
+        if response.status_code == 200 and response.json().get("code") == 0:
+            log_success(f"Successfully claimed faucet for {address}")
+            return True
         
-        if attempt < CLAIM_RETRIES - 1:
-            delay = random.uniform(2, 4)
-            log_info(f"Waiting {delay:.1f} seconds before retry...")
-            time.sleep(delay)
+        error_msg = response.json() if response.status_code == 200 else f"HTTP {response.status_code}"
+        log_error(f"Faucet claim failed: {error_msg}")
+    except Exception as e:
+        log_error(f"Faucet claim error: {str(e)}")
     
-    log_error(f"Faucet claim failed after {CLAIM_RETRIES} attempts")
     return False
 
 def get_balance(address):
@@ -0,0 +1,394 @@
+import sqlite3
+import time
+from datetime import datetime
+import config
+from resilience import backoff_delay
+from rpc_batch import batch_eth_call, encode_call
+from tx_errors import RETRYABLE_NETWORK, classify_error
+from events import (
+    TRANSFER_TOPIC, INCREASE_LIQUIDITY_TOPIC, DECREASE_LIQUIDITY_TOPIC, COLLECT_TOPIC, decode_logs
+)
+
+POSITION_EVENT_TOPICS = [INCREASE_LIQUIDITY_TOPIC, DECREASE_LIQUIDITY_TOPIC, COLLECT_TOPIC]
+
+# How providers reject an eth_getLogs range or result set that is too large (geth, erigon, Infura,
+# Alchemy, QuickNode, Ankr...); only these shrink the range, other errors are retried at the same range
+LOG_RANGE_ERROR_FRAGMENTS = (
+    "block range",
+    "returned more than",
+    "response size",
+    "range is too",
+    "too many blocks",
+    "too many results",
+    "is limited to",
+    "exceed max",
+    "max results",
+)
+
+# uint256 values are stored as decimal TEXT, SQLite integers are only 64 bits
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    wallet TEXT PRIMARY KEY,
+    block INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS transfers (
+    tx_hash TEXT NOT NULL,
+    log_index INTEGER NOT NULL,
+    block INTEGER NOT NULL,
+    token TEXT NOT NULL,
+    from_addr TEXT NOT NULL,
+    to_addr TEXT NOT NULL,
+    amount TEXT NOT NULL,
+    PRIMARY KEY (tx_hash, log_index)
+);
+CREATE INDEX IF NOT EXISTS transfers_to ON transfers (to_addr, block);
+CREATE INDEX IF NOT EXISTS transfers_from ON transfers (from_addr, block);
+CREATE TABLE IF NOT EXISTS position_events (
+    tx_hash TEXT NOT NULL,
+    log_index INTEGER NOT NULL,
+    block INTEGER NOT NULL,
+    token_id INTEGER NOT NULL,
+    event TEXT NOT NULL,
+    liquidity TEXT,
+    amount0 TEXT NOT NULL,
+    amount1 TEXT NOT NULL,
+    PRIMARY KEY (tx_hash, log_index)
+);
+CREATE TABLE IF NOT EXISTS positions (
+    token_id INTEGER PRIMARY KEY,
+    owner TEXT NOT NULL,
+    token0 TEXT,
+    token1 TEXT,
+    fee INTEGER,
+    tick_lower INTEGER,
+    tick_upper INTEGER,
+    liquidity TEXT NOT NULL DEFAULT '0',
+    fee_growth_inside0_last_x128 TEXT NOT NULL DEFAULT '0',
+    fee_growth_inside1_last_x128 TEXT NOT NULL DEFAULT '0',
+    tokens_owed0 TEXT NOT NULL DEFAULT '0',
+    tokens_owed1 TEXT NOT NULL DEFAULT '0',
+    updated_block INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS positions_owner ON positions (owner);
+"""
+
+
+def log_info(message):
+    timestamp = datetime.now().strftime("%H:%M:%S")
+    print(f"[{timestamp}] [INFO] ℹ️  {message}")
+
+def log_error(message):
+    timestamp = datetime.now().strftime("%H:%M:%S")
+    print(f"[{timestamp}] [ERROR] ❌ {message}")
+
+def _to_bytes(value):
+    if isinstance(value, (bytes, bytearray)):
+        return bytes(value)
+    value = value[2:] if value.startswith("0x") else value
+    return bytes.fromhex(value)
+
+def _to_hex(value):
+    return "0x" + _to_bytes(value).hex()
+
+def _pad_address(address):
+    return "0x" + "00" * 12 + address.lower()[2:]
+
+def _pad_uint(value):
+    return "0x" + value.to_bytes(32, "big").hex()
+
+def _word(data, index):
+    return int.from_bytes(data[index * 32:(index + 1) * 32], "big")
+
+def _signed(value, bits=256):
+    return value - (1 << bits) if value >= 1 << (bits - 1) else value
+
+def _is_range_error(error):
+    """The provider rejected the size of an eth_getLogs request rather than failing to answer it"""
+    message = classify_error(error)["message"].lower()
+    return any(fragment in message for fragment in LOG_RANGE_ERROR_FRAGMENTS)
+
+def _decode_position(data):
+    """Decode the return data of NonfungiblePositionManager.positions(tokenId)"""
+    return {
+        "token0": "0x" + data[2 * 32 + 12:3 * 32].hex(),
+        "token1": "0x" + data[3 * 32 + 12:4 * 32].hex(),
+        "fee": _word(data, 4),
+        "tick_lower": _signed(_word(data, 5)),
+        "tick_upper": _signed(_word(data, 6)),
+        "liquidity": _word(data, 7),
+        "fee_growth_inside0_last_x128": _word(data, 8),
+        "fee_growth_inside1_last_x128": _word(data, 9),
+        "tokens_owed0": _word(data, 10),
+        "tokens_owed1": _word(data, 11),
+    }
+
+
+class EventIndexer:
+    """Incrementally indexes transfer and position events for our wallets into SQLite"""
+    def __init__(self, web3, wallets, db_path=None):
+        self.web3 = web3
+        self.wallets = [wallet.lower() for wallet in wallets]
+        self.position_manager = config.POSITION_MANAGER_ADDRESS.lower()
+        self.npm_contract = web3.eth.contract(
+            address=web3.to_checksum_address(config.POSITION_MANAGER_ADDRESS),
+            abi=config.POSITION_MANAGER_ABI
+        )
+        self.db = sqlite3.connect(db_path or config.INDEXER_DB)
+        self.db.executescript(SCHEMA)
+        self.block_range = config.INDEXER_INITIAL_RANGE
+        self.range_ceiling = config.INDEXER_MAX_RANGE  # lowered when a provider rejects a range
+
+    def close(self):
+        self.db.close()
+
+    def _checkpoint(self, latest):
+        """Last fully indexed block common to all wallets"""
+        # Wallets without a checkpoint start at INDEXER_START_BLOCK, or a bounded window back from the head
+        start_block = config.INDEXER_START_BLOCK
+        if start_block is None:
+            start_block = max(0, latest - config.INDEXER_LOOKBACK_BLOCKS + 1)
+        blocks = []
+        for wallet in self.wallets:
+            row = self.db.execute("SELECT block FROM checkpoints WHERE wallet = ?", (wallet,)).fetchone()
+            blocks.append(row[0] if row else start_block - 1)
+        return min(blocks) if blocks else start_block - 1
+
+    def _get_logs(self, from_block, to_block, topics, address=None):
+        params = {"fromBlock": from_block, "toBlock": to_block, "topics": topics}
+        if address:
+            params["address"] = self.web3.to_checksum_address(address)
+        return self.web3.eth.get_logs(params)
+
+    def _fetch_range(self, from_block, to_block):
+        """Fetch every log relevant to our wallets in a block range"""
+        wallet_topics = [_pad_address(wallet) for wallet in self.wallets]
+        transfer = _to_hex(TRANSFER_TOPIC)
+
+        # ERC20 and position NFT transfers share topic0; one query per direction covers both
+        logs = list(self._get_logs(from_block, to_block, [transfer, wallet_topics]))
+        logs += self._get_logs(from_block, to_block, [transfer, None, wallet_topics])
+
+        # Liquidity events are keyed by tokenId, so query for every position we have ever held
+        token_ids = {row[0] for row in self.db.execute("SELECT token_id FROM positions")}
+        for event in decode_logs(logs, events=("Transfer",), address=self.position_manager):
+            if "tokenId" in event["args"]:
+                token_ids.add(event["args"]["tokenId"])
+
+        token_ids = sorted(token_ids)
+        event_topics = [_to_hex(topic) for topic in POSITION_EVENT_TOPICS]
+        for i in range(0, len(token_ids), 100):
+            id_topics = [_pad_uint(token_id) for token_id in token_ids[i:i + 100]]
+            logs += self._get_logs(from_block, to_block, [event_topics, id_topics], self.position_manager)
+
+        # Logs matching both directions (self transfers) come back twice
+        unique = {}
+        for log in logs:
+            unique[(_to_hex(log["transactionHash"]), log["logIndex"])] = log
+        return sorted(unique.values(), key=lambda log: (log["blockNumber"], log["logIndex"]))
+
+    def _store(self, logs):
+        touched = set()
+        for event in decode_logs(logs):
+            args = event["args"]
+            key = (event["tx_hash"], event["log_index"], event["block_number"])
+            from_position_manager = event["address"] == self.position_manager
+
+            if event["event"] == "Transfer" and "tokenId" in args and from_position_manager:
+                # Position NFT changed hands (mint, transfer or burn)
+                self.db.execute(
+                    "INSERT INTO positions (token_id, owner, updated_block) VALUES (?, ?, ?) "
+                    "ON CONFLICT(token_id) DO UPDATE SET owner = excluded.owner, updated_block = excluded.updated_block "
+                    "WHERE excluded.updated_block >= positions.updated_block",
+                    (args["tokenId"], args["to"], event["block_number"])
+                )
+                touched.add(args["tokenId"])
+            elif event["event"] == "Transfer" and "value" in args:
+                self.db.execute(
+                    "INSERT OR IGNORE INTO transfers VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    key + (event["address"], args["from"], args["to"], str(args["value"]))
+                )
+            elif event["event"] in ("IncreaseLiquidity", "DecreaseLiquidity", "Collect") and from_position_manager:
+                liquidity = str(args["liquidity"]) if "liquidity" in args else None
+                self.db.execute(
+                    "INSERT OR IGNORE INTO position_events VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    key + (args["tokenId"], event["event"], liquidity, str(args["amount0"]), str(args["amount1"]))
+                )
+                touched.add(args["tokenId"])
+        return touched
+
+    def _seed_positions(self, wallets, block):
+        """
+        Record the positions wallets hold at a block, enumerated from the position manager
+
+        Logs only cover the blocks indexed, so positions minted before a wallet's first
+        sync would otherwise never show up.
+
+        Parameters:
+        - wallets: Wallets to enumerate
+        - block: Block to read ownership at
+
+        Returns:
+        - Set of token IDs found
+
+        Raises:
+        - RuntimeError: A balanceOf or tokenOfOwnerByIndex call failed
+        """
+        address = self.npm_contract.address
+        owners = [self.web3.to_checksum_address(wallet) for wallet in wallets]
+        calls = [{"to": address, "data": encode_call(self.npm_contract, "balanceOf", [owner])} for owner in owners]
+        balances = batch_eth_call(self.web3, calls, block)
+
+        indexes, calls = [], []
+        for wallet, owner, balance in zip(wallets, owners, balances):
+            if not balance:
+                raise RuntimeError(f"balanceOf failed for {wallet}")
+            for i in range(_word(balance, 0)):
+                indexes.append(wallet)
+                calls.append({"to": address, "data": encode_call(self.npm_contract, "tokenOfOwnerByIndex", [owner, i])})
+
+        token_ids = set()
+        for wallet, result in zip(indexes, batch_eth_call(self.web3, calls, block)):
+            if not result:
+                raise RuntimeError(f"tokenOfOwnerByIndex failed for {wallet}")
+            token_id = _word(result, 0)
+            self.db.execute(
+                "INSERT INTO positions (token_id, owner, updated_block) VALUES (?, ?, ?) "
+                "ON CONFLICT(token_id) DO UPDATE SET owner = excluded.owner, updated_block = excluded.updated_block "
+                "WHERE excluded.updated_block >= positions.updated_block",
+                (token_id, wallet, block)
+            )
+            token_ids.add(token_id)
+        return token_ids
+
+    def _refresh_positions(self, token_ids, block):
+        """Re-read position state for positions that had activity, in one batched request"""
+        token_ids = sorted(token_ids)
+        calls = [{
+            "to": self.npm_contract.address,
+            "data": encode_call(self.npm_contract, "positions", [token_id])
+        } for token_id in token_ids]
+
+        for token_id, result in zip(token_ids, batch_eth_call(self.web3, calls, block)):
+            if not result or len(result) < 12 * 32:
+                # Burned positions revert on positions(), nothing left in them
+                self.db.execute("UPDATE positions SET liquidity = '0' WHERE token_id = ?", (token_id,))
+                continue
+            position = _decode_position(result)
+            self.db.execute(
+                "UPDATE positions SET token0 = ?, token1 = ?, fee = ?, tick_lower = ?, tick_upper = ?, "
+                "liquidity = ?, fee_growth_inside0_last_x128 = ?, fee_growth_inside1_last_x128 = ?, "
+                "tokens_owed0 = ?, tokens_owed1 = ? WHERE token_id = ?",
+                (position["token0"], position["token1"], position["fee"], position["tick_lower"],
+                 position["tick_upper"], str(position["liquidity"]),
+                 str(position["fee_growth_inside0_last_x128"]), str(position["fee_growth_inside1_last_x128"]),
+                 str(position["tokens_owed0"]), str(position["tokens_owed1"]), token_id)
+            )
+
+    def sync(self, to_block=None):
+        """
+        Index new logs since the last checkpoint
+
+        Parameters:
+        - to_block: Last block to index (defaults to the current head)
+
+        Returns:
+        - Number of blocks indexed
+        """
+        latest = to_block if to_block is not None else self.web3.eth.block_number
+        start = self._checkpoint(latest) + 1
+        first = start
+        touched = set()
+        retries = 0
+
+        # Logs from the lookback window miss older positions, take a snapshot of what new wallets hold
+        new_wallets = [
+            wallet for wallet in self.wallets
+            if not self.db.execute("SELECT 1 FROM checkpoints WHERE wallet = ?", (wallet,)).fetchone()
+        ]
+        if new_wallets:
+            touched |= self._seed_positions(new_wallets, latest)
+            log_info(f"Found {len(touched)} existing positions for {len(new_wallets)} new wallets")
+
+        while start <= latest:
+            end = min(start + self.block_range - 1, latest)
+            try:
+                logs = self._fetch_range(start, end)
+            except Exception as e:
+                if _is_range_error(e):
+                    # Providers cap block ranges or result counts; shrink the window and retry
+                    if self.block_range == 1:
+                        raise
+                    self.block_range = max(1, self.block_range // 2)
+                    self.range_ceiling = self.block_range
+                    log_info(f"eth_getLogs rejected {end - start + 1} blocks ({str(e)[:80]}), reducing range to {self.block_range}")
+                    continue
+
+                # Timeouts and dropped connections say nothing about the range, retry the same one
+                if classify_error(e)["kind"] != RETRYABLE_NETWORK or retries >= config.INDEXER_NETWORK_RETRIES:
+                    raise
+                delay = backoff_delay(retries)
+                retries += 1
+                log_info(f"eth_getLogs failed ({str(e)[:80]}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+                continue
+
+            retries = 0
+
+            touched |= self._store(logs)
+            for wallet in self.wallets:
+                self.db.execute(
+                    "INSERT INTO checkpoints VALUES (?, ?) ON CONFLICT(wallet) DO UPDATE SET block = excluded.block",
+                    (wallet, end)
+                )
+            self.db.commit()
+
+            start = end + 1
+            self.block_range = min(self.range_ceiling, self.block_range * 2)
+
+        if touched:
+            self._refresh_positions(touched, latest)
+            self.db.commit()
+
+        indexed = max(0, latest - first + 1)
+        if indexed:
+            log_info(f"Indexed {indexed} blocks, {len(touched)} positions updated")
+        return indexed
+
+    def get_positions(self, owner):
+        """List positions currently owned by a wallet, in get_liquidity_positions format"""
+        rows = self.db.execute(
+            "SELECT token_id, token0, token1, fee, tick_lower, tick_upper, liquidity, "
+            "fee_growth_inside0_last_x128, fee_growth_inside1_last_x128, tokens_owed0, tokens_owed1 "
+            "FROM positions WHERE owner = ? ORDER BY token_id",
+            (owner.lower(),)
+        ).fetchall()
+
+        positions = []
+        for row in rows:
+            positions.append({
+                'token_id': row[0],
+                'token0': self.web3.to_checksum_address(row[1]) if row[1] else None,
+                'token1': self.web3.to_checksum_address(row[2]) if row[2] else None,
+                'fee': row[3],
+                'tick_lower': row[4],
+                'tick_upper': row[5],
+                'liquidity': int(row[6]),
+                'fee_growth_inside0_last_X128': int(row[7]),
+                'fee_growth_inside1_last_X128': int(row[8]),
+                'tokens_owed0': int(row[9]),
+                'tokens_owed1': int(row[10])
+            })
+        return positions
+
+    def get_received(self, wallet, token=None):
+        """List token transfers received by a wallet, optionally for one token"""
+        query = "SELECT block, tx_hash, token, from_addr, amount FROM transfers WHERE to_addr = ?"
+        params = [wallet.lower()]
+        if token:
+            query += " AND token = ?"
+            params.append(token.lower())
+        rows = self.db.execute(query + " ORDER BY block, log_index", params).fetchall()
+        return [
+            {'block': row[0], 'tx_hash': row[1], 'token': row[2], 'from': row[3], 'amount': int(row[4])}
+            for row in rows
+        ]
@@ -0,0 +1,175 @@
+import getpass
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from web3 import Web3, Account
+import config
+
+
+def log_info(message):
+    timestamp = datetime.now().strftime("%H:%M:%S")
+    print(f"[{timestamp}] [INFO] ℹ️  {message}")
+
+def log_success(message):
+    timestamp = datetime.now().strftime("%H:%M:%S")
+    print(f"[{timestamp}] [SUCCESS] ✅ {message}")
+
+def log_error(message):
+    timestamp = datetime.now().strftime("%H:%M:%S")
+    print(f"[{timestamp}] [ERROR] ❌ {message}")
+
+def _decrypt_keystore(args):
+    """Process pool worker: scrypt/pbkdf2 decryption of one keystore, returns the hex private key or None"""
+    keyfile_json, password = args
+    try:
+        return "0x" + bytes(Account.decrypt(keyfile_json, password)).hex()
+    except Exception:
+        return None
+
+def _encrypt_key(args):
+    """Process pool worker: encrypt one private key into a V3 keystore dict"""
+    private_key, password = args
+    return Account.encrypt(private_key, password)
+
+def _read_password(prompt):
+    password = os.environ.get(config.KEYSTORE_PASSWORD_ENV)
+    if password is None:
+        password = getpass.getpass(prompt)
+    return password
+
+
+class WalletRegistry:
+    """
+    Wallets loaded from encrypted keystores (or plaintext private_key.txt as a fallback)
+
+    Addresses come straight from the keystore JSON, so listing wallets needs no decryption.
+    Private keys are decrypted only for the wallets a run actually uses, in parallel, and are
+    kept in memory only.
+    """
+    def __init__(self, keystore_dir=None, key_file="private_key.txt"):
+        self.keystore_dir = keystore_dir or config.KEYSTORE_DIR
+        self.key_file = key_file
+        self.source = None
+        self.addresses = []
+        self._keystores = []
+        self._keys = {}
+        self._password = None
+
+    def _keystore_files(self):
+        if not os.path.isdir(self.keystore_dir):
+            return []
+        return sorted(
+            os.path.join(self.keystore_dir, name)
+            for name in os.listdir(self.keystore_dir)
+            if name.endswith(".json") or name.startswith("UTC--")
+        )
+
+    def load(self):
+        """Read wallet addresses, returns self (empty when no wallets were found)"""
+        files = self._keystore_files()
+        if files:
+            self.source = "keystore"
+            for path in files:
+                try:
+                    with open(path, "r") as f:
+                        keystore = json.load(f)
+                    address = keystore.get("address")
+                    if not address:
+                        raise ValueError("keystore has no address field")
+                    address = address if address.startswith("0x") else "0x" + address
+                    self.addresses.append(Web3.to_checksum_address(address))
+                    self._keystores.append(keystore)
+                except Exception as e:
+                    log_error(f"Skipping keystore {path}: {str(e)}")
+            return self
+
+        if not os.path.exists(self.key_file):
+            return self
+
+        self.source = "plaintext"
+        with open(self.key_file, "r") as file:
+            keys = [line.strip() for line in file if line.strip()]
+        for index, key in enumerate(keys):
+            try:
+                self.addresses.append(Account.from_key(key).address)
+                self._keys[index] = key
+            except Exception:
+                # Kept in the list so wallet numbering matches the file
+                self.addresses.append(None)
+        return self
+
+    def __len__(self):
+        return len(self.addresses)
+
+    def unlock(self, indices):
+        """
+        Decrypt the keystores for the given wallet indices
+
+        Parameters:
+        - indices: Wallet indices the run will use
+
+        Returns:
+        - Number of wallets that are unlocked and usable
+        """
+        pending = [index for index in indices if index not in self._keys and index < len(self._keystores)]
+        if pending:
+            if self._password is None:
+                self._password = _read_password("Keystore password: ")
+
+            jobs = [(self._keystores[index], self._password) for index in pending]
+            log_info(f"Decrypting {len(pending)} keystore(s)...")
+            if len(jobs) == 1:
+                results = [_decrypt_keystore(jobs[0])]
+            else:
+                # scrypt is CPU bound, one process per core keeps startup flat as wallets grow
+                with ProcessPoolExecutor(max_workers=min(len(jobs), os.cpu_count() or 1)) as pool:
+                    results = list(pool.map(_decrypt_keystore, jobs))
+
+            for index, key in zip(pending, results):
+                if key is None:
+                    log_error(f"Could not decrypt keystore for wallet #{index + 1} (wrong password?)")
+                else:
+                    self._keys[index] = key
+
+        return sum(1 for index in indices if index in self._keys)
+
+    def private_key(self, index):
+        """Private key for a wallet, decrypting it first if needed (None when unavailable)"""
+        if index not in self._keys:
+            self.unlock([index])
+        return self._keys.get(index)
+
+
+def encrypt_private_keys(key_file="private_key.txt", keystore_dir=None):
+    """Convert plaintext private_key.txt into V3 keystores, encrypting in parallel"""
+    keystore_dir = keystore_dir or config.KEYSTORE_DIR
+    with open(key_file, "r") as file:
+        keys = [line.strip() for line in file if line.strip()]
+    if not keys:
+        log_error(f"No private keys found in {key_file}")
+        return 0
+
+    password = _read_password("New keystore password: ")
+    os.makedirs(keystore_dir, exist_ok=True)
+
+    log_info(f"Encrypting {len(keys)} key(s)...")
+    with ProcessPoolExecutor(max_workers=min(len(keys), os.cpu_count() or 1)) as pool:
+        keystores = list(pool.map(_encrypt_key, [(key, password) for key in keys]))
+
+    # Zero-padded index keeps the wallet order of private_key.txt
+    for index, keystore in enumerate(keystores):
+        path = os.path.join(keystore_dir, f"{index:05d}-0x{keystore['address']}.json")
+        with open(path, "w") as f:
+            json.dump(keystore, f)
+
+    log_success(f"Wrote {len(keystores)} keystore(s) to {keystore_dir}/, you can now remove {key_file}")
+    return len(keystores)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "encrypt":
+        encrypt_private_keys()
+    else:
+        print("Usage: python keystore.py encrypt   (converts private_key.txt into encrypted keystores)")
@@ -4,6 +4,19 @@ from web3 import Web3
 from web3.exceptions import ContractLogicError
 import config
 from datetime import datetime
+from simulation import TransactionSimulator
+from indexer import EventIndexer
+from events import find_position_id
+from calldata import PreparedCall, encode_approve, encode_collect, encode_decrease_liquidity, encode_mint, encode_multicall
+from permit import PermitSigner, self_permit_call
+from executor import Operation, TxExecutor
+from keystore import WalletRegistry
+from rpc_pool import send_raw_transaction
+from web3_factory import connect
+from confirmations import PendingTracker
+from read_cache import enable_read_cache
+from valuation import value_wallet_positions
+from tokens import token_registry_for
 
 def log_info(message):
     timestamp = datetime.now().strftime("%H:%M:%S")
@@ -17,7 +30,7 @@ def log_error(message):
     timestamp = datetime.now().strftime("%H:%M:%S")
     print(f"[{timestamp}] [ERROR] ❌ {message}")
 
-def add_liquidity(web3, private_key, amount_usdc, tick_range_type="full", amount1=None):
+def add_liquidity(web3, private_key, amount_usdc, tick_range_type="full", amount1=None, simulator=None, permit_signer=None):
     """
     Add liquidity to the USDC-PHRS pool
     
@@ -27,6 +40,8 @@ def add_liquidity(web3, private_key, amount_usdc, tick_range_type="full", amount
     - amount_usdc: Amount of USDC to add
     - tick_range_type: Type of tick range ("full", "narrow", "custom")
     - amount1: Optional amount of USDC to add (if None, uses same value as PHRS)
+    - simulator: Optional TransactionSimulator used to dry-run the mint before signing
+    - permit_signer: Optional PermitSigner, bundles selfPermit into the mint instead of sending approvals
     
     Returns:
     - Transaction hash if successful, None otherwise
@@ -36,10 +51,12 @@ def add_liquidity(web3, private_key, amount_usdc, tick_range_type="full", amount
     try:
         account = web3.eth.account.from_key(private_key)
         address = account.address
-        amount0_in_wei = web3.to_wei(amount_usdc, 'ether')
+        # Each amount in its own token's base units (USDC does not have 18 decimals)
+        tokens = token_registry_for(web3)
+        amount0_in_wei = tokens.to_base_units(config.WPHRS_ADDRESS, amount_usdc)
         
         # If amount1 not specified, use same amount as PHRS
-        amount1_in_wei = amount0_in_wei if amount1 is None else web3.to_wei(amount1, 'ether')
+        amount1_in_wei = tokens.to_base_units(config.USDC_ADDRESS, amount_usdc if amount1 is None else amount1)
         
         # Get contracts with checksummed addresses
         token0 = web3.eth.contract(
@@ -55,11 +72,12 @@ def add_liquidity(web3, private_key, amount_usdc, tick_range_type="full", amount
             abi=config.POSITION_MANAGER_ABI
         )
         
-        # Get current nonce
-        nonce = web3.eth.get_transaction_count(address)
+        # Approvals and the mint go out back to back with consecutive nonces
+        operations = []
         
         # Approve with larger amounts for future operations
-        approve_amount = amount0_in_wei * 10  # 10x for future approvals
+        approve_amount0 = amount0_in_wei * 10  # 10x for future approvals
+        approve_amount1 = amount1_in_wei * 10
         
         # Check current allowance for token0
         allowance0 = token0.functions.allowance(
@@ -67,41 +85,21 @@ def add_liquidity(web3, private_key, amount_usdc, tick_range_type="full", amount
             web3.to_checksum_address(config.POSITION_MANAGER_ADDRESS)
         ).call()
         
+        # A permit bundled with the mint replaces the approve transaction when the token supports it
+        permit0 = None
+        if allowance0 < amount0_in_wei and permit_signer is not None:
+            permit0 = permit_signer.sign_permit(private_key, config.WPHRS_ADDRESS, config.POSITION_MANAGER_ADDRESS, approve_amount0)
+        
         # Only approve if needed
-        if allowance0 < amount0_in_wei:
-            # First approve tokens to position manager
-            approve_tx0 = token0.functions.approve(
-                web3.to_checksum_address(config.POSITION_MANAGER_ADDRESS), 
-                approve_amount
-            ).build_transaction({
-                'from': address,
-                'nonce': nonce,
-                'gas': 200000,
-                'gasPrice': web3.eth.gas_price + random.randint(100000, 2000000),
-                'chainId': config.CHAIN_ID
-            })
-            
-            signed_approve0 = web3.eth.account.sign_transaction(approve_tx0, private_key=private_key)
-            
-            # Handle different web3.py versions
-            if hasattr(signed_approve0, 'rawTransaction'):
-                raw_tx0 = signed_approve0.rawTransaction
-            elif hasattr(signed_approve0, 'raw_transaction'):
-                raw_tx0 = signed_approve0.raw_transaction
-            else:
-                raise AttributeError("Could not find raw transaction data in signed transaction")
-                
-            tx_hash0 = web3.eth.send_raw_transaction(raw_tx0)
-            log_info(f"Token0 approval transaction sent: {web3.to_hex(tx_hash0)}")
-            
-            # Wait for approval to be mined
-            receipt0 = web3.eth.wait_for_transaction_receipt(tx_hash0, timeout=120)
-            if receipt0.status != 1:
-                log_error("Token0 approval transaction failed")
-                return None
-                
-            log_success("Token0 approval confirmed")
-            nonce += 1
+        if allowance0 < amount0_in_wei and permit0 is None:
+            # Queued approval, sent back to back with the mint below
+            operations.append(Operation(
+                "approve_token0",
+                PreparedCall(web3, config.WPHRS_ADDRESS, encode_approve(config.POSITION_MANAGER_ADDRESS, approve_amount0)),
+                {'gas': 200000, 'gasPrice': web3.eth.gas_price + random.randint(100000, 2000000)}
+            ))
+        elif permit0 is not None:
+            log_info("Token0 allowance will be granted by permit inside the mint transaction")
         else:
             log_info("Token0 already has sufficient allowance")
         
@@ -111,41 +109,21 @@ def add_liquidity(web3, private_key, amount_usdc, tick_range_type="full", amount
             web3.to_checksum_address(config.POSITION_MANAGER_ADDRESS)
         ).call()
         
+        # A permit bundled with the mint replaces the approve transaction when the token supports it
+        permit1 = None
+        if allowance1 < amount1_in_wei and permit_signer is not None:
+            permit1 = permit_signer.sign_permit(private_key, config.USDC_ADDRESS, config.POSITION_MANAGER_ADDRESS, approve_amount1)
+        
         # Only approve if needed
-        if allowance1 < amount1_in_wei:
-            # Approve token1
-            approve_tx1 = token1.functions.approve(
-                web3.to_checksum_address(config.POSITION_MANAGER_ADDRESS), 
-                approve_amount
-            ).build_transaction({
-                'from': address,
-                'nonce': nonce,
-                'gas': 200000,
-                'gasPrice': web3.eth.gas_price + random.randint(100000, 2000000),
-                'chainId': config.CHAIN_ID
-            })
-            
-            signed_approve1 = web3.eth.account.sign_transaction(approve_tx1, private_key=private_key)
-            
-            # Handle different web3.py versions
-            if hasattr(signed_approve1, 'rawTransaction'):
-                raw_tx1 = signed_approve1.rawTransaction
-            elif hasattr(signed_approve1, 'raw_transaction'):
-                raw_tx1 = signed_approve1.raw_transaction
-            else:
-                raise AttributeError("Could not find raw transaction data in signed transaction")
-                
-            tx_hash1 = web3.eth.send_raw_transaction(raw_tx1)
-            log_info(f"Token1 approval transaction sent: {web3.to_hex(tx_hash1)}")
-            
-            # Wait for approval to be mined
-            receipt1 = web3.eth.wait_for_transaction_receipt(tx_hash1, timeout=120)
-            if receipt1.status != 1:
-                log_error("Token1 approval transaction failed")
-                return None
-                
-            log_success("Token1 approval confirmed")
-            nonce += 1
+        if allowance1 < amount1_in_wei and permit1 is None:
+            # Queued approval, sent back to back with the mint below
+            operations.append(Operation(
+                "approve_token1",
+                PreparedCall(web3, config.USDC_ADDRESS, encode_approve(config.POSITION_MANAGER_ADDRESS, approve_amount1)),
+                {'gas': 200000, 'gasPrice': web3.eth.gas_price + random.randint(100000, 2000000)}
+            ))
+        elif permit1 is not None:
+            log_info("Token1 allowance will be granted by permit inside the mint transaction")
         else:
             log_info("Token1 already has sufficient allowance")
         
@@ -187,60 +165,54 @@ def add_liquidity(web3, private_key, amount_usdc, tick_range_type="full", amount
             "deadline": deadline
         }
         
-        # Build and sign mint transaction
-        mint_tx = position_manager.functions.mint(
-            mint_params
-        ).build_transaction({
-            'from': address,
-            'nonce': nonce,
-            'gas': 1000000,  # Increased gas limit for complex operation
-            'gasPrice': web3.eth.gas_price + random.randint(100000, 2000000),
-            'chainId': config.CHAIN_ID
-        })
+        # selfPermit calls go ahead of the mint in one multicall
+        permit_calls = [self_permit_call(position_manager, permit) for permit in (permit0, permit1) if permit is not None]
+        if permit_calls:
+            mint_call = PreparedCall(web3, position_manager.address, encode_multicall(permit_calls + [encode_mint(mint_params)]))
+        else:
+            mint_call = PreparedCall(web3, position_manager.address, encode_mint(mint_params))
+        
+        operations.append(Operation(
+            "mint",
+            mint_call,
+            {
+                'gas': 1000000,  # Increased gas limit for complex operation
+                'gasPrice': web3.eth.gas_price + random.randint(100000, 2000000)
+            },
+            depends_on=[op.name for op in operations]
+        ))
+        
+        # The executor only dry-runs the mint when no approval is queued ahead of it,
+        # otherwise the simulation would see the old allowance
+        results = TxExecutor(web3, private_key, simulator=simulator).run(operations)
+        mint_result = results["mint"]
+        
+        if mint_result["status"] == "skipped" or mint_result["tx_hash"] is None:
+            log_error(f"Liquidity addition not sent: {mint_result['error']}")
+            return None
         
-        signed_mint = web3.eth.account.sign_transaction(mint_tx, private_key=private_key)
+        mint_tx_hash = mint_result["tx_hash"]
+        if mint_result["status"] == "sent":
+            log_info(f"Transaction may still be pending. Check explorer: {config.EXPLORER}{mint_tx_hash}")
+            return {'tx_hash': mint_tx_hash}
         
-        # Handle different web3.py versions
-        if hasattr(signed_mint, 'rawTransaction'):
-            raw_mint_tx = signed_mint.rawTransaction
-        elif hasattr(signed_mint, 'raw_transaction'):
-            raw_mint_tx = signed_mint.raw_transaction
-        else:
-            raise AttributeError("Could not find raw transaction data in signed transaction")
-            
-        mint_tx_hash = web3.eth.send_raw_transaction(raw_mint_tx)
-        log_info(f"Liquidity addition transaction sent: {web3.to_hex(mint_tx_hash)}")
+        if mint_result["status"] != "success":
+            log_error(f"Liquidity addition transaction failed: {mint_result['error']}")
+            if mint_result["blocked_by"]:
+                log_error(f"Failed approvals: {', '.join(mint_result['blocked_by'])}")
+            return None
         
-        # Wait for transaction to be mined
-        try:
-            mint_receipt = web3.eth.wait_for_transaction_receipt(mint_tx_hash, timeout=180)
-            if mint_receipt.status != 1:
-                log_error(f"Liquidity addition transaction failed with status {mint_receipt.status}")
-                return None
-                
-            log_success(f"Successfully added liquidity with {amount_usdc} USDC!")
-            
-            # Parse events to get token ID
-            position_id = None
-            for log in mint_receipt.logs:
-                if log.get('address') == config.POSITION_MANAGER_ADDRESS.lower():
-                    # Try to find IncreaseLiquidity event
-                    try:
-                        event = position_manager.events.IncreaseLiquidity().process_log(log)
-                        position_id = event.args.tokenId
-                        log_success(f"Created position ID: {position_id}")
-                        break
-                    except:
-                        pass
-            
-            return {
-                'tx_hash': web3.to_hex(mint_tx_hash),
-                'position_id': position_id
-            }
-        except Exception as receipt_error:
-            log_error(f"Error waiting for receipt: {str(receipt_error)}")
-            log_info(f"Transaction may still be pending. Check explorer: {config.EXPLORER}{web3.to_hex(mint_tx_hash)}")
-            return {'tx_hash': web3.to_hex(mint_tx_hash)}
+        log_success(f"Successfully added liquidity with {amount_usdc} USDC!")
+        
+        # Parse events to get token ID
+        position_id = find_position_id(mint_result["receipt"])
+        if position_id is not None:
+            log_success(f"Created position ID: {position_id}")
+        
+        return {
+            'tx_hash': mint_tx_hash,
+            'position_id': position_id
+        }
         
     except ContractLogicError as cle:
         log_error(f"Contract logic error: {str(cle)}")
@@ -316,8 +288,8 @@ def remove_liquidity(web3, private_key, token_id, liquidity_percentage=100):
         }
         
         # Build and sign decreaseLiquidity transaction
-        decrease_tx = position_manager.functions.decreaseLiquidity(
-            decrease_params
+        decrease_tx = PreparedCall(
+            web3, position_manager.address, encode_decrease_liquidity(decrease_params)
         ).build_transaction({
             'from': address,
             'nonce': nonce,
@@ -336,11 +308,11 @@ def remove_liquidity(web3, private_key, token_id, liquidity_percentage=100):
         else:
             raise AttributeError("Could not find raw transaction data in signed transaction")
             
-        tx_hash = web3.eth.send_raw_transaction(raw_tx)
+        tx_hash = send_raw_transaction(web3, raw_tx)
         log_info(f"Decrease liquidity transaction sent: {web3.to_hex(tx_hash)}")
         
         # Wait for transaction to be mined
-        receipt = web3.eth.wait_for_transaction_receipt(tx_hash, timeout=180)
+        receipt = PendingTracker(web3).wait_for_receipt(tx_hash, timeout=180)
         if receipt.status != 1:
             log_error("Decrease liquidity transaction failed")
             return None
@@ -359,8 +331,8 @@ def remove_liquidity(web3, private_key, token_id, liquidity_percentage=100):
                 "amount1Max": 2**128 - 1   # Max uint128
             }
             
-            collect_tx = position_manager.functions.collect(
-                collect_params
+            collect_tx = PreparedCall(
+                web3, position_manager.address, encode_collect(collect_params)
             ).build_transaction({
                 'from': address,
                 'nonce': nonce,
@@ -379,11 +351,11 @@ def remove_liquidity(web3, private_key, token_id, liquidity_percentage=100):
             else:
                 raise AttributeError("Could not find raw transaction data in signed transaction")
                 
-            collect_tx_hash = web3.eth.send_raw_transaction(raw_collect_tx)
+            collect_tx_hash = send_raw_transaction(web3, raw_collect_tx)
             log_info(f"Collect tokens transaction sent: {web3.to_hex(collect_tx_hash)}")
             
             # Wait for transaction to be mined
-            collect_receipt = web3.eth.wait_for_transaction_receipt(collect_tx_hash, timeout=180)
+            collect_receipt = PendingTracker(web3).wait_for_receipt(collect_tx_hash, timeout=180)
             if collect_receipt.status != 1:
                 log_error("Collect tokens transaction failed")
             else:
@@ -395,19 +367,29 @@ def remove_liquidity(web3, private_key, token_id, liquidity_percentage=100):
         log_error(f"Error during liquidity removal: {str(e)}")
         return None
 
-def get_liquidity_positions(web3, address):
+def get_liquidity_positions(web3, address, indexer=None):
     """
     Get all liquidity positions for a wallet
     
     Parameters:
     - web3: Web3 instance
     - address: Wallet address
+    - indexer: Optional EventIndexer; when given, positions come from the local index
     
     Returns:
     - List of position details
     """
     log_info(f"Fetching liquidity positions for {address}...")
     
+    if indexer is not None:
+        try:
+            indexer.sync()
+            positions = indexer.get_positions(address)
+            log_info(f"Found {len(positions)} liquidity positions in local index")
+            return positions
+        except Exception as e:
+            log_error(f"Local index unavailable, falling back to RPC: {str(e)}")
+    
     try:
         # Get position manager contract
         position_manager = web3.eth.contract(
@@ -458,33 +440,27 @@ def main():
     Main function to demonstrate usage
     """
     import sys
-    import os
-    from web3 import Web3
-    
-    # Connect to network
-    rpc_endpoint = "https://testnet.dplabs-internal.com"
-    web3 = Web3(Web3.HTTPProvider(rpc_endpoint))
     
-    # Check connection
-    if not web3.is_connected():
-        log_error("Failed to connect to RPC endpoint")
+    # Connect to network, failing over between the configured endpoints
+    try:
+        web3 = connect()
+    except Exception as e:
+        log_error(f"Failed to connect to RPC endpoint: {str(e)}")
         sys.exit(1)
     
     log_success("Connected to Pharos Network")
+    enable_read_cache(web3)
     
-    # Load private key
-    if not os.path.exists("private_key.txt"):
-        log_error("private_key.txt file not found")
+    # Load the first wallet (keystore or private_key.txt), decrypting only that one
+    wallets = WalletRegistry().load()
+    if not wallets:
+        log_error(f"No wallets found in {config.KEYSTORE_DIR}/ or private_key.txt")
         sys.exit(1)
         
-    with open("private_key.txt", "r") as f:
-        private_keys = [line.strip() for line in f if line.strip()]
-        
-    if not private_keys:
-        log_error("No private keys found in private_key.txt")
+    private_key = wallets.private_key(0)
+    if private_key is None:
+        log_error("Could not load the first wallet's private key")
         sys.exit(1)
-        
-    private_key = private_keys[0]
     account = web3.eth.account.from_key(private_key)
     address = account.address
     
@@ -500,16 +476,29 @@ def main():
     choice = input("\nEnter your choice (1-4): ")
     
     if choice == "1":
-        positions = get_liquidity_positions(web3, address)
+        indexer = EventIndexer(web3, [address])
+        positions = get_liquidity_positions(web3, address, indexer)
+        indexer.close()
         if positions:
             print("\nLiquidity Positions:")
+            # Amounts and uncollected fees for all positions, worked out locally from pool state
+            valuations = {v['token_id']: v for v in value_wallet_positions(web3, positions)}
+            tokens = token_registry_for(web3)
+            tokens.load([pos['token0'] for pos in positions] + [pos['token1'] for pos in positions])
             for pos in positions:
                 print(f"Position #{pos['token_id']}: {pos['liquidity']} liquidity units")
+                valuation = valuations.get(pos['token_id'])
+                if valuation:
+                    status = "in range" if valuation['in_range'] else "out of range"
+                    print(f"  Amounts: {tokens.format(pos['token0'], valuation['amount0'])} + {tokens.format(pos['token1'], valuation['amount1'])} ({status})")
+                    print(f"  Uncollected fees: {tokens.format(pos['token0'], valuation['fees0'])} + {tokens.format(pos['token1'], valuation['fees1'])}")
     
     elif choice == "2":
         amount = float(input("Enter USDC amount to add: "))
         range_type = input("Select range type (full/narrow/custom) [full]: ") or "full"
-        result = add_liquidity(web3, private_key, amount, range_type)
+        simulator = TransactionSimulator(web3) if config.SIMULATE_TRANSACTIONS else None
+        permit_signer = PermitSigner(web3) if config.USE_PERMIT else None
+        result = add_liquidity(web3, private_key, amount, range_type, simulator=simulator, permit_signer=permit_signer)
         if result:
             log_success(f"Liquidity added successfully: {result}")
     
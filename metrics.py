@@ -0,0 +1,51 @@
+import json
+import threading
+
+
+class Metrics:
+    """Process-wide counters and gauges, each optionally split by a label (usually an endpoint)"""
+    def __init__(self):
+        self._counters = {}
+        self._gauges = {}
+        self._lock = threading.Lock()
+
+    def incr(self, name, label=None, value=1):
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[label] = series.get(label, 0) + value
+
+    def set_gauge(self, name, value, label=None):
+        with self._lock:
+            self._gauges.setdefault(name, {})[label] = value
+
+    def snapshot(self):
+        """Dict with 'counters' and 'gauges', each name -> {label: value}"""
+        with self._lock:
+            return {
+                "counters": {name: dict(series) for name, series in self._counters.items()},
+                "gauges": {name: dict(series) for name, series in self._gauges.items()},
+            }
+
+    def summary_lines(self):
+        """One 'name[label] = value' line per series, for end-of-run logs"""
+        snapshot = self.snapshot()
+        lines = []
+        for kind in ("counters", "gauges"):
+            for name in sorted(snapshot[kind]):
+                for label, value in sorted(snapshot[kind][name].items(), key=lambda item: str(item[0])):
+                    if isinstance(value, float):
+                        value = round(value, 2)
+                    lines.append(f"{name}[{label}] = {value}" if label is not None else f"{name} = {value}")
+        return lines
+
+    def write(self, path):
+        """Dump the snapshot as JSON (labels become string keys)"""
+        snapshot = self.snapshot()
+        for kind in snapshot.values():
+            for name in kind:
+                kind[name] = {str(label): value for label, value in kind[name].items()}
+        with open(path, "w") as f:
+            json.dump(snapshot, f, indent=2)
+
+
+metrics = Metrics()
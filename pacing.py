@@ -0,0 +1,180 @@
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import config
+from metrics import metrics
+
+
+# Wallet threads write whole lines and boxes under one lock, so output from side-by-side wallets never
+# splits mid-line, and tag their log lines with the wallet they belong to
+_output_lock = threading.Lock()
+_thread_wallet = threading.local()
+
+
+def set_wallet_label(label):
+    """Tag this thread's log lines with label (e.g. 'W2 0x12ab34cd'); None removes the tag"""
+    _thread_wallet.label = label
+
+
+def wallet_label():
+    """This thread's wallet tag followed by a space, '' when it has none"""
+    label = getattr(_thread_wallet, "label", None)
+    return f"[{label}] " if label else ""
+
+
+def write_lines(*lines):
+    """Write lines in one go, without lines of other wallet threads in between"""
+    text = "".join(f"{line}\n" for line in lines)
+    with _output_lock:
+        sys.stdout.write(text)
+        sys.stdout.flush()
+
+
+def log_info(message):
+    timestamp = datetime.now().strftime("%H:%M:%S")
+    print(f"[{timestamp}] [INFO] ℹ️  {message}")
+
+
+def log_error(message):
+    timestamp = datetime.now().strftime("%H:%M:%S")
+    print(f"[{timestamp}] [ERROR] ❌ {message}")
+
+
+class TokenBucket:
+    """
+    Refills rate tokens per second up to capacity; every operation takes one
+
+    With jitter, each operation costs a random 1 - jitter .. 1 + jitter tokens instead, so the
+    spacing varies while the average rate stays at rate. The bucket starts full: the first
+    operations go straight through, like the first transaction of a run always did.
+    """
+    def __init__(self, name, rate, capacity=1, jitter=0):
+        self.name = name
+        self.rate = rate
+        self.jitter = jitter
+        self.capacity = capacity + jitter
+        self.tokens = self.capacity
+        self._cost = self._draw_cost()
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _draw_cost(self):
+        return random.uniform(1 - self.jitter, 1 + self.jitter) if self.jitter else 1
+
+    def try_take(self):
+        """Take a token if one is there; returns 0 on success, otherwise seconds until one will be"""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self.tokens >= self._cost:
+                self.tokens -= self._cost
+                self._cost = self._draw_cost()
+                return 0
+            return (self._cost - self.tokens) / self.rate
+
+    def take(self):
+        """Take a token, waiting for it; returns the seconds waited"""
+        waited = 0
+        while True:
+            wait = self.try_take()
+            if not wait:
+                return waited
+            time.sleep(wait)
+            waited += wait
+
+
+class PacingScheduler:
+    """
+    Runs wallet jobs side by side and paces their operations with token buckets
+
+    Instead of sleeping a fixed time after every operation, a wallet takes a token from its own
+    bucket (one per interval, so it never averages more than the old fixed spacing allowed) and
+    from the bucket of the RPC endpoint it sends through (shared by all wallets). Time an operation
+    spends waiting for its receipt counts towards the interval, and while one wallet waits for a
+    token the other workers keep running their wallets. Wallet starts are spaced by their own bucket.
+    """
+    def __init__(self, workers=None, wallet_interval=None, endpoint_rate=None, endpoint_burst=None):
+        self.workers = max(1, workers or config.PACING_WORKERS)
+        if wallet_interval is None:
+            wallet_interval = config.WALLET_START_INTERVAL
+        self.wallet_starts = self._bucket("wallet starts", wallet_interval)
+        self.endpoint_rate = endpoint_rate or config.ENDPOINT_OPS_PER_SECOND
+        self.endpoint_burst = endpoint_burst or config.ENDPOINT_OPS_BURST
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self._start_lock = threading.Lock()  # wallets start in the order they were queued
+
+    @staticmethod
+    def _bucket(name, interval, jitter=0):
+        return TokenBucket(name, 1 / interval, jitter=jitter) if interval and interval > 0 else None
+
+    def _bucket_for(self, key, factory):
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = factory()
+                self._buckets[key] = bucket
+            return bucket
+
+    def pace(self, key, interval, endpoint=None, jitter=0):
+        """
+        Wait until the next operation of key (e.g. (wallet address, 'swap')) may start
+
+        Parameters:
+        - key: Operation stream, one bucket each
+        - interval: Average seconds between its operations (0 or less: not paced)
+        - endpoint: RPC endpoint the operation goes through, paced across all wallets
+        - jitter: Spread of the spacing, e.g. 0.2 for 0.8-1.2x the interval
+
+        Returns:
+        - Seconds waited
+        """
+        waited = 0
+        if interval and interval > 0:
+            bucket = self._bucket_for(("op", key), lambda: self._bucket(str(key), interval, jitter))
+            waited += bucket.take()
+        if endpoint is not None and self.endpoint_rate:
+            bucket = self._bucket_for(
+                ("endpoint", endpoint), lambda: TokenBucket(endpoint, self.endpoint_rate, self.endpoint_burst)
+            )
+            waited += bucket.take()
+        if waited:
+            metrics.incr("pacing.waits", str(key[1]) if isinstance(key, tuple) else None)
+            metrics.incr("pacing.wait_seconds", value=waited)
+        return waited
+
+    def _start(self, job, index):
+        set_wallet_label(None)  # pool threads are reused, the previous wallet's tag goes with it
+        if self.wallet_starts is not None:
+            with self._start_lock:
+                waited = self.wallet_starts.take()
+            if waited:
+                log_info(f"Wallet {index + 1} starts after {waited:.1f}s of wallet spacing")
+        return job()
+
+    def run(self, jobs):
+        """
+        Run wallet jobs (callables), up to workers at a time
+
+        Returns:
+        - Their results in job order; a job that raised gives None
+        """
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="wallet") as executor:
+            futures = [executor.submit(self._start, job, index) for index, job in enumerate(jobs)]
+            results = []
+            for future in futures:
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    log_error(f"Wallet job failed: {str(e)}")
+                    results.append(None)
+        return results
+
+
+def endpoint_of(web3):
+    """Endpoint the provider currently sends through (the pool's active one), for per-endpoint pacing"""
+    return getattr(web3.provider, "endpoint_uri", None)
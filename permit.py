@@ -0,0 +1,204 @@
+import time
+from datetime import datetime
+from web3 import Web3, Account
+import config
+from rpc_batch import batch_eth_call, encode_call
+
+# Handle different eth-account versions
+try:
+    from eth_account.messages import encode_typed_data
+except ImportError:
+    from eth_account.messages import encode_structured_data
+
+    def encode_typed_data(full_message):
+        return encode_structured_data(primitive=full_message)
+
+EIP712_DOMAIN_TYPEHASH = bytes(Web3.keccak(
+    text="EIP712Domain(string name,string version,uint256 chainId,address verifyingContract)"
+))
+
+# Versions tried when the token has no version() getter
+DEFAULT_PERMIT_VERSIONS = ("1", "2")
+
+# (chain_id, token) -> (name, version), or None when the token has no usable EIP-2612 permit.
+# Shared by every signer so the support check runs once per token per process.
+_domain_cache = {}
+
+
+def log_info(message):
+    timestamp = datetime.now().strftime("%H:%M:%S")
+    print(f"[{timestamp}] [INFO] ℹ️  {message}")
+
+def _decode_string(data):
+    """Decode an ABI-encoded string return value, None if it does not look like one"""
+    if not data or len(data) < 64:
+        return None
+    offset = int.from_bytes(data[:32], "big")
+    if offset + 32 > len(data):
+        return None
+    length = int.from_bytes(data[offset:offset + 32], "big")
+    raw = data[offset + 32:offset + 32 + length]
+    if len(raw) != length:
+        return None
+    try:
+        return raw.decode("utf-8")
+    except UnicodeDecodeError:
+        return None
+
+def domain_separator(name, version, chain_id, token):
+    """EIP-712 domain separator as computed by OpenZeppelin-style ERC20Permit tokens"""
+    encoded = (
+        EIP712_DOMAIN_TYPEHASH
+        + bytes(Web3.keccak(text=name))
+        + bytes(Web3.keccak(text=version))
+        + chain_id.to_bytes(32, "big")
+        + bytes(12) + bytes.fromhex(token[2:])
+    )
+    return bytes(Web3.keccak(encoded))
+
+
+class PermitSigner:
+    """Signs EIP-2612 permits so a first-time approval can ride inside a router or position manager multicall"""
+    def __init__(self, web3, chain_id=None):
+        self.web3 = web3
+        self.chain_id = chain_id or config.CHAIN_ID
+
+    def _token_contract(self, token):
+        return self.web3.eth.contract(
+            address=self.web3.to_checksum_address(token),
+            abi=config.ERC20_PERMIT_ABI
+        )
+
+    def _nonce_call(self, contract, owner):
+        return {"to": contract.address, "data": encode_call(contract, "nonces", [owner])}
+
+    def load_domain(self, token, owner):
+        """
+        Check permit support for a token and read the owner's permit nonce
+
+        Parameters:
+        - token: Token address
+        - owner: Wallet address that will sign the permit
+
+        Returns:
+        - Tuple of (name, version, nonce), or None when the token does not support EIP-2612
+        """
+        contract = self._token_contract(token)
+        owner = self.web3.to_checksum_address(owner)
+        key = (self.chain_id, token.lower())
+
+        if key in _domain_cache:
+            domain = _domain_cache[key]
+            if domain is None:
+                return None
+            nonce_data = batch_eth_call(self.web3, [self._nonce_call(contract, owner)])[0]
+            if not nonce_data or len(nonce_data) < 32:
+                return None
+            return domain[0], domain[1], int.from_bytes(nonce_data[:32], "big")
+
+        # name, version, DOMAIN_SEPARATOR and nonces in one round trip
+        calls = [
+            {"to": contract.address, "data": encode_call(contract, "name", [])},
+            {"to": contract.address, "data": encode_call(contract, "version", [])},
+            {"to": contract.address, "data": encode_call(contract, "DOMAIN_SEPARATOR", [])},
+            self._nonce_call(contract, owner),
+        ]
+        name_data, version_data, separator_data, nonce_data = batch_eth_call(self.web3, calls)
+
+        name = _decode_string(name_data)
+        if name is None or not separator_data or len(separator_data) < 32 or not nonce_data or len(nonce_data) < 32:
+            _domain_cache[key] = None
+            return None
+
+        version = _decode_string(version_data)
+        versions = (version,) if version is not None else DEFAULT_PERMIT_VERSIONS
+
+        # Only trust the permit when our domain matches the token's, otherwise the signature
+        # would be rejected on-chain and take the whole multicall down with it
+        domain = None
+        for candidate in versions:
+            if domain_separator(name, candidate, self.chain_id, contract.address) == separator_data[:32]:
+                domain = (name, candidate)
+                break
+
+        _domain_cache[key] = domain
+        if domain is None:
+            return None
+        return domain[0], domain[1], int.from_bytes(nonce_data[:32], "big")
+
+    def sign_permit(self, private_key, token, spender, value, deadline=None):
+        """
+        Sign an EIP-2612 permit off-chain
+
+        Parameters:
+        - private_key: Wallet private key
+        - token: Token address
+        - spender: Contract that will be allowed to spend (router or position manager)
+        - value: Allowance to grant in base units
+        - deadline: Unix timestamp the permit expires at (default now + PERMIT_DEADLINE)
+
+        Returns:
+        - Dict with 'token', 'value', 'deadline', 'v', 'r', 's', or None when the token does not support permit
+        """
+        account = Account.from_key(private_key)
+        try:
+            domain = self.load_domain(token, account.address)
+        except Exception:
+            return None
+        if domain is None:
+            return None
+
+        name, version, nonce = domain
+        deadline = deadline or int(time.time()) + config.PERMIT_DEADLINE
+        token = self.web3.to_checksum_address(token)
+        spender = self.web3.to_checksum_address(spender)
+
+        typed_data = {
+            "types": {
+                "EIP712Domain": [
+                    {"name": "name", "type": "string"},
+                    {"name": "version", "type": "string"},
+                    {"name": "chainId", "type": "uint256"},
+                    {"name": "verifyingContract", "type": "address"},
+                ],
+                "Permit": [
+                    {"name": "owner", "type": "address"},
+                    {"name": "spender", "type": "address"},
+                    {"name": "value", "type": "uint256"},
+                    {"name": "nonce", "type": "uint256"},
+                    {"name": "deadline", "type": "uint256"},
+                ],
+            },
+            "primaryType": "Permit",
+            "domain": {
+                "name": name,
+                "version": version,
+                "chainId": self.chain_id,
+                "verifyingContract": token,
+            },
+            "message": {
+                "owner": account.address,
+                "spender": spender,
+                "value": value,
+                "nonce": nonce,
+                "deadline": deadline,
+            },
+        }
+
+        signed = Account.sign_message(encode_typed_data(full_message=typed_data), private_key=private_key)
+        log_info(f"Signed permit for {token} (nonce {nonce}), approval will be bundled into the transaction")
+        return {
+            "token": token,
+            "value": value,
+            "deadline": deadline,
+            "v": signed.v,
+            "r": signed.r.to_bytes(32, "big"),
+            "s": signed.s.to_bytes(32, "big"),
+        }
+
+
+def self_permit_call(contract, permit):
+    """Calldata for selfPermit on a router or position manager, to be placed ahead of the call that spends"""
+    return encode_call(contract, "selfPermit", [
+        permit["token"], permit["value"], permit["deadline"], permit["v"], permit["r"], permit["s"]
+    ])
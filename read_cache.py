@@ -0,0 +1,101 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+import config
+from confirmations import head_watcher_for
+from metrics import metrics
+
+# Reads whose answer can only change with a new block
+CACHEABLE_METHODS = ("eth_call", "eth_getBalance", "eth_gasPrice", "eth_getCode", "eth_getStorageAt", "eth_getTransactionCount")
+
+# Same for every block
+CONSTANT_METHODS = ("eth_chainId", "net_version")
+
+
+def _encode(value):
+    if isinstance(value, (bytes, bytearray)):
+        return "0x" + bytes(value).hex()
+    return str(value)
+
+
+class ReadCache:
+    """
+    Read-through cache for state queries, keyed by (block number, method, params)
+
+    Entries only live for the block they were read in: every new head empties the cache.
+    Reads against 'pending' state are never cached. Size is bounded with LRU eviction.
+    """
+    def __init__(self, head_watcher, max_entries=None):
+        self.heads = head_watcher
+        self.max_entries = max_entries or config.READ_CACHE_SIZE
+        self._entries = OrderedDict()
+        self._block = None
+        self._checked_at = 0
+        self._lock = threading.Lock()
+        head_watcher.on_new_head(self.on_new_head)
+
+    def on_new_head(self, block_number):
+        with self._lock:
+            if self._block is not None and block_number <= self._block:
+                return
+            # Constants survive, everything else belongs to an older block
+            self._entries = OrderedDict(
+                (key, value) for key, value in self._entries.items() if key[0] is None
+            )
+            self._block = block_number
+            metrics.set_gauge("read_cache.entries", len(self._entries))
+
+    def _current_block(self):
+        if self.heads.ws_connected:
+            return self.heads.block_number
+        # Without push notifications, look at the head at most once per poll interval
+        now = time.time()
+        if now - self._checked_at >= self.heads.poll_interval:
+            self._checked_at = now
+            self.heads.poll()
+        return self.heads.block_number
+
+    def key(self, method, params):
+        """Cache key for a request, None when it must go to the node"""
+        if method in CONSTANT_METHODS:
+            return (None, method, "")
+        if method not in CACHEABLE_METHODS:
+            return None
+        if any(param == "pending" for param in params or []):
+            return None
+        block = self._current_block()
+        if block is None:
+            return None
+        return (block, method, json.dumps(list(params or []), sort_keys=True, default=_encode))
+
+    def get(self, key):
+        with self._lock:
+            response = self._entries.get(key)
+            if response is None:
+                metrics.incr("read_cache.misses", key[1])
+                return None
+            self._entries.move_to_end(key)
+        metrics.incr("read_cache.hits", key[1])
+        return dict(response)
+
+    def put(self, key, response):
+        with self._lock:
+            # A read that finished after a new head arrived belongs to the old block
+            if key[0] is not None and self._block is not None and key[0] < self._block:
+                return
+            self._entries[key] = dict(response)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                metrics.incr("read_cache.evictions")
+            metrics.set_gauge("read_cache.entries", len(self._entries))
+
+
+def enable_read_cache(web3):
+    """Put a block-scoped read cache under web3 (needs a provider with a read_cache slot, e.g. the RPC pool)"""
+    if not config.USE_READ_CACHE or not hasattr(web3.provider, "read_cache"):
+        return None
+    if web3.provider.read_cache is None:
+        web3.provider.read_cache = ReadCache(head_watcher_for(web3))
+    return web3.provider.read_cache
@@ -0,0 +1,150 @@
+import hashlib
+import mmap
+import os
+import random
+import re
+import struct
+from web3 import Web3
+import config
+
+# Cache layout: fixed header followed by one 20-byte record per valid address
+CACHE_MAGIC = b"RCP1"
+HEADER = struct.Struct(">4sQQ32sQQ")  # magic, source mtime_ns, source size, source sha256, count, invalid count
+HEADER_SIZE = HEADER.size
+RECORD_SIZE = 20
+
+ADDRESS_PATTERN = re.compile(rb"^(?:0x|0X)?([0-9a-fA-F]{40})$")
+
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.digest()
+
+
+class RecipientStore:
+    """Validated recipient addresses kept as packed 20-byte records in a memory-mapped cache"""
+    def __init__(self, source="recipients.txt", cache_file=None):
+        self.source = source
+        self.cache_file = cache_file or config.RECIPIENTS_CACHE_FILE
+        self.count = 0
+        self.invalid_count = 0
+        self.invalid_samples = []  # only filled when the cache is rebuilt
+        self.rebuilt = False
+        self._file = None
+        self._map = None
+        self._cursor = 0
+
+    def _read_header(self):
+        if not os.path.exists(self.cache_file):
+            return None
+        try:
+            with open(self.cache_file, "rb") as f:
+                raw = f.read(HEADER_SIZE)
+        except OSError:
+            return None
+        if len(raw) < HEADER_SIZE:
+            return None
+        header = HEADER.unpack(raw)
+        if header[0] != CACHE_MAGIC:
+            return None
+        if os.path.getsize(self.cache_file) != HEADER_SIZE + header[4] * RECORD_SIZE:
+            return None
+        return header
+
+    def _write_header(self, f, stat, digest, count, invalid_count):
+        f.seek(0)
+        f.write(HEADER.pack(CACHE_MAGIC, stat.st_mtime_ns, stat.st_size, digest, count, invalid_count))
+
+    def _cache_is_fresh(self, stat):
+        header = self._read_header()
+        if header is None:
+            return False
+        _, mtime_ns, size, digest, _, _ = header
+        if mtime_ns == stat.st_mtime_ns and size == stat.st_size:
+            return True
+
+        # Touched but maybe not changed: compare content hashes before rebuilding
+        if size != stat.st_size or _file_sha256(self.source) != digest:
+            return False
+        with open(self.cache_file, "r+b") as f:
+            self._write_header(f, stat, digest, header[4], header[5])
+        return True
+
+    def _rebuild(self, stat):
+        """Validate the source once and write the packed cache (atomically replaced)"""
+        digest = hashlib.sha256()
+        count = 0
+        invalid_count = 0
+        self.invalid_samples = []
+        tmp_path = self.cache_file + ".tmp"
+
+        with open(self.source, "rb") as source, open(tmp_path, "wb") as out:
+            out.write(b"\0" * HEADER_SIZE)
+            for line in source:
+                digest.update(line)
+                line = line.strip()
+                if not line:
+                    continue
+                match = ADDRESS_PATTERN.match(line)
+                if match is None:
+                    invalid_count += 1
+                    if len(self.invalid_samples) < 5:
+                        self.invalid_samples.append(line.decode("utf-8", errors="replace"))
+                    continue
+                out.write(bytes.fromhex(match.group(1).decode()))
+                count += 1
+            self._write_header(out, stat, digest.digest(), count, invalid_count)
+
+        os.replace(tmp_path, self.cache_file)
+        self.rebuilt = True
+
+    def load(self):
+        """Open the cache, rebuilding it first when recipients.txt changed"""
+        self.close()
+        stat = os.stat(self.source)
+        if not self._cache_is_fresh(stat):
+            self._rebuild(stat)
+
+        header = self._read_header()
+        self.count = header[4]
+        self.invalid_count = header[5]
+        self._file = open(self.cache_file, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        return self
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __len__(self):
+        return self.count
+
+    def raw(self, index):
+        """20-byte address at index"""
+        if not 0 <= index < self.count:
+            raise IndexError("recipient index out of range")
+        start = HEADER_SIZE + index * RECORD_SIZE
+        return self._map[start:start + RECORD_SIZE]
+
+    def __getitem__(self, index):
+        # Checksummed only when an address is actually used
+        if index < 0:
+            index += self.count
+        return Web3.to_checksum_address("0x" + self.raw(index).hex())
+
+    def random(self):
+        """Uniformly random recipient"""
+        return self[random.randrange(self.count)]
+
+    def next(self):
+        """Next recipient in file order, wrapping around at the end"""
+        address = self[self._cursor]
+        self._cursor = (self._cursor + 1) % self.count
+        return address
@@ -0,0 +1,328 @@
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+import config
+from metrics import metrics
+
+# Circuit breaker states
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+# Request outcomes reported to the adaptive limiter
+SUCCESS = "success"
+OVERLOAD = "overload"
+ERROR = "error"
+
+TIMEOUT_EXCEPTION_NAMES = ("Timeout", "ReadTimeout", "ConnectTimeout")
+
+
+class CircuitOpenError(ConnectionError):
+    """Raised instead of calling an endpoint whose breaker is open"""
+
+
+def backoff_delay(attempt, base=None, cap=None):
+    """
+    Full-jitter exponential backoff: uniform in [0, min(cap, base * 2^attempt)]
+
+    Parameters:
+    - attempt: Retry number, starting at 0
+    - base: First backoff ceiling in seconds (default BACKOFF_BASE)
+    - cap: Largest backoff ceiling in seconds (default BACKOFF_CAP)
+    """
+    base = config.BACKOFF_BASE if base is None else base
+    cap = config.BACKOFF_CAP if cap is None else cap
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def retry_after_seconds(response):
+    """Seconds from a Retry-After header (delta or HTTP date), capped at RETRY_AFTER_MAX; None if absent"""
+    headers = getattr(response, "headers", None) or {}
+    value = headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            seconds = parsedate_to_datetime(value).timestamp() - time.time()
+        except (TypeError, ValueError):
+            return None
+    return min(max(seconds, 0), config.RETRY_AFTER_MAX)
+
+
+def is_overload_error(error):
+    """Errors that mean 'slow down' rather than 'broken': timeouts and HTTP 429/503"""
+    if isinstance(error, TimeoutError) or type(error).__name__ in TIMEOUT_EXCEPTION_NAMES:
+        return True
+    status_code = getattr(getattr(error, "response", None), "status_code", None)
+    return status_code in (429, 503)
+
+
+def is_transient_response(response):
+    """HTTP answers worth retrying: rate limited or a server-side error"""
+    return response.status_code == 429 or response.status_code >= 500
+
+
+class CircuitBreaker:
+    """
+    Health of one endpoint
+
+    Closed passes every call. After failure_threshold failures in a row it opens and rejects
+    calls for reset_timeout seconds, then lets a single probe through (half-open). A good
+    probe closes it again, a bad one reopens it, an overloaded one (see release_probe) makes
+    way for the next probe.
+    """
+    def __init__(self, name, failure_threshold=None, reset_timeout=None):
+        self.name = name
+        self.failure_threshold = failure_threshold or config.BREAKER_FAILURE_THRESHOLD
+        self.reset_timeout = reset_timeout or config.BREAKER_RESET_TIMEOUT
+        self.failures = 0
+        self.opened_at = None
+        self._state = CLOSED
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._state == OPEN and time.time() - self.opened_at >= self.reset_timeout:
+                self._state = HALF_OPEN
+                self._probing = False
+            return self._state
+
+    def allow(self):
+        """True when a call may go to this endpoint now"""
+        state = self.state
+        with self._lock:
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def retry_after(self):
+        """Seconds until an open breaker lets a probe through (0 when it already would)"""
+        with self._lock:
+            if self._state != OPEN:
+                return 0
+            return max(0, self.opened_at + self.reset_timeout - time.time())
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self._state = CLOSED
+            self._probing = False
+
+    def release_probe(self):
+        """
+        Give back a half-open probe that got an overload answer (429, 503, timeout)
+
+        That says nothing about whether the endpoint works, so it neither closes nor reopens
+        the breaker; the next call may probe again. Without this the breaker would wait for
+        a success or failure that never comes and reject every call from then on.
+        """
+        with self._lock:
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._state == HALF_OPEN or self.failures >= self.failure_threshold:
+                self._state = OPEN
+                self.opened_at = time.time()
+                self._probing = False
+
+
+class RetryBudget:
+    """
+    Caps retries to a fraction of normal traffic, so an outage does not multiply the load
+
+    Every request deposits `ratio` tokens (up to `max_tokens`), every retry spends one.
+    """
+    def __init__(self, ratio=None, max_tokens=10):
+        self.ratio = config.RETRY_BUDGET_RATIO if ratio is None else ratio
+        self.max_tokens = max_tokens
+        self.tokens = max_tokens
+        self._lock = threading.Lock()
+
+    def record_request(self):
+        with self._lock:
+            self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def can_retry(self):
+        """Spend a token for a retry, False when the budget is used up"""
+        with self._lock:
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+
+class AdaptiveLimiter:
+    """
+    AIMD cap on in-flight requests to one endpoint
+
+    Each success raises the limit by 1/limit (about +1 per full window), an overload
+    (429, 503, timeout) halves it at most once per second and pauses new requests for the
+    Retry-After time (LIMITER_OVERLOAD_PAUSE without one). Limit and in-flight count are
+    published as metrics.
+    """
+    def __init__(self, name, initial=None, min_limit=None, max_limit=None):
+        self.name = name
+        self.min_limit = min_limit or config.LIMITER_MIN
+        self.max_limit = max_limit or config.LIMITER_MAX
+        self.limit = float(initial or config.LIMITER_INITIAL)
+        self.in_flight = 0
+        self.paused_until = 0
+        self._last_decrease = 0
+        self._cond = threading.Condition()
+        self._publish()
+
+    def _publish(self):
+        metrics.set_gauge("limiter.limit", self.limit, self.name)
+        metrics.set_gauge("limiter.in_flight", self.in_flight, self.name)
+
+    def _ready(self):
+        return time.time() >= self.paused_until and self.in_flight < int(self.limit)
+
+    def try_acquire(self):
+        """Take a request slot without waiting, False when the endpoint is saturated or paused"""
+        with self._cond:
+            if not self._ready():
+                return False
+            self.in_flight += 1
+            self._publish()
+            return True
+
+    def acquire(self):
+        """Take a request slot, waiting for a free one and for any Retry-After pause"""
+        with self._cond:
+            while not self._ready():
+                pause = self.paused_until - time.time()
+                if pause > 0:
+                    metrics.incr("limiter.paused_waits", self.name)
+                self._cond.wait(timeout=pause if pause > 0 else 1)
+            self.in_flight += 1
+            self._publish()
+
+    def release(self, outcome, retry_after=None):
+        """Give the slot back and adapt the limit to the outcome (SUCCESS, OVERLOAD or ERROR)"""
+        with self._cond:
+            self.in_flight -= 1
+            now = time.time()
+            if outcome == SUCCESS:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            elif outcome == OVERLOAD:
+                metrics.incr("limiter.overloads", self.name)
+                # Requests already in flight fail together, count them as one overload
+                if now - self._last_decrease >= 1:
+                    self.limit = max(self.min_limit, self.limit / 2)
+                    self._last_decrease = now
+                pause = retry_after if retry_after is not None else config.LIMITER_OVERLOAD_PAUSE
+                self.paused_until = max(self.paused_until, now + pause)
+            self._publish()
+            self._cond.notify_all()
+
+    def cancel(self):
+        """Give back a slot that was never used for a request"""
+        with self._cond:
+            self.in_flight -= 1
+            self._publish()
+            self._cond.notify_all()
+
+
+_breakers = {}
+_budgets = {}
+_limiters = {}
+_registry_lock = threading.Lock()
+
+
+def breaker_for(endpoint):
+    """Shared circuit breaker for an endpoint (RPC URL or API host)"""
+    with _registry_lock:
+        if endpoint not in _breakers:
+            _breakers[endpoint] = CircuitBreaker(endpoint)
+        return _breakers[endpoint]
+
+
+def budget_for(endpoint):
+    """Shared retry budget for an endpoint"""
+    with _registry_lock:
+        if endpoint not in _budgets:
+            _budgets[endpoint] = RetryBudget()
+        return _budgets[endpoint]
+
+
+def limiter_for(endpoint):
+    """Shared adaptive concurrency limiter for an endpoint"""
+    with _registry_lock:
+        if endpoint not in _limiters:
+            _limiters[endpoint] = AdaptiveLimiter(endpoint)
+        return _limiters[endpoint]
+
+
+def call_with_retry(endpoint, func, attempts=3, should_retry=None, on_retry=None):
+    """
+    Call func() through the endpoint's breaker and retry budget, with jittered backoff
+
+    Parameters:
+    - endpoint: Breaker/budget key, usually the host being called
+    - func: Callable doing one request
+    - attempts: Maximum number of calls
+    - should_retry: Optional callable(result) -> True when a returned result counts as a failure
+    - on_retry: Optional callable(attempt, error_or_result) run before each retry (e.g. rotate proxy)
+
+    Returns:
+    - The last result of func (an unsuccessful one when retries ran out)
+
+    Raises:
+    - CircuitOpenError when the breaker is open, or the last exception of func
+    """
+    breaker = breaker_for(endpoint)
+    budget = budget_for(endpoint)
+    limiter = limiter_for(endpoint)
+    budget.record_request()
+
+    for attempt in range(attempts):
+        if not breaker.allow():
+            raise CircuitOpenError(f"{endpoint} is unhealthy, retry in {breaker.retry_after():.0f}s")
+        # Waits here for a free slot, and until any Retry-After from the last answer has passed
+        limiter.acquire()
+        metrics.incr("http.requests", endpoint)
+        try:
+            outcome = func()
+        except Exception as e:
+            outcome = e
+            response = getattr(e, "response", None)
+            overloaded = is_overload_error(e)
+        else:
+            if should_retry is None or not should_retry(outcome):
+                breaker.record_success()
+                limiter.release(SUCCESS)
+                return outcome
+            response = outcome
+            overloaded = getattr(outcome, "status_code", None) in (429, 503)
+        metrics.incr("http.failures", endpoint)
+
+        retry_after = retry_after_seconds(response)
+        if overloaded:
+            # Slowing down is the limiter's job, the endpoint itself is not broken
+            limiter.release(OVERLOAD, retry_after)
+            breaker.release_probe()
+        else:
+            limiter.release(ERROR)
+            breaker.record_failure()
+
+        if attempt == attempts - 1 or not budget.can_retry():
+            break
+        if on_retry is not None:
+            on_retry(attempt, outcome)
+        if retry_after is None:
+            time.sleep(backoff_delay(attempt))
+
+    if isinstance(outcome, Exception):
+        raise outcome
+    return outcome
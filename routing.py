@@ -0,0 +1,225 @@
+import json
+import os
+import threading
+import time
+from datetime import datetime
+import config
+from rpc_batch import batch_eth_call, encode_call
+
+ZERO_ADDRESS = "0x0000000000000000000000000000000000000000"
+
+TOKEN_LABELS = {
+    config.WPHRS_ADDRESS.lower(): "WPHRS",
+    config.USDC_ADDRESS.lower(): "USDC",
+    config.USDT_ADDRESS.lower(): "USDT",
+}
+
+
+def log_info(message):
+    timestamp = datetime.now().strftime("%H:%M:%S")
+    print(f"[{timestamp}] [INFO] ℹ️  {message}")
+
+def log_error(message):
+    timestamp = datetime.now().strftime("%H:%M:%S")
+    print(f"[{timestamp}] [ERROR] ❌ {message}")
+
+def encode_path(tokens, fees):
+    """
+    Encode a Uniswap V3 swap path for exactInput
+
+    Parameters:
+    - tokens: List of token addresses along the route
+    - fees: List of pool fee tiers between consecutive tokens
+
+    Returns:
+    - Packed path bytes (token | fee | token | fee | ... | token)
+    """
+    if len(tokens) != len(fees) + 1:
+        raise ValueError("Path needs exactly one fee tier between each pair of tokens")
+
+    encoded = b""
+    for token, fee in zip(tokens, fees):
+        encoded += bytes.fromhex(token[2:]) + fee.to_bytes(3, "big")
+    return encoded + bytes.fromhex(tokens[-1][2:])
+
+def describe_route(route):
+    """Readable form of a route, e.g. WPHRS -(500)-> USDT -(3000)-> USDC"""
+    labels = [TOKEN_LABELS.get(token.lower(), token[:8]) for token in route["tokens"]]
+    text = labels[0]
+    for label, fee in zip(labels[1:], route["fees"]):
+        text += f" -({fee})-> {label}"
+    return text
+
+def _pool_key(token_a, token_b, fee):
+    token_a, token_b = sorted((token_a.lower(), token_b.lower()))
+    return (token_a, token_b, fee)
+
+
+class RouteFinder:
+    """Builds a graph of known V3 pools and picks the best-quoted path for a swap"""
+    def __init__(self, web3, tokens=None, fee_tiers=None, max_hops=None, cache_file=None):
+        self.web3 = web3
+        self.tokens = [token.lower() for token in (tokens or config.ROUTE_TOKENS)]
+        self.fee_tiers = fee_tiers or config.FEE_TIERS
+        self.max_hops = max_hops or config.ROUTE_MAX_HOPS
+        self.cache_file = cache_file or config.ROUTE_CACHE_FILE
+        self.pools = {}  # (token_a, token_b, fee) -> pool address, replaced whole, never changed in place
+        self._graph_lock = threading.RLock()  # wallet threads share one finder, only one of them loads the graph
+        self.factory = web3.eth.contract(
+            address=web3.to_checksum_address(config.FACTORY),
+            abi=config.FACTORY_ABI
+        )
+        self.quoter = web3.eth.contract(
+            address=web3.to_checksum_address(config.QUOTER),
+            abi=config.QUOTER_ABI
+        )
+
+    def _load_cache(self):
+        if not os.path.exists(self.cache_file):
+            return False
+        try:
+            with open(self.cache_file, "r") as f:
+                cached = json.load(f)
+        except Exception:
+            return False
+
+        if cached.get("chain_id") != config.CHAIN_ID:
+            return False
+        if time.time() - cached.get("updated", 0) > config.ROUTE_CACHE_TTL:
+            return False
+        if sorted(cached.get("tokens", [])) != sorted(self.tokens):
+            return False
+
+        self.pools = {
+            (token_a, token_b, fee): pool
+            for token_a, token_b, fee, pool in cached.get("pools", [])
+        }
+        return True
+
+    def _save_cache(self, pools):
+        try:
+            with open(self.cache_file, "w") as f:
+                json.dump({
+                    "chain_id": config.CHAIN_ID,
+                    "updated": int(time.time()),
+                    "tokens": self.tokens,
+                    "pools": [[a, b, fee, pool] for (a, b, fee), pool in pools.items()]
+                }, f, indent=2)
+        except Exception as e:
+            log_error(f"Failed to save route cache: {str(e)}")
+
+    def discover_pools(self):
+        """Query the factory for every token pair and fee tier in one batch"""
+        keys = []
+        calls = []
+        for i, token_a in enumerate(self.tokens):
+            for token_b in self.tokens[i + 1:]:
+                for fee in self.fee_tiers:
+                    keys.append(_pool_key(token_a, token_b, fee))
+                    calls.append({
+                        "to": self.factory.address,
+                        "data": encode_call(self.factory, "getPool", [
+                            self.web3.to_checksum_address(token_a),
+                            self.web3.to_checksum_address(token_b),
+                            fee
+                        ])
+                    })
+
+        # Built aside and swapped in at once, other threads may be walking the current graph
+        pools = {}
+        for key, result in zip(keys, batch_eth_call(self.web3, calls)):
+            if not result or len(result) < 32:
+                continue
+            pool = "0x" + result[12:32].hex()
+            if pool != ZERO_ADDRESS:
+                pools[key] = pool
+        self.pools = pools
+
+        log_info(f"Discovered {len(pools)} pools across {len(self.tokens)} tokens")
+        self._save_cache(pools)
+        return pools
+
+    def load_graph(self, force=False):
+        """Load the pool graph from disk, rediscovering it when stale or forced"""
+        with self._graph_lock:
+            if not force and self._load_cache():
+                return self.pools
+            return self.discover_pools()
+
+    def candidate_paths(self, token_in, token_out):
+        """Enumerate every (tokens, fees) path between two tokens within max_hops"""
+        pools = self.pools
+        if not pools:
+            with self._graph_lock:
+                # Another wallet thread may have loaded it while this one waited
+                pools = self.pools or self.load_graph()
+
+        token_in, token_out = token_in.lower(), token_out.lower()
+        edges = {}
+        for (token_a, token_b, fee) in pools:
+            edges.setdefault(token_a, []).append((token_b, fee))
+            edges.setdefault(token_b, []).append((token_a, fee))
+
+        paths = []
+
+        def walk(tokens, fees):
+            if len(fees) >= self.max_hops:
+                return
+            for next_token, fee in edges.get(tokens[-1], []):
+                if next_token in tokens:
+                    continue
+                if next_token == token_out:
+                    paths.append((tokens + [next_token], fees + [fee]))
+                else:
+                    walk(tokens + [next_token], fees + [fee])
+
+        walk([token_in], [])
+        return paths
+
+    def quote_paths(self, paths, amount_in):
+        """Quote all candidate paths with a single batched quoter request"""
+        calls = []
+        for tokens, fees in paths:
+            calls.append({
+                "to": self.quoter.address,
+                "data": encode_call(self.quoter, "quoteExactInput", [encode_path(tokens, fees), amount_in])
+            })
+
+        quotes = []
+        for result in batch_eth_call(self.web3, calls):
+            # amountOut is the first word for both Quoter and QuoterV2 return layouts
+            quotes.append(int.from_bytes(result[:32], "big") if result and len(result) >= 32 else None)
+        return quotes
+
+    def find_best_route(self, token_in, token_out, amount_in):
+        """
+        Find the path with the highest quoted output
+
+        Parameters:
+        - token_in: Address of the token being sold
+        - token_out: Address of the token being bought
+        - amount_in: Input amount in base units
+
+        Returns:
+        - Dict with 'tokens', 'fees', encoded 'path' and quoted 'amount_out', or None if no path quotes
+        """
+        paths = self.candidate_paths(token_in, token_out)
+        if not paths:
+            log_error(f"No known pools connect {token_in} and {token_out}")
+            return None
+
+        best = None
+        for (tokens, fees), amount_out in zip(paths, self.quote_paths(paths, amount_in)):
+            if not amount_out:
+                continue
+            if best is None or amount_out > best["amount_out"]:
+                best = {
+                    "tokens": [self.web3.to_checksum_address(token) for token in tokens],
+                    "fees": fees,
+                    "path": encode_path(tokens, fees),
+                    "amount_out": amount_out
+                }
+
+        if best is None:
+            log_error(f"None of the {len(paths)} candidate routes returned a quote")
+        return best
@@ -0,0 +1,96 @@
+import requests
+from tx_records import recorder
+
+
+def _provider_request_kwargs(provider):
+    """Reuse the provider's proxies/timeout settings for raw batch posts"""
+    get_kwargs = getattr(provider, "get_request_kwargs", None)
+    if get_kwargs is None:
+        return {"timeout": 30}
+    kwargs = dict(get_kwargs())
+    kwargs.setdefault("timeout", 30)
+    # The provider sets its own JSON content-type header
+    kwargs.pop("headers", None)
+    return kwargs
+
+
+def _format_block(block_identifier):
+    if isinstance(block_identifier, int):
+        return hex(block_identifier)
+    return block_identifier
+
+
+def _to_bytes(value):
+    if value is None:
+        return None
+    if isinstance(value, (bytes, bytearray)):
+        return bytes(value)
+    value = value[2:] if value.startswith("0x") else value
+    return bytes.fromhex(value)
+
+
+def _sequential_eth_call(web3, calls, block_identifier):
+    results = []
+    for call in calls:
+        try:
+            results.append(bytes(web3.eth.call(call, block_identifier)))
+        except Exception:
+            results.append(None)
+    return results
+
+
+def batch_eth_call(web3, calls, block_identifier="latest"):
+    """
+    Run several eth_call requests in a single JSON-RPC batch
+
+    Parameters:
+    - web3: Web3 instance (its HTTP endpoint and proxy settings are reused)
+    - calls: List of call dicts with 'to' and 'data' (and optionally 'from', 'value')
+    - block_identifier: Block tag or number to run the calls against
+
+    Returns:
+    - List of return data bytes in the same order as calls, None for calls that failed
+    """
+    if not calls:
+        return []
+
+    endpoint = getattr(web3.provider, "endpoint_uri", None)
+    if not endpoint:
+        return _sequential_eth_call(web3, calls, block_identifier)
+
+    block = _format_block(block_identifier)
+    payload = []
+    for request_id, call in enumerate(calls):
+        params = {key: value for key, value in call.items() if value is not None}
+        if isinstance(params.get("data"), (bytes, bytearray)):
+            params["data"] = "0x" + bytes(params["data"]).hex()
+        if isinstance(params.get("value"), int):
+            params["value"] = hex(params["value"])
+        payload.append({"jsonrpc": "2.0", "id": request_id, "method": "eth_call", "params": [params, block]})
+
+    recorder.count_rpc_call()
+    try:
+        response = requests.post(str(endpoint), json=payload, **_provider_request_kwargs(web3.provider))
+        response.raise_for_status()
+        answers = response.json()
+    except Exception:
+        # Some endpoints reject batches outright, fall back to one call at a time
+        return _sequential_eth_call(web3, calls, block_identifier)
+
+    if not isinstance(answers, list):
+        return _sequential_eth_call(web3, calls, block_identifier)
+
+    results = [None] * len(calls)
+    for answer in answers:
+        request_id = answer.get("id")
+        if isinstance(request_id, int) and 0 <= request_id < len(calls) and "result" in answer:
+            results[request_id] = _to_bytes(answer["result"])
+    return results
+
+
+def encode_call(contract, fn_name, args):
+    """Encode calldata for a contract function across web3.py versions"""
+    # Handle different web3.py versions
+    if hasattr(contract, "encode_abi"):
+        return contract.encode_abi(fn_name, args=args)
+    return contract.encodeABI(fn_name=fn_name, args=args)
@@ -0,0 +1,254 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from web3 import Web3
+from web3.providers import JSONBaseProvider
+import config
+from metrics import metrics
+from tx_records import recorder
+from resilience import (
+    CircuitOpenError, OPEN, SUCCESS, OVERLOAD, ERROR,
+    breaker_for, budget_for, limiter_for, backoff_delay, retry_after_seconds, is_overload_error
+)
+
+# JSON-RPC error codes that mean the endpoint itself is struggling, not the request
+ENDPOINT_ERROR_CODES = (-32005, 429)
+
+# Shared by all pools; fan-out sends that lose the race finish here in the background
+_fanout_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="rpc-fanout")
+
+
+def _completed(futures, errors):
+    """Responses in completion order; transport errors are collected in errors"""
+    for future in as_completed(futures):
+        try:
+            yield future.result()
+        except Exception as e:
+            errors.append(e)
+
+
+def _already_known(error):
+    message = str(error.get("message", "")).lower()
+    return "already known" in message or "known transaction" in message
+
+
+def log_info(message):
+    timestamp = datetime.now().strftime("%H:%M:%S")
+    print(f"[{timestamp}] [INFO] ℹ️  {message}")
+
+
+class PooledHTTPProvider(JSONBaseProvider):
+    """
+    Web3 provider over several RPC endpoints with a circuit breaker and an adaptive
+    concurrency limiter per endpoint
+
+    Requests go to the first endpoint whose breaker allows it and that has a free limiter
+    slot. A connection or HTTP error counts against that endpoint's breaker; a 429, 503,
+    rate-limit answer or timeout lowers its limit and pauses it (for Retry-After if given).
+    Either way the request moves straight on to the next endpoint; it only waits when
+    every endpoint is saturated, and only sleeps (with jittered backoff) once every
+    endpoint has been tried in a round.
+    """
+    def __init__(self, endpoints=None, request_kwargs=None, rounds=3):
+        super().__init__()
+        self.endpoints = list(endpoints or config.RPC_ENDPOINTS)
+        if not self.endpoints:
+            raise ValueError("PooledHTTPProvider needs at least one endpoint")
+        self.request_kwargs = dict(request_kwargs or {})
+        self.request_kwargs.setdefault('timeout', 60)
+        self.rounds = rounds
+        self.providers = {
+            endpoint: Web3.HTTPProvider(endpoint, request_kwargs=self.request_kwargs)
+            for endpoint in self.endpoints
+        }
+        self.active = self.endpoints[0]
+        self.read_cache = None  # set by read_cache.enable_read_cache
+
+    def _key(self, endpoint):
+        # A dead proxy says nothing about the endpoint, so proxied traffic has its own breakers
+        proxies = self.request_kwargs.get('proxies')
+        if proxies:
+            return f"{endpoint} via {proxies.get('https') or proxies.get('http')}"
+        return endpoint
+
+    @property
+    def endpoint_uri(self):
+        """Endpoint that served the last successful request (used by raw batch posts)"""
+        return self.active
+
+    def get_request_kwargs(self):
+        return self.providers[self.active].get_request_kwargs()
+
+    def _attempt(self, endpoint, limiter, method, params):
+        """One request on an endpoint whose limiter slot is held, returns (response, error)"""
+        key = self._key(endpoint)
+        breaker = breaker_for(key)
+        budget_for(key).record_request()
+        metrics.incr("rpc.requests", key)
+        recorder.count_rpc_call()
+        try:
+            response = self.providers[endpoint].make_request(method, params)
+        except Exception as e:
+            metrics.incr("rpc.failures", key)
+            if is_overload_error(e):
+                limiter.release(OVERLOAD, retry_after_seconds(getattr(e, "response", None)))
+                breaker.release_probe()
+            else:
+                limiter.release(ERROR)
+                breaker.record_failure()
+            return None, e
+
+        error = response.get("error") if isinstance(response, dict) else None
+        if isinstance(error, dict) and error.get("code") in ENDPOINT_ERROR_CODES:
+            metrics.incr("rpc.failures", key)
+            limiter.release(OVERLOAD)
+            breaker.release_probe()
+            return None, ConnectionError(f"{endpoint}: {error.get('message')}")
+
+        breaker.record_success()
+        limiter.release(SUCCESS)
+        return response, None
+
+    def make_request(self, method, params):
+        cache_key = self.read_cache.key(method, params) if self.read_cache is not None else None
+        if cache_key is not None:
+            cached = self.read_cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        response = self._request(method, params)
+        if cache_key is not None and isinstance(response, dict) and "error" not in response:
+            self.read_cache.put(cache_key, response)
+        return response
+
+    def _request(self, method, params):
+        last_error = None
+        for round_index in range(self.rounds):
+            # The endpoint that worked last goes first, the rest keep their configured order
+            ordered = [self.active] + [endpoint for endpoint in self.endpoints if endpoint != self.active]
+            attempts = []
+            saturated = []
+            for endpoint in ordered:
+                limiter = limiter_for(self._key(endpoint))
+                if not limiter.try_acquire():
+                    saturated.append(endpoint)
+                    continue
+                if not breaker_for(self._key(endpoint)).allow():
+                    limiter.cancel()
+                    continue
+                attempts.append(endpoint)
+                response, error = self._attempt(endpoint, limiter, method, params)
+                if error is None:
+                    if endpoint != self.active:
+                        log_info(f"RPC requests moved to {endpoint}")
+                        self.active = endpoint
+                    return response
+                last_error = error
+
+            if not attempts:
+                # Every usable endpoint is at its concurrency limit or paused by Retry-After: queue on one
+                for endpoint in saturated:
+                    key = self._key(endpoint)
+                    if breaker_for(key).state == OPEN:
+                        continue
+                    limiter = limiter_for(key)
+                    limiter.acquire()
+                    if not breaker_for(key).allow():
+                        limiter.cancel()
+                        continue
+                    attempts.append(endpoint)
+                    response, error = self._attempt(endpoint, limiter, method, params)
+                    if error is None:
+                        self.active = endpoint
+                        return response
+                    last_error = error
+                    break
+
+            if round_index == self.rounds - 1:
+                break
+            if not attempts:
+                # Everything is open: wait for the first breaker to allow a probe
+                wait = min(breaker_for(self._key(endpoint)).retry_after() for endpoint in self.endpoints)
+                time.sleep(min(wait, config.BACKOFF_CAP) + backoff_delay(0))
+            elif not budget_for(self._key(self.active)).can_retry():
+                break
+            else:
+                time.sleep(backoff_delay(round_index))
+
+        if last_error is None:
+            raise CircuitOpenError(f"All RPC endpoints are unhealthy ({method})")
+        raise last_error
+
+    def _send_raw_to(self, endpoint, limiter, raw_hex):
+        response, error = self._attempt(endpoint, limiter, "eth_sendRawTransaction", [raw_hex])
+        if error is not None:
+            raise error
+        return response
+
+    def broadcast_raw_transaction(self, raw_tx):
+        """
+        Send a signed transaction to every healthy endpoint at once
+
+        The first endpoint to accept it (or answer 'already known') wins; the other sends
+        finish in the background. Rejections only count when every endpoint rejects.
+
+        Returns:
+        - Transaction hash (keccak of the raw bytes)
+
+        Raises:
+        - ValueError with the JSON-RPC error dict when all endpoints reject it, otherwise
+          the last transport error
+        """
+        raw_tx = bytes(raw_tx)
+        raw_hex = "0x" + raw_tx.hex()
+        transport_errors = []
+        futures = {}
+        for endpoint in self.endpoints:
+            key = self._key(endpoint)
+            limiter = limiter_for(key)
+            if not limiter.try_acquire():
+                continue
+            if not breaker_for(key).allow():
+                limiter.cancel()
+                continue
+            futures[_fanout_executor.submit(self._send_raw_to, endpoint, limiter, raw_hex)] = endpoint
+
+        if not futures:
+            # Everything saturated or unhealthy: queue on the normal request path
+            responses = [self.make_request("eth_sendRawTransaction", [raw_hex])]
+        else:
+            metrics.incr("rpc.fanout_sends")
+            # The sends run on the fan-out threads, charge them to the operation being broadcast here
+            recorder.count_rpc_call(len(futures))
+            responses = _completed(futures, transport_errors)
+
+        rejection = None
+        for response in responses:
+            error = response.get("error") if isinstance(response, dict) else None
+            if error is None or (isinstance(error, dict) and _already_known(error)):
+                return Web3.keccak(raw_tx)
+            # Prefer a node's verdict (nonce too low, underpriced...) over transport errors
+            rejection = rejection or error
+
+        if rejection is not None:
+            raise ValueError(rejection)
+        if transport_errors:
+            raise transport_errors[-1]
+        raise CircuitOpenError("No RPC endpoint accepted the transaction")
+
+    def health(self):
+        """Endpoint -> breaker state, for logs"""
+        return {endpoint: breaker_for(self._key(endpoint)).state for endpoint in self.endpoints}
+
+
+def send_raw_transaction(web3, raw_tx):
+    """
+    Broadcast a signed transaction, fanned out to every pool endpoint when BROADCAST_FANOUT is on
+
+    Returns:
+    - Transaction hash
+    """
+    broadcast = getattr(web3.provider, "broadcast_raw_transaction", None)
+    if config.BROADCAST_FANOUT and broadcast is not None:
+        return broadcast(raw_tx)
+    return web3.eth.send_raw_transaction(raw_tx)
@@ -0,0 +1,152 @@
+from web3.exceptions import ContractLogicError
+
+# Selectors for the two standard revert payloads
+ERROR_SELECTOR = bytes.fromhex("08c379a0")  # Error(string)
+PANIC_SELECTOR = bytes.fromhex("4e487b71")  # Panic(uint256)
+
+PANIC_CODES = {
+    0x01: "assertion failed",
+    0x11: "arithmetic overflow or underflow",
+    0x12: "division or modulo by zero",
+    0x21: "invalid enum value",
+    0x22: "invalid storage byte array",
+    0x31: "pop on empty array",
+    0x32: "array index out of bounds",
+    0x41: "out of memory",
+    0x51: "call to zero-initialized function",
+}
+
+# Only these fields matter for eth_call; nonce/chainId/gasPrice can make some nodes reject the call
+CALL_FIELDS = ("from", "to", "data", "value", "gas")
+
+
+def _to_bytes(value):
+    """Convert hex string / HexBytes / bytes revert data to bytes"""
+    if value is None:
+        return b""
+    if isinstance(value, (bytes, bytearray)):
+        return bytes(value)
+    if isinstance(value, str):
+        value = value[2:] if value.startswith("0x") else value
+        try:
+            return bytes.fromhex(value)
+        except ValueError:
+            return b""
+    return b""
+
+
+def decode_revert_reason(data):
+    """
+    Decode revert data returned by eth_call
+
+    Parameters:
+    - data: Raw revert data (bytes or hex string)
+
+    Returns:
+    - Human readable revert reason
+    """
+    data = _to_bytes(data)
+    if not data:
+        return "execution reverted without reason"
+
+    if data[:4] == ERROR_SELECTOR and len(data) >= 68:
+        offset = int.from_bytes(data[4:36], "big")
+        length_start = 4 + offset
+        length = int.from_bytes(data[length_start:length_start + 32], "big")
+        message = data[length_start + 32:length_start + 32 + length]
+        return message.decode("utf-8", errors="replace")
+
+    if data[:4] == PANIC_SELECTOR and len(data) >= 36:
+        code = int.from_bytes(data[4:36], "big")
+        return f"panic: {PANIC_CODES.get(code, hex(code))}"
+
+    return f"custom error 0x{data[:4].hex()}"
+
+
+def _extract_revert(error):
+    """Pull the revert reason out of the different web3 error shapes, returns (reason, is_revert)"""
+    data = getattr(error, "data", None)
+    message = str(error)
+
+    # Nodes that answer with a raw JSON-RPC error dict (web3 raises ValueError(dict))
+    if error.args and isinstance(error.args[0], dict):
+        rpc_error = error.args[0]
+        data = data or rpc_error.get("data")
+        message = rpc_error.get("message", message)
+
+    if isinstance(data, dict):
+        data = data.get("data")
+
+    if data and isinstance(data, (str, bytes, bytearray)) and _to_bytes(data):
+        return decode_revert_reason(data), True
+    return message, "revert" in message.lower()
+
+
+class TransactionSimulator:
+    """Runs transactions through eth_call before they are signed and caches results per block"""
+    def __init__(self, web3, block_identifier="pending"):
+        self.web3 = web3
+        self.block_identifier = block_identifier
+        self.cache = {}
+        self.cache_block = None
+        self.hits = 0
+        self.misses = 0
+
+    def _cache_key(self, call):
+        data = call.get("data", "0x")
+        if isinstance(data, (bytes, bytearray)):
+            data = "0x" + bytes(data).hex()
+        return (
+            str(call.get("from", "")).lower(),
+            str(call.get("to", "")).lower(),
+            str(data).lower(),
+            int(call.get("value", 0)),
+        )
+
+    def _current_block(self):
+        try:
+            return self.web3.eth.block_number
+        except Exception:
+            return None
+
+    def simulate(self, tx):
+        """
+        Simulate a built transaction against pending state
+
+        Parameters:
+        - tx: Transaction dict as returned by build_transaction
+
+        Returns:
+        - Dict with 'success' flag, decoded 'reason' on revert and raw 'return_data'.
+          'success' is None when the node could not run the simulation at all.
+        """
+        call = {field: tx[field] for field in CALL_FIELDS if field in tx}
+
+        block = self._current_block()
+        if block is None or block != self.cache_block:
+            # New block, previous results no longer describe current state
+            self.cache = {}
+            self.cache_block = block
+
+        key = self._cache_key(call)
+        if block is not None and key in self.cache:
+            self.hits += 1
+            return self.cache[key]
+
+        self.misses += 1
+        try:
+            return_data = self.web3.eth.call(call, self.block_identifier)
+            result = {"success": True, "reason": None, "return_data": bytes(return_data)}
+        except ContractLogicError as cle:
+            reason, _ = _extract_revert(cle)
+            result = {"success": False, "reason": reason, "return_data": b""}
+        except Exception as e:
+            reason, is_revert = _extract_revert(e)
+            if not is_revert:
+                # Node/network problem, not a verdict on the transaction - don't cache it
+                return {"success": None, "reason": reason, "return_data": b""}
+            result = {"success": False, "reason": reason, "return_data": b""}
+
+        if block is not None:
+            self.cache[key] = result
+        return result
@@ -5,11 +5,27 @@ import os
 import sys
 import json
 from datetime import datetime
-from web3 import Web3, Account
+from web3 import Account
 from colorama import Fore, Style, init
 import shutil
 from eth_account.messages import encode_defunct
 import config  # Import configuration
+from keystore import WalletRegistry
+from simulation import TransactionSimulator
+from routing import RouteFinder, describe_route
+from rpc_batch import encode_call
+from calldata import PreparedCall, encode_approve, encode_exact_input, encode_exact_input_single, encode_multicall
+from permit import PermitSigner, self_permit_call
+from executor import Operation, TxExecutor
+from balances import BalanceTracker
+from web3_factory import connect
+from pacing import PacingScheduler, endpoint_of, set_wallet_label, wallet_label, write_lines
+from tx_records import recorder, report_lines
+from read_cache import enable_read_cache
+from confirmations import PendingTracker
+from v3_sim import LocalQuoter
+from tokens import token_registry_for
+from tx_errors import classify_error, RETRYABLE_NETWORK, NONCE_CONFLICT, UNDERPRICED, INSUFFICIENT_FUNDS, DETERMINISTIC_REVERT
 
 init()
 
@@ -115,30 +131,32 @@ def print_banner():
 
 def log_info(message):
     timestamp = datetime.now().strftime("%H:%M:%S")
-    print(f"{Fore.BLUE}[{timestamp}] [INFO]{Style.RESET_ALL} ℹ️  {message}")
+    write_lines(f"{Fore.BLUE}[{timestamp}] {wallet_label()}[INFO]{Style.RESET_ALL} ℹ️  {message}")
 
 def log_success(message):
     timestamp = datetime.now().strftime("%H:%M:%S")
-    print(f"{Fore.GREEN}[{timestamp}] [SUCCESS]{Style.RESET_ALL} ✅ {message}")
+    write_lines(f"{Fore.GREEN}[{timestamp}] {wallet_label()}[SUCCESS]{Style.RESET_ALL} ✅ {message}")
 
 def log_error(message):
     timestamp = datetime.now().strftime("%H:%M:%S")
-    print(f"{Fore.RED}[{timestamp}] [ERROR]{Style.RESET_ALL} ❌ {message}")
+    write_lines(f"{Fore.RED}[{timestamp}] {wallet_label()}[ERROR]{Style.RESET_ALL} ❌ {message}")
 
 def log_warning(message):
     timestamp = datetime.now().strftime("%H:%M:%S")
-    print(f"{Fore.YELLOW}[{timestamp}] [WARNING]{Style.RESET_ALL} ⚠️  {message}")
+    write_lines(f"{Fore.YELLOW}[{timestamp}] {wallet_label()}[WARNING]{Style.RESET_ALL} ⚠️  {message}")
 
 def log_swap(swap_number, total_swaps, amount, token_from, token_to, tx_hash):
     timestamp = datetime.now().strftime("%H:%M:%S")
     progress = f"[{swap_number}/{total_swaps}]"
     progress_bar = create_progress_bar(swap_number, total_swaps)
     
-    print(f"\n{Fore.YELLOW}[{timestamp}] {progress} {progress_bar}{Style.RESET_ALL}")
-    print(f"  {Fore.CYAN}Amount:{Style.RESET_ALL} {amount} {token_from}")
-    print(f"  {Fore.CYAN}To:{Style.RESET_ALL} {token_to}")
-    print(f"  {Fore.CYAN}Hash:{Style.RESET_ALL} {Fore.BLUE}{tx_hash}{Style.RESET_ALL}")
-    print(f"  {Fore.CYAN}Explorer:{Style.RESET_ALL} {config.EXPLORER}{tx_hash}")
+    write_lines(
+        f"\n{Fore.YELLOW}[{timestamp}] {wallet_label()}{progress} {progress_bar}{Style.RESET_ALL}",
+        f"  {Fore.CYAN}Amount:{Style.RESET_ALL} {amount} {token_from}",
+        f"  {Fore.CYAN}To:{Style.RESET_ALL} {token_to}",
+        f"  {Fore.CYAN}Hash:{Style.RESET_ALL} {Fore.BLUE}{tx_hash}{Style.RESET_ALL}",
+        f"  {Fore.CYAN}Explorer:{Style.RESET_ALL} {config.EXPLORER}{tx_hash}",
+    )
 
 def create_progress_bar(current, total, bar_length=20):
     progress = min(1.0, current / total)
@@ -177,31 +195,16 @@ def load_proxies(filename="proxy.txt"):
     
     return proxies
 
-def load_private_keys(filename="private_key.txt"):
-    """Load all private keys from file"""
-    if not os.path.exists(filename):
-        log_error(f"File {filename} not found")
-        return []
-    
-    with open(filename, "r") as file:
-        keys = [line.strip() for line in file if line.strip()]
-    
-    if not keys:
-        log_error(f"No private keys found in {filename}")
-        return []
-    
-    return keys
-
-def display_wallets(web3, private_keys):
+def display_wallets(web3, addresses):
     """Display all available wallets with addresses and balances"""
     print(f"\n{Fore.CYAN}{'═' * 70}{Style.RESET_ALL}")
     print(f"{Fore.CYAN}║ {'#':^4} │ {'Wallet Address':^42} │ {'Balance':^15} ║{Style.RESET_ALL}")
     print(f"{Fore.CYAN}{'═' * 70}{Style.RESET_ALL}")
     
-    for idx, key in enumerate(private_keys):
+    for idx, address in enumerate(addresses):
         try:
-            account = Account.from_key(key)
-            address = account.address
+            if address is None:
+                raise ValueError("Invalid private key")
             balance_wei = web3.eth.get_balance(address)
             balance = web3.from_wei(balance_wei, 'ether')
             print(f"{Fore.CYAN}║ {idx+1:^4} │ {Fore.YELLOW}{address}{Fore.CYAN} │ {Fore.GREEN}{balance:.6f} PHRS{Fore.CYAN} ║{Style.RESET_ALL}")
@@ -290,30 +293,66 @@ def format_token_balance(balance_wei, decimals):
     """Format token balance with appropriate decimals"""
     return balance_wei / (10 ** decimals)
 
-def check_transaction_status(web3, tx_hash, max_attempts=30, delay=6):
-    """Check transaction status without blocking indefinitely"""
+def check_transaction_status(web3, tx_hash, timeout=180):
+    """Check transaction status without blocking indefinitely (receipt is looked up once per new block)"""
     tx_hash_hex = web3.to_hex(tx_hash) if not isinstance(tx_hash, str) else tx_hash
     
-    for attempt in range(max_attempts):
-        try:
-            receipt = web3.eth.get_transaction_receipt(tx_hash)
-            if receipt is not None:
-                if receipt.status == 1:
-                    log_success(f"Transaction {tx_hash_hex} confirmed (Attempt {attempt+1}/{max_attempts})")
-                    return receipt
-                else:
-                    log_error(f"Transaction {tx_hash_hex} failed with status {receipt.status}")
-                    return receipt
-        except Exception as e:
-            log_info(f"Waiting for confirmation... (Attempt {attempt+1}/{max_attempts})")
-        
-        if attempt < max_attempts - 1:  # Don't sleep on the last attempt
-            time.sleep(delay)
+    receipt = PendingTracker(web3).wait_for_receipts([tx_hash], timeout)[tx_hash]
+    if receipt is not None:
+        if receipt.status == 1:
+            log_success(f"Transaction {tx_hash_hex} confirmed in block {receipt.blockNumber}")
+        else:
+            log_error(f"Transaction {tx_hash_hex} failed with status {receipt.status}")
+        return receipt
     
     log_warning(f"Transaction {tx_hash_hex} not confirmed within timeout, but it might still be processed")
     return None
 
-def swap_tokens(web3, private_key, amount_phrs, swap_route):
+def size_swap_leg(web3, local_quoter, swap_route, amount, min_amount=0, steps=16):
+    """
+    Shrink a swap leg until its simulated price impact is within MAX_PRICE_IMPACT
+
+    Every candidate size is quoted from the same pool snapshot, so this costs no quoter calls.
+
+    Parameters:
+    - web3: Web3 instance
+    - local_quoter: LocalQuoter over the known pools
+    - swap_route: "phrs_to_usdc" or "usdc_to_phrs"
+    - amount: Planned input amount in whole tokens
+    - min_amount: Smallest input amount worth swapping
+    - steps: Number of candidate sizes between the planned amount and zero
+
+    Returns:
+    - (amount, minimum output in base units); amount is None when no candidate size is within
+      the price impact limit, and the minimum output is 0 when the pools could not be simulated
+    """
+    if swap_route == "phrs_to_usdc":
+        token_in, token_out = config.WPHRS_ADDRESS, config.USDC_ADDRESS
+    else:
+        token_in, token_out = config.USDC_ADDRESS, config.WPHRS_ADDRESS
+    tokens = token_registry_for(web3)
+
+    # Candidate sizes in base units, so each is exactly what swap_tokens will send
+    amount_in = tokens.to_base_units(token_in, amount)
+    floor = tokens.to_base_units(token_in, min_amount)
+    candidates = [amount_in * (steps - k) // steps for k in range(steps)]
+    candidates = [value for value in candidates if value >= floor] or [amount_in]
+    quotes = local_quoter.quote_many(token_in, token_out, candidates)
+    if all(quote is None for quote in quotes):
+        return amount, 0
+
+    for value, quote in zip(candidates, quotes):
+        if quote is not None and quote["price_impact"] <= config.MAX_PRICE_IMPACT:
+            min_amount_out = 0
+            if config.SWAP_SLIPPAGE is not None:
+                min_amount_out = quote["amount_out"] * (10000 - round(config.SWAP_SLIPPAGE * 10000)) // 10000
+            if value == amount_in:
+                return amount, min_amount_out
+            log_info(f"Reduced swap from {amount} to {tokens.format(token_in, value)} to keep price impact at {quote['price_impact']:.2%}")
+            return tokens.from_base_units(token_in, value), min_amount_out
+    return None, 0
+
+def swap_tokens(web3, private_key, amount_phrs, swap_route, simulator=None, route_finder=None, balance_tracker=None, permit_signer=None, min_amount_out=0):
     """Swap PHRS for token using Pharos DEX with improved error handling"""
     # Determine token addresses based on swap route
     if swap_route == "phrs_to_usdc":
@@ -321,15 +360,11 @@ def swap_tokens(web3, private_key, amount_phrs, swap_route):
         token_out = config.USDC_ADDRESS
         token_in_name = "PHRS"
         token_out_name = "USDC"
-        token_in_decimals = 18
-        token_out_decimals = 6
     elif swap_route == "usdc_to_phrs":
         token_in = config.USDC_ADDRESS
         token_out = config.WPHRS_ADDRESS
         token_in_name = "USDC"
         token_out_name = "PHRS"
-        token_in_decimals = 6
-        token_out_decimals = 18
     else:
         log_error(f"Invalid swap route: {swap_route}")
         return None
@@ -344,12 +379,9 @@ def swap_tokens(web3, private_key, amount_phrs, swap_route):
         account = web3.eth.account.from_key(private_key)
         address = account.address
         
-        # Handle different decimal places for tokens
-        if token_in_decimals == 18:
-            amount_in_wei = web3.to_wei(amount_phrs, 'ether')
-        else:
-            # USDC has 6 decimals
-            amount_in_wei = int(amount_phrs * (10 ** token_in_decimals))
+        # Exact base units with each token's own decimals (read once, cached on disk)
+        tokens = token_registry_for(web3)
+        amount_in_wei = tokens.to_base_units(token_in, amount_phrs)
         
         # Get contracts with checksummed addresses
         token = web3.eth.contract(
@@ -361,14 +393,21 @@ def swap_tokens(web3, private_key, amount_phrs, swap_route):
             abi=config.SWAP_ROUTER_ABI
         )
         
-        # Get the precise token balance with proper decimal handling
-        token_balance = token.functions.balanceOf(address).call()
-        
-        # For PHRS, we need to get the native balance if we're swapping from PHRS
-        if token_in_name == "PHRS":
-            token_balance = web3.eth.get_balance(address)
+        # Use tracked balances when available, they are exact and cost no RPC calls
+        if balance_tracker is not None and not balance_tracker.stale:
+            if token_in_name == "PHRS":
+                token_balance = balance_tracker.native_balance()
+            else:
+                token_balance = balance_tracker.token_balance(token_in)
+        else:
+            # Get the precise token balance with proper decimal handling
+            token_balance = token.functions.balanceOf(address).call()
+            
+            # For PHRS, we need to get the native balance if we're swapping from PHRS
+            if token_in_name == "PHRS":
+                token_balance = web3.eth.get_balance(address)
         
-        token_balance_formatted = token_balance / (10 ** token_in_decimals)
+        token_balance_formatted = tokens.from_base_units(token_in, token_balance)
         
         # Double-check if balance is sufficient before proceeding
         if token_balance < amount_in_wei:
@@ -383,67 +422,56 @@ def swap_tokens(web3, private_key, amount_phrs, swap_route):
                 web3.to_checksum_address(config.SWAP_ROUTER_ADDRESS)
             ).call()
         
-        # Get fresh nonce for each transaction to prevent replay attacks
-        current_nonce = web3.eth.get_transaction_count(address, 'pending')
-        log_info(f"Using nonce {current_nonce} for approval transaction")
+        # Approval and swap are queued and sent back to back with consecutive nonces
+        operations = []
+        
+        # A signed permit replaces the approve transaction when the token supports EIP-2612
+        permit = None
+        if token_in_name != "PHRS" and current_allowance < amount_in_wei and permit_signer is not None:
+            permit = permit_signer.sign_permit(
+                private_key,
+                token_in,
+                config.SWAP_ROUTER_ADDRESS,
+                amount_in_wei * 1000  # Same headroom as the approve below
+            )
         
         # Only approve if necessary and not swapping native PHRS
-        if token_in_name != "PHRS" and current_allowance < amount_in_wei:
-            log_info(f"Current allowance ({current_allowance / (10 ** token_in_decimals):.8f} {token_in_name}) is insufficient. Approving...")
+        if token_in_name != "PHRS" and current_allowance < amount_in_wei and permit is None:
+            log_info(f"Current allowance ({tokens.from_base_units(token_in, current_allowance):.8f} {token_in_name}) is insufficient. Approving...")
             
             # Approve with a much higher amount to reduce future approvals
             approve_amount = amount_in_wei * 1000  # Approve 1000x the current amount for future swaps
             
-            approve_tx = token.functions.approve(
-                web3.to_checksum_address(config.SWAP_ROUTER_ADDRESS), 
-                approve_amount
-            ).build_transaction({
-                'from': address,
-                'nonce': current_nonce,
-                'gas': 200000,  # Increased gas for approval
-                'gasPrice': web3.eth.gas_price + random.randint(100000, 2000000),
-                'chainId': config.CHAIN_ID
-            })
-            
-            signed_approve = web3.eth.account.sign_transaction(approve_tx, private_key=private_key)
-            
-            # Handle different web3.py versions
-            if hasattr(signed_approve, 'rawTransaction'):
-                raw_tx = signed_approve.rawTransaction
-            elif hasattr(signed_approve, 'raw_transaction'):
-                raw_tx = signed_approve.raw_transaction
-            else:
-                raise AttributeError("Could not find raw transaction data in signed transaction")
-                
-            tx_hash = web3.eth.send_raw_transaction(raw_tx)
-            tx_hash_hex = web3.to_hex(tx_hash)
-            log_info(f"Approval transaction sent: {tx_hash_hex}")
-            
-            # Use non-blocking checker for approval confirmation
-            receipt = check_transaction_status(web3, tx_hash, max_attempts=30, delay=6)
-            
-            # Continue even if we couldn't confirm receipt, as approval might still succeed
-            if receipt is None:
-                log_warning(f"Approval transaction not confirmed yet, but continuing with swap...")
-                # Sleep a bit to give the transaction time to propagate
-                time.sleep(15)  # Increased wait time for approval
-            elif receipt.status != 1:
-                log_error("Approval transaction failed")
-                return None
-            else:
-                log_success("Token approval confirmed")
-                # Short delay after confirmed approval
-                time.sleep(2)
-            
-            # Update nonce for next transaction to prevent replay attacks
-            current_nonce = web3.eth.get_transaction_count(address, 'pending')
+            operations.append(Operation(
+                "approve",
+                PreparedCall(web3, token_in, encode_approve(config.SWAP_ROUTER_ADDRESS, approve_amount)),
+                {
+                    'gas': 200000,  # Increased gas for approval
+                    'gasPrice': web3.eth.gas_price + random.randint(100000, 2000000)
+                }
+            ))
+        elif permit is not None:
+            log_info(f"Allowance for {token_in_name} will be granted by permit inside the swap transaction")
         elif token_in_name != "PHRS":
-            log_info(f"Sufficient allowance already exists ({current_allowance / (10 ** token_in_decimals):.8f} {token_in_name}), skipping approval")
+            log_info(f"Sufficient allowance already exists ({tokens.from_base_units(token_in, current_allowance):.8f} {token_in_name}), skipping approval")
         
-        # Increase slippage tolerance for better transaction success
-        # Setting minimum amount out to 0 for testnet to bypass slippage checks
-        min_amount_out = 0
-        log_info(f"Setting minimum output to 0 to bypass slippage checks on testnet")
+        if min_amount_out:
+            log_info(f"Minimum output set to {tokens.from_base_units(token_out, min_amount_out):.8f} {token_out_name} from the local pool simulation")
+        else:
+            # Setting minimum amount out to 0 for testnet to bypass slippage checks
+            log_info(f"Setting minimum output to 0 to bypass slippage checks on testnet")
+        
+        # Pick the best-quoted path over all known pools instead of the fixed 0.05% pool
+        route = None
+        if route_finder is not None:
+            route = route_finder.find_best_route(token_in, token_out, amount_in_wei)
+            if route:
+                expected_out = tokens.from_base_units(token_out, route["amount_out"])
+                log_info(f"Best route: {describe_route(route)} (quoted {expected_out:.8f} {token_out_name})")
+            else:
+                log_warning("No quoted route found, falling back to direct pool with 0.05% fee")
+                # The simulated minimum may come from a better pool than this one
+                min_amount_out = 0
         
         # Higher gas limit for swaps
         gas_limit = 600000  # Significantly increased gas limit
@@ -451,61 +479,88 @@ def swap_tokens(web3, private_key, amount_phrs, swap_route):
         # Randomize gas price
         gas_price = web3.eth.gas_price + random.randint(500000, 5000000)
         
+        # Native PHRS out: the router keeps the WPHRS and unwraps it to us in the same transaction
+        unwrap_output = token_out_name == "PHRS"
+        swap_recipient = router.address if unwrap_output else address
+        
         # Prepare swap parameters with checksummed addresses
-        swap_params = {
-            "tokenIn": web3.to_checksum_address(token_in),
-            "tokenOut": web3.to_checksum_address(token_out),
-            "fee": 500,  # 0.05%
-            "recipient": address,
-            "amountIn": amount_in_wei,
-            "amountOutMinimum": min_amount_out,
-            "sqrtPriceLimitX96": 0
-        }
+        if route and len(route["fees"]) > 1:
+            swap_fn_name = "exactInput"
+            swap_params = {
+                "path": route["path"],
+                "recipient": swap_recipient,
+                "amountIn": amount_in_wei,
+                "amountOutMinimum": min_amount_out
+            }
+        else:
+            swap_fn_name = "exactInputSingle"
+            swap_params = {
+                "tokenIn": web3.to_checksum_address(token_in),
+                "tokenOut": web3.to_checksum_address(token_out),
+                "fee": route["fees"][0] if route else 500,  # 0.05% default
+                "recipient": swap_recipient,
+                "amountIn": amount_in_wei,
+                "amountOutMinimum": min_amount_out,
+                "sqrtPriceLimitX96": 0
+            }
+        
+        # Fold the permit and wrap/unwrap legs into one router multicall instead of separate transactions
+        calls = []
+        if permit is not None:
+            calls.append(self_permit_call(router, permit))
+        # The swap itself and the multicall around it use the precompiled encoders
+        swap_data = encode_exact_input(swap_params) if swap_fn_name == "exactInput" else encode_exact_input_single(swap_params)
+        calls.append(swap_data)
+        if token_in_name == "PHRS":
+            # The router wraps the attached value itself, refundETH returns anything left unspent
+            calls.append(encode_call(router, "refundETH", []))
+        elif unwrap_output:
+            calls.append(encode_call(router, "unwrapWETH9", [min_amount_out, address]))
         
-        log_info(f"Building swap transaction with nonce {current_nonce}")
+        if len(calls) > 1:
+            swap_call = PreparedCall(web3, router.address, encode_multicall(calls))
+        else:
+            swap_call = PreparedCall(web3, router.address, swap_data)
         
         # Build transaction base parameters
         tx_params = {
-            'from': address,
-            'nonce': current_nonce,
             'gas': gas_limit,
-            'gasPrice': gas_price,
-            'chainId': config.CHAIN_ID
+            'gasPrice': gas_price
         }
         
         # For PHRS (native token), we need to include value in transaction
         if token_in_name == "PHRS":
             tx_params['value'] = amount_in_wei
         
-        # Build and sign swap transaction
-        swap_tx = router.functions.exactInputSingle(
-            swap_params
-        ).build_transaction(tx_params)
-        
-        signed_swap = web3.eth.account.sign_transaction(swap_tx, private_key=private_key)
-        
-        # Handle different web3.py versions
-        if hasattr(signed_swap, 'rawTransaction'):
-            raw_swap_tx = signed_swap.rawTransaction
-        elif hasattr(signed_swap, 'raw_transaction'):
-            raw_swap_tx = signed_swap.raw_transaction
-        else:
-            raise AttributeError("Could not find raw transaction data in signed transaction")
-            
-        swap_tx_hash = web3.eth.send_raw_transaction(raw_swap_tx)
-        swap_tx_hash_hex = web3.to_hex(swap_tx_hash)
-        log_info(f"Swap transaction sent: {swap_tx_hash_hex}")
-        
-        # Use non-blocking checker for swap transaction
-        swap_receipt = check_transaction_status(web3, swap_tx_hash, max_attempts=40, delay=6)  # Increased attempts
+        operations.append(Operation("swap", swap_call, tx_params, depends_on=[op.name for op in operations]))
+        
+        # The swap is dry-run only when no approval is queued ahead of it, since the simulation
+        # would otherwise see the old allowance and report a false revert.
+        # Receipts are applied to the balance tracker by the executor.
+        executor = TxExecutor(
+            web3,
+            private_key,
+            simulator=simulator,
+            balance_tracker=balance_tracker,
+            timeout=240
+        )
+        swap_result = executor.run(operations)["swap"]
+        swap_tx_hash_hex = swap_result["tx_hash"]
         
         # Better error handling
-        if swap_receipt is None:
+        if swap_tx_hash_hex is None:
+            log_error(f"Swap not sent: {swap_result['error']}")
+            return None
+        elif swap_result["status"] == "sent":
             log_warning(f"Swap transaction not confirmed within timeout, but may still succeed")
             log_info(f"You can check the status manually at {config.EXPLORER}{swap_tx_hash_hex}")
             return swap_tx_hash_hex
-        elif swap_receipt.status != 1:
-            log_error(f"Swap transaction failed with status {swap_receipt.status}")
+        elif swap_result["status"] != "success":
+            log_error(f"Swap transaction failed: {swap_result['error']}")
+            if swap_result["error_kind"] in (INSUFFICIENT_FUNDS, NONCE_CONFLICT, UNDERPRICED):
+                log_error(f"Rejected by the node ({swap_result['error_kind']}), not a problem with the swap itself")
+            if swap_result["blocked_by"]:
+                log_error(f"Failed before it: {', '.join(swap_result['blocked_by'])}")
             log_error("Possible reasons: 1) Insufficient liquidity, 2) Price impact too high, 3) Network congestion")
             log_error(f"Try a smaller amount (< 0.001) or wait for better network conditions")
             return None
@@ -516,42 +571,51 @@ def swap_tokens(web3, private_key, amount_phrs, swap_route):
     except Exception as e:
         log_error(f"Error during token swap: {str(e)}")
         # More detailed error logging
-        if "gas required exceeds" in str(e):
-            log_error("Transaction requires more gas than provided. Try increasing gas limit further.")
-        elif "insufficient funds" in str(e):
+        failure = classify_error(e)
+        if failure["reason"]:
+            log_error(f"Revert reason: {failure['reason']}")
+        if failure["kind"] == INSUFFICIENT_FUNDS:
             log_error("Insufficient funds to cover gas costs.")
-        elif "nonce too low" in str(e):
+        elif failure["kind"] == NONCE_CONFLICT:
             log_error("Transaction nonce issue. Network may be congested or previous transaction still pending.")
-        elif "always failing transaction" in str(e):
+        elif failure["kind"] == DETERMINISTIC_REVERT:
             log_error("Contract execution always fails. This typically means there's an issue with swap parameters.")
             log_error("Try reducing swap amount significantly to < 0.001")
+        elif failure["kind"] == RETRYABLE_NETWORK:
+            log_error("RPC or network problem, the swap can be retried as is.")
         return None
 
-def process_wallet_swaps(web3, private_key, swap_config, wallet_index, total_wallets, proxy_manager=None):
-    """Process swaps for a single wallet"""
+def process_wallet_swaps(web3, private_key, swap_config, wallet_index, total_wallets, proxy_manager=None, route_finder=None, scheduler=None):
+    """Process swaps for a single wallet, pacing them with scheduler"""
+    scheduler = scheduler or PacingScheduler(workers=1)
     wallet = Account.from_key(private_key)
     wallet_address = wallet.address
+    if scheduler.workers > 1:
+        # Wallets run side by side, tell their log lines apart
+        set_wallet_label(f"W{wallet_index+1} {wallet_address[:10]}")
     
     # Create a section header for this wallet
-    print(f"\n{Fore.CYAN}{'═' * 70}{Style.RESET_ALL}")
-    print(f"{Fore.CYAN}║ WALLET {wallet_index+1}/{total_wallets}: {wallet_address} {' ' * (70 - 22 - len(wallet_address))}{Fore.CYAN}║{Style.RESET_ALL}")
-    print(f"{Fore.CYAN}{'═' * 70}{Style.RESET_ALL}")
+    write_lines(
+        f"\n{Fore.CYAN}{'═' * 70}{Style.RESET_ALL}",
+        f"{Fore.CYAN}║ WALLET {wallet_index+1}/{total_wallets}: {wallet_address} {' ' * (70 - 22 - len(wallet_address))}{Fore.CYAN}║{Style.RESET_ALL}",
+        f"{Fore.CYAN}{'═' * 70}{Style.RESET_ALL}",
+    )
+    
+    # Seed exact balances once; after this they are kept up to date from our own receipts
+    balance_tracker = BalanceTracker(wallet_address)
+    try:
+        balance_tracker.seed(web3)
+    except Exception as e:
+        log_error(f"Error getting starting balances: {str(e)}")
+        return None
     
-    # Get PHRS balance
-    balance_wei = web3.eth.get_balance(wallet_address)
-    balance_phrs = web3.from_wei(balance_wei, 'ether')
+    balance_phrs = web3.from_wei(balance_tracker.native_balance(), 'ether')
     log_info(f"Current PHRS balance: {Fore.GREEN}{balance_phrs:.8f}{Style.RESET_ALL}")
     
-    # Get USDC balance with proper formatting
-    try:
-        # USDC balance (6 decimals)
-        usdc_balance_wei = get_token_balance(web3, config.USDC_ADDRESS, wallet_address)
-        usdc_balance = usdc_balance_wei / (10 ** 6)  # USDC has 6 decimals
-        
-        log_info(f"Current USDC balance: {Fore.GREEN}{usdc_balance:.8f}{Style.RESET_ALL}")
-    except Exception as e:
-        log_error(f"Error getting USDC balance: {str(e)}")
-        usdc_balance = 0
+    # USDC balance, scaled by the token's own decimals
+    tokens = token_registry_for(web3)
+    usdc_balance = tokens.from_base_units(config.USDC_ADDRESS, balance_tracker.token_balance(config.USDC_ADDRESS))
+    log_info(f"Current USDC balance: {Fore.GREEN}{usdc_balance:.8f}{Style.RESET_ALL}")
     
     # Get JWT token for API calls
     jwt_token = login_with_signature(web3, private_key, proxy_manager)
@@ -592,6 +656,12 @@ def process_wallet_swaps(web3, private_key, swap_config, wallet_index, total_wal
     start_time = time.time()
     log_info(f"Starting {num_swaps} swaps with round-trip mode (PHRS↔USDC)")
     
+    # Shared across the wallet's swaps so identical calls in one block are simulated once
+    simulator = TransactionSimulator(web3) if config.SIMULATE_TRANSACTIONS else None
+    permit_signer = PermitSigner(web3) if config.USE_PERMIT else None
+    # Leg sizes and slippage are checked against pool snapshots (read once per block) instead of the quoter
+    local_quoter = LocalQuoter(web3, route_finder.pools) if config.USE_LOCAL_QUOTES and route_finder is not None else None
+    
     # Check if minimum amount is higher than balance for PHRS
     if float(balance_phrs) < min_amount:
         log_warning(f"PHRS balance ({float(balance_phrs):.8f}) is less than minimum swap amount ({min_amount})")
@@ -604,8 +674,24 @@ def process_wallet_swaps(web3, private_key, swap_config, wallet_index, total_wal
     else:
         min_amount_phrs = min_amount
     
+    # USDC produced by the last PHRS->USDC leg, used to size the return leg exactly
+    last_usdc_received = 0
+    
     # Process all swaps
     for i, route in enumerate(swap_routes):
+        # One swap per wait_time on average (0.8-1.2x apart); the previous swap's own time counts
+        scheduler.pace((wallet_address, "swap"), wait_time, endpoint_of(web3), jitter=config.SWAP_PACING_JITTER)
+        
+        # Re-read balances only if a receipt went missing and the tracker lost track
+        if balance_tracker.stale:
+            try:
+                balance_tracker.seed(web3)
+            except Exception as e:
+                log_error(f"Error refreshing balances: {str(e)}")
+        balance_phrs = web3.from_wei(balance_tracker.native_balance(), 'ether')
+        usdc_balance_wei = balance_tracker.token_balance(config.USDC_ADDRESS)
+        usdc_balance = tokens.from_base_units(config.USDC_ADDRESS, usdc_balance_wei)
+        
         # Select appropriate amount based on token type
         if route == "phrs_to_usdc":
             # Check if we have enough PHRS
@@ -629,15 +715,28 @@ def process_wallet_swaps(web3, private_key, swap_config, wallet_index, total_wal
                 log_error(f"Insufficient USDC balance for swap {i+1}. Minimum required: {actual_min} USDC, Available: {usdc_balance:.8f}")
                 stats["failed_swaps"] += 1
                 continue
-            # Use exactly 20 USDC or user config (whichever is higher)
-            amount = actual_min
-            log_info(f"Using stablecoin minimum of {actual_min} USDC for this swap")
+            # Send back exactly what the previous leg produced (at least the stablecoin minimum),
+            # never more than the wallet actually holds
+            leg_amount_wei = max(tokens.to_base_units(config.USDC_ADDRESS, actual_min), last_usdc_received)
+            leg_amount_wei = min(leg_amount_wei, usdc_balance_wei)
+            amount = tokens.from_base_units(config.USDC_ADDRESS, leg_amount_wei)
+            log_info(f"Using {amount:.6f} USDC for this swap")
+        
+        min_amount_out = 0
+        if local_quoter is not None:
+            leg_minimum = max(min_amount, stablecoin_min_amount) if route == "usdc_to_phrs" else 0
+            amount, min_amount_out = size_swap_leg(web3, local_quoter, route, amount, leg_minimum)
+            if amount is None:
+                log_warning(f"Skipping swap {i+1}: price impact above {config.MAX_PRICE_IMPACT:.0%} for every size tried")
+                stats["failed_swaps"] += 1
+                continue
         
         # Log swap details
         log_info(f"Swap {i+1}/{num_swaps}: {amount} via {route}")
         
         # Execute the swap
-        tx_hash = swap_tokens(web3, private_key, amount, route)
+        usdc_before = balance_tracker.token_balance(config.USDC_ADDRESS)
+        tx_hash = swap_tokens(web3, private_key, amount, route, simulator, route_finder, balance_tracker, permit_signer, min_amount_out)
         
         if tx_hash:
             stats["successful_swaps"] += 1
@@ -651,60 +750,51 @@ def process_wallet_swaps(web3, private_key, swap_config, wallet_index, total_wal
             
             log_swap(i+1, num_swaps, amount, token_from, token_to, tx_hash)
             
-            # Update balances after successful swap
-            if route == "phrs_to_usdc":
-                balance_phrs = float(balance_phrs) - amount
-                usdc_balance += amount * 0.95  # Approximate, not exact
+            # Balances were already updated from the receipt, remember the leg output
+            if route == "phrs_to_usdc" and not balance_tracker.stale:
+                last_usdc_received = balance_tracker.token_balance(config.USDC_ADDRESS) - usdc_before
             elif route == "usdc_to_phrs":
-                usdc_balance -= amount
-                balance_phrs = float(balance_phrs) + amount * 0.95  # Approximate, not exact
+                last_usdc_received = 0
         else:
             stats["failed_swaps"] += 1
-        
-        # Wait between swaps unless it's the last one
-        if i < num_swaps - 1:
-            actual_wait = random.uniform(wait_time * 0.8, wait_time * 1.2)
-            log_info(f"Waiting {actual_wait:.1f} seconds before next swap...")
-            time.sleep(actual_wait)
-    
-    # Get final balances with proper formatting
-    final_balance_wei = web3.eth.get_balance(wallet_address)
-    final_balance_phrs = web3.from_wei(final_balance_wei, 'ether')
     
-    final_usdc_balance_wei = get_token_balance(web3, config.USDC_ADDRESS, wallet_address)
-    final_usdc_balance = final_usdc_balance_wei / (10 ** 6)
+    # Get final balances with proper formatting; if the refresh fails, the tracked values are still shown
+    if balance_tracker.stale:
+        try:
+            balance_tracker.seed(web3)
+        except Exception as e:
+            log_error(f"Error refreshing final balances, showing tracked balances: {str(e)}")
+    final_balance_phrs = web3.from_wei(balance_tracker.native_balance(), 'ether')
+    final_usdc_balance = tokens.from_base_units(config.USDC_ADDRESS, balance_tracker.token_balance(config.USDC_ADDRESS))
     
-    # Print summary
+    # Print summary, in one write so wallets finishing together do not mix their boxes
     elapsed_time = time.time() - start_time
     
-    print(f"\n{Fore.CYAN}{'═' * 70}{Style.RESET_ALL}")
-    print(f"{Fore.CYAN}║ {Fore.YELLOW}SWAP SUMMARY FOR WALLET {wallet_index+1}/{total_wallets}{' ' * (70 - 40)}{Fore.CYAN}║{Style.RESET_ALL}")
-    print(f"{Fore.CYAN}{'═' * 70}{Style.RESET_ALL}")
-    print(f"{Fore.CYAN}║{Style.RESET_ALL} Total swaps:           {stats['successful_swaps'] + stats['failed_swaps']}{' ' * (70 - 30)}{Fore.CYAN}║{Style.RESET_ALL}")
-    print(f"{Fore.CYAN}║{Style.RESET_ALL} Successful swaps:      {Fore.GREEN}{stats['successful_swaps']}{Style.RESET_ALL}{' ' * (70 - 30)}{Fore.CYAN}║{Style.RESET_ALL}")
-    print(f"{Fore.CYAN}║{Style.RESET_ALL} Failed swaps:          {Fore.RED}{stats['failed_swaps']}{Style.RESET_ALL}{' ' * (70 - 30)}{Fore.CYAN}║{Style.RESET_ALL}")
-    print(f"{Fore.CYAN}║{Style.RESET_ALL} PHRS→USDC swaps:       {stats['swap_routes']['phrs_to_usdc']}{' ' * (70 - 30)}{Fore.CYAN}║{Style.RESET_ALL}")
-    print(f"{Fore.CYAN}║{Style.RESET_ALL} USDC→PHRS swaps:       {stats['swap_routes']['usdc_to_phrs']}{' ' * (70 - 30)}{Fore.CYAN}║{Style.RESET_ALL}")
-    print(f"{Fore.CYAN}║{Style.RESET_ALL} Final PHRS balance:    {Fore.GREEN}{final_balance_phrs:.8f}{Style.RESET_ALL}{' ' * (70 - 38)}{Fore.CYAN}║{Style.RESET_ALL}")
-    print(f"{Fore.CYAN}║{Style.RESET_ALL} Final USDC balance:    {Fore.GREEN}{final_usdc_balance:.8f}{Style.RESET_ALL}{' ' * (70 - 38)}{Fore.CYAN}║{Style.RESET_ALL}")
-    print(f"{Fore.CYAN}║{Style.RESET_ALL} Time elapsed:          {elapsed_time:.2f} seconds{' ' * (70 - 40)}{Fore.CYAN}║{Style.RESET_ALL}")
-    print(f"{Fore.CYAN}{'═' * 70}{Style.RESET_ALL}")
+    write_lines(
+        f"\n{Fore.CYAN}{'═' * 70}{Style.RESET_ALL}",
+        f"{Fore.CYAN}║ {Fore.YELLOW}SWAP SUMMARY FOR WALLET {wallet_index+1}/{total_wallets}{' ' * (70 - 40)}{Fore.CYAN}║{Style.RESET_ALL}",
+        f"{Fore.CYAN}{'═' * 70}{Style.RESET_ALL}",
+        f"{Fore.CYAN}║{Style.RESET_ALL} Total swaps:           {stats['successful_swaps'] + stats['failed_swaps']}{' ' * (70 - 30)}{Fore.CYAN}║{Style.RESET_ALL}",
+        f"{Fore.CYAN}║{Style.RESET_ALL} Successful swaps:      {Fore.GREEN}{stats['successful_swaps']}{Style.RESET_ALL}{' ' * (70 - 30)}{Fore.CYAN}║{Style.RESET_ALL}",
+        f"{Fore.CYAN}║{Style.RESET_ALL} Failed swaps:          {Fore.RED}{stats['failed_swaps']}{Style.RESET_ALL}{' ' * (70 - 30)}{Fore.CYAN}║{Style.RESET_ALL}",
+        f"{Fore.CYAN}║{Style.RESET_ALL} PHRS→USDC swaps:       {stats['swap_routes']['phrs_to_usdc']}{' ' * (70 - 30)}{Fore.CYAN}║{Style.RESET_ALL}",
+        f"{Fore.CYAN}║{Style.RESET_ALL} USDC→PHRS swaps:       {stats['swap_routes']['usdc_to_phrs']}{' ' * (70 - 30)}{Fore.CYAN}║{Style.RESET_ALL}",
+        f"{Fore.CYAN}║{Style.RESET_ALL} Final PHRS balance:    {Fore.GREEN}{final_balance_phrs:.8f}{Style.RESET_ALL}{' ' * (70 - 38)}{Fore.CYAN}║{Style.RESET_ALL}",
+        f"{Fore.CYAN}║{Style.RESET_ALL} Final USDC balance:    {Fore.GREEN}{final_usdc_balance:.8f}{Style.RESET_ALL}{' ' * (70 - 38)}{Fore.CYAN}║{Style.RESET_ALL}",
+        f"{Fore.CYAN}║{Style.RESET_ALL} Time elapsed:          {elapsed_time:.2f} seconds{' ' * (70 - 40)}{Fore.CYAN}║{Style.RESET_ALL}",
+        f"{Fore.CYAN}{'═' * 70}{Style.RESET_ALL}",
+    )
     
     return stats
 
 def main():
     print_banner()
-    required_files = ["private_key.txt"]
-    for file_path in required_files:
-        if not check_file_exists(file_path):
-            sys.exit(1)
-
-    # Load private keys
-    private_keys = load_private_keys()
-    if not private_keys:
-        log_error("No valid private keys found in private_key.txt")
+    # Wallet addresses come from encrypted keystores (or private_key.txt); keys are decrypted on use
+    wallets = WalletRegistry().load()
+    if not wallets:
+        log_error(f"No wallets found in {config.KEYSTORE_DIR}/ or private_key.txt")
         sys.exit(1)
-    log_success(f"Loaded {len(private_keys)} wallets from private_key.txt")
+    log_success(f"Loaded {len(wallets)} wallets from {config.KEYSTORE_DIR + '/' if wallets.source == 'keystore' else 'private_key.txt'}")
     
     # Load proxies if available
     proxies = load_proxies()
@@ -712,42 +802,34 @@ def main():
 
     # Connect to RPC
     log_info("Connecting to Pharos Testnet...")
-    rpc_endpoints = [
-        "https://testnet.dplabs-internal.com",
-        "https://pharos-testnet.rpc.caldera.xyz/http",
-        "https://pharos-testnet-rpc.stress.run",
-        "https://pharos.rpc.thirdweb.com"
-    ]
     web3 = None
     connected = False
     
-    # Try different RPC endpoints
-    for endpoint in rpc_endpoints:
-        try:
-            log_info(f"Trying endpoint: {endpoint}")
-            # Add timeout to provider
-            web3 = Web3(Web3.HTTPProvider(endpoint, request_kwargs={'timeout': 180}))
-            if web3.is_connected():
-                connected = True
-                log_success(f"Connected to Pharos Testnet via {endpoint}")
-                break
-        except Exception as error:
-            log_error(f"Connection to {endpoint} failed: {str(error)}")
+    # One provider over all endpoints: unhealthy ones are skipped per request
+    try:
+        web3 = connect(config.RPC_ENDPOINTS, request_kwargs={'timeout': 180})
+        connected = True
+        log_success(f"Connected to Pharos Testnet via {web3.provider.endpoint_uri}")
+    except Exception as error:
+        log_error(f"Connection to RPC endpoints failed: {str(error)}")
     
     if not connected or web3 is None:
         log_error("Failed to connect to any Pharos Testnet RPC endpoints")
         sys.exit(1)
     
+    # Repeated reads within a block (gas price, balances, allowances, pool state) are served locally
+    enable_read_cache(web3)
+    
     # Display available wallets
-    display_wallets(web3, private_keys)
+    display_wallets(web3, wallets.addresses)
     
     # Wallet selection
     print(f"\n{Fore.YELLOW}Select wallet to use:{Style.RESET_ALL}")
-    print(f"  {Fore.CYAN}[1-{len(private_keys)}] Specific wallet{Style.RESET_ALL}")
-    print(f"  {Fore.CYAN}[0] All wallets (run sequentially){Style.RESET_ALL}")
+    print(f"  {Fore.CYAN}[1-{len(wallets)}] Specific wallet{Style.RESET_ALL}")
+    print(f"  {Fore.CYAN}[0] All wallets (run side by side){Style.RESET_ALL}")
     
     wallet_choice = -1
-    while wallet_choice < 0 or wallet_choice > len(private_keys):
+    while wallet_choice < 0 or wallet_choice > len(wallets):
         try:
             wallet_choice = int(input(f"{Fore.GREEN}Enter choice: {Style.RESET_ALL}"))
         except ValueError:
@@ -756,12 +838,15 @@ def main():
     # Process single wallet or all wallets
     wallets_to_process = []
     if wallet_choice == 0:
-        log_info("Running with all wallets sequentially")
-        wallets_to_process = list(range(len(private_keys)))
+        log_info("Running with all wallets side by side")
+        wallets_to_process = list(range(len(wallets)))
     else:
         log_info(f"Running with wallet #{wallet_choice}")
         wallets_to_process = [wallet_choice - 1]
     
+    # Decrypt only the selected wallets, all of them in parallel before the run starts
+    wallets.unlock(wallets_to_process)
+    
     # Get swap configuration
     print(f"\n{Fore.CYAN}{'═' * 70}{Style.RESET_ALL}")
     print(f"{Fore.CYAN}║ {Fore.YELLOW}SWAP CONFIGURATION{' ' * 51}{Fore.CYAN}║{Style.RESET_ALL}")
@@ -792,6 +877,10 @@ def main():
         log_error("Invalid input. Please enter valid numbers.")
         sys.exit(1)
     
+    # Load the pool graph once (from route_cache.json when fresh) and share it across wallets
+    route_finder = RouteFinder(web3)
+    route_finder.load_graph()
+    
     # Process wallets
     overall_stats = {
         "total_wallets": len(wallets_to_process),
@@ -803,21 +892,25 @@ def main():
     
     start_time = time.time()
     
+    # Wallets run side by side (PACING_WORKERS at a time, starts spaced by WALLET_START_INTERVAL);
+    # each paces its own swaps, so one wallet's waits are filled with the others' work
+    scheduler = PacingScheduler()
+    jobs = []
     for idx, wallet_idx in enumerate(wallets_to_process):
-        private_key = private_keys[wallet_idx]
-        stats = process_wallet_swaps(web3, private_key, swap_config, idx, len(wallets_to_process), proxy_manager)
-        
+        private_key = wallets.private_key(wallet_idx)
+        if private_key is None:
+            log_error(f"Skipping wallet #{wallet_idx + 1}: key not available")
+            continue
+        jobs.append(lambda private_key=private_key, idx=idx: process_wallet_swaps(
+            web3, private_key, swap_config, idx, len(wallets_to_process), proxy_manager, route_finder, scheduler
+        ))
+    
+    for stats in scheduler.run(jobs):
         if stats:
             overall_stats["processed_wallets"] += 1
             overall_stats["total_swaps"] += stats["successful_swaps"] + stats["failed_swaps"]
             overall_stats["successful_swaps"] += stats["successful_swaps"]
             overall_stats["failed_swaps"] += stats["failed_swaps"]
-        
-        # Wait between wallets
-        if idx < len(wallets_to_process) - 1:
-            wait_between_wallets = 10
-            log_info(f"Waiting {wait_between_wallets} seconds before processing next wallet...")
-            time.sleep(wait_between_wallets)
     
     # Print overall summary if processing multiple wallets
     if len(wallets_to_process) > 1:
@@ -840,6 +933,16 @@ def main():
         print(f"{Fore.CYAN}║{Style.RESET_ALL} Total time elapsed:       {total_elapsed_time:.2f} seconds{' ' * (70 - 45)}{Fore.CYAN}║{Style.RESET_ALL}")
         print(f"{Fore.CYAN}{'═' * 70}{Style.RESET_ALL}")
     
+    # Per-stage timing of every transaction; `python tx_records.py report` shows it again later
+    print(f"\n{Fore.CYAN}Transaction timing:{Style.RESET_ALL}")
+    for line in report_lines(recorder.rows()):
+        print(f"  {line}")
+    try:
+        count = recorder.write_jsonl(config.TX_RECORDS_FILE)
+        log_info(f"{count} transaction records appended to {config.TX_RECORDS_FILE}")
+    except Exception as error:
+        log_error(f"Failed to write transaction records: {str(error)}")
+    
     log_success("Swap operations completed!")
 
 if __name__ == "__main__":
@@ -0,0 +1,164 @@
+import pytest
+from web3 import Web3
+import config
+from calldata import (
+    _address, _int, _uint, encode_approve, encode_collect, encode_decrease_liquidity, encode_exact_input,
+    encode_exact_input_single, encode_mint, encode_multicall, encode_transfer
+)
+from routing import encode_path
+
+MAX_UINT256 = 2**256 - 1
+MAX_UINT128 = 2**128 - 1
+MAX_UINT160 = 2**160 - 1
+ALICE = Web3.to_checksum_address("0x" + "11" * 20)
+BOB = Web3.to_checksum_address("0x" + "ab" * 20)
+WPHRS = Web3.to_checksum_address(config.WPHRS_ADDRESS)
+USDC = Web3.to_checksum_address(config.USDC_ADDRESS)
+USDT = Web3.to_checksum_address(config.USDT_ADDRESS)
+
+
+def web3_encode(abi, name, args):
+    """Calldata web3 itself builds for a call, across web3.py versions"""
+    contract = Web3().eth.contract(abi=abi)
+    if hasattr(contract, "encode_abi"):
+        return contract.encode_abi(name, args=args)
+    return contract.encodeABI(fn_name=name, args=args)
+
+
+def mint_params(**overrides):
+    params = {
+        "token0": WPHRS,
+        "token1": USDC,
+        "fee": 3000,
+        "tickLower": -60000,
+        "tickUpper": 60000,
+        "amount0Desired": 10**18,
+        "amount1Desired": 5 * 10**6,
+        "amount0Min": 0,
+        "amount1Min": 0,
+        "recipient": ALICE,
+        "deadline": 1700000000,
+    }
+    params.update(overrides)
+    return params
+
+
+@pytest.mark.parametrize("amount", [0, 1, 10**18, MAX_UINT256])
+def test_approve_and_transfer_match_web3(amount):
+    assert encode_approve(BOB, amount) == web3_encode(config.ERC20_ABI, "approve", [BOB, amount])
+    assert encode_transfer(BOB, amount) == web3_encode(config.ERC20_ABI, "transfer", [BOB, amount])
+
+
+def test_address_case_does_not_change_calldata():
+    assert encode_approve(BOB.lower(), 1) == encode_approve(BOB, 1)
+
+
+@pytest.mark.parametrize("fee, amount_in, sqrt_price_limit", [
+    (500, 10**18, 0),
+    (2**24 - 1, MAX_UINT256, MAX_UINT160),
+])
+def test_exact_input_single_matches_web3(fee, amount_in, sqrt_price_limit):
+    params = {
+        "tokenIn": WPHRS,
+        "tokenOut": USDC,
+        "fee": fee,
+        "recipient": ALICE,
+        "amountIn": amount_in,
+        "amountOutMinimum": 12345,
+        "sqrtPriceLimitX96": sqrt_price_limit,
+    }
+    expected = web3_encode(config.SWAP_ROUTER_ABI, "exactInputSingle", [tuple(params.values())])
+    assert encode_exact_input_single(params) == expected
+
+
+@pytest.mark.parametrize("tokens, fees", [
+    ([WPHRS, USDC], [3000]),
+    ([WPHRS, USDT, USDC], [500, 3000]),
+    ([WPHRS, USDT, USDC, WPHRS], [500, 100, 10000]),
+])
+def test_exact_input_matches_web3_for_multi_hop_paths(tokens, fees):
+    path = encode_path(tokens, fees)
+    params = {"path": path, "recipient": ALICE, "amountIn": 10**18, "amountOutMinimum": MAX_UINT256}
+    expected = web3_encode(config.SWAP_ROUTER_ABI, "exactInput", [(path, ALICE, 10**18, MAX_UINT256)])
+    assert encode_exact_input(params) == expected
+    # hex paths are accepted as well as bytes
+    assert encode_exact_input(dict(params, path="0x" + path.hex())) == expected
+
+
+@pytest.mark.parametrize("calls", [
+    [],
+    [b""],
+    [b"\x01"],
+    [b"\x01\x02\x03", b"\xff" * 32, b"\xaa" * 33],
+    [bytes.fromhex(encode_approve(BOB, 1)[2:]), bytes.fromhex(encode_mint(mint_params())[2:])],
+])
+def test_multicall_matches_web3_for_empty_and_odd_length_items(calls):
+    expected = web3_encode(config.POSITION_MANAGER_ABI, "multicall", [calls])
+    assert encode_multicall(calls) == expected
+    assert encode_multicall(["0x" + call.hex() for call in calls]) == expected
+    assert encode_multicall(calls) == web3_encode(config.SWAP_ROUTER_ABI, "multicall", [calls])
+
+
+@pytest.mark.parametrize("tick_lower, tick_upper", [
+    (-60000, 60000),
+    (-887272, 887272),
+    (-2**23, 2**23 - 1),
+    (-120, -60),
+])
+def test_mint_matches_web3_with_negative_ticks(tick_lower, tick_upper):
+    params = mint_params(tickLower=tick_lower, tickUpper=tick_upper, amount0Desired=MAX_UINT256)
+    expected = web3_encode(config.POSITION_MANAGER_ABI, "mint", [tuple(params.values())])
+    assert encode_mint(params) == expected
+
+
+@pytest.mark.parametrize("liquidity", [0, 1, MAX_UINT128])
+def test_decrease_liquidity_matches_web3(liquidity):
+    params = {"tokenId": 4242, "liquidity": liquidity, "amount0Min": 0, "amount1Min": MAX_UINT256, "deadline": 1700000000}
+    expected = web3_encode(config.POSITION_MANAGER_ABI, "decreaseLiquidity", [tuple(params.values())])
+    assert encode_decrease_liquidity(params) == expected
+
+
+def test_collect_matches_web3_with_max_amounts():
+    params = {"tokenId": MAX_UINT256, "recipient": ALICE, "amount0Max": MAX_UINT128, "amount1Max": MAX_UINT128}
+    expected = web3_encode(config.POSITION_MANAGER_ABI, "collect", [tuple(params.values())])
+    assert encode_collect(params) == expected
+
+
+@pytest.mark.parametrize("value, bits", [
+    (-1, 256),
+    (2**256, 256),
+    (2**24, 24),
+    (2**128, 128),
+    (1.0, 256),
+    ("1", 256),
+    (True, 256),
+])
+def test_uint_rejects_out_of_range_values(value, bits):
+    with pytest.raises(ValueError):
+        _uint(value, bits)
+
+
+@pytest.mark.parametrize("value", [-2**23 - 1, 2**23, 1.5, False])
+def test_int_rejects_out_of_range_values(value):
+    with pytest.raises(ValueError):
+        _int(value, 24)
+
+
+def test_int_range_edges_are_accepted():
+    assert _int(-2**23, 24) == (2**256 - 2**23).to_bytes(32, "big")
+    assert _int(2**23 - 1, 24) == (2**23 - 1).to_bytes(32, "big")
+
+
+@pytest.mark.parametrize("value", ["0x1234", "0x" + "11" * 21, b"\x11" * 19, ""])
+def test_address_rejects_wrong_lengths(value):
+    with pytest.raises(ValueError):
+        _address(value)
+
+
+def test_encoders_surface_range_errors():
+    with pytest.raises(ValueError):
+        encode_approve(BOB, MAX_UINT256 + 1)
+    with pytest.raises(ValueError):
+        encode_mint(mint_params(tickLower=-2**23 - 1))
+    with pytest.raises(ValueError):
+        encode_collect({"tokenId": 1, "recipient": ALICE, "amount0Max": MAX_UINT128 + 1, "amount1Max": 0})
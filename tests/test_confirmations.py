@@ -0,0 +1,298 @@
+import json
+import queue
+import threading
+import time
+import pytest
+import config
+import confirmations
+from confirmations import HeadWatcher, PendingTracker
+
+
+def head_message(number):
+    return {"jsonrpc": "2.0", "method": "eth_subscription", "params": {"subscription": "0x1", "result": {"number": hex(number)}}}
+
+
+SUBSCRIBED = {"jsonrpc": "2.0", "id": 1, "result": "0x1"}
+
+
+def wait_until(predicate, timeout=5):
+    deadline = time.time() + timeout
+    while not predicate():
+        if time.time() > deadline:
+            raise AssertionError("condition not reached in time")
+        time.sleep(0.01)
+
+
+class FakeSocket:
+    """newHeads socket fed from a queue; an exception put on the queue is raised by recv() like a dropped connection"""
+    def __init__(self):
+        self.messages = queue.Queue()
+        self.sent = []
+
+    def send(self, data):
+        self.sent.append(json.loads(data))
+
+    def recv(self):
+        item = self.messages.get(timeout=5)
+        if isinstance(item, Exception):
+            raise item
+        return json.dumps(item)
+
+    def close(self):
+        self.messages.put(ConnectionError("closed"))
+
+
+class FakeWebsocket:
+    """Stands in for the websocket-client module; each create_connection takes the next outcome"""
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.connects = 0
+
+    def create_connection(self, url, timeout=None):
+        self.connects += 1
+        outcome = self.outcomes.pop(0) if self.outcomes else ConnectionRefusedError("no more sockets")
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+class FakeEth:
+    def __init__(self):
+        self.head = 100
+        self.block_number_calls = 0
+        self.receipts = {}
+        self.pool = set()
+        self.nonces = {"latest": 0, "pending": 0}
+
+    @property
+    def block_number(self):
+        self.block_number_calls += 1
+        return self.head
+
+    def get_transaction_receipt(self, tx_hash):
+        if tx_hash not in self.receipts:
+            raise LookupError("TransactionNotFound")
+        return self.receipts[tx_hash]
+
+    def get_transaction(self, tx_hash):
+        if tx_hash not in self.pool:
+            raise LookupError("TransactionNotFound")
+        return {"hash": tx_hash}
+
+    def get_transaction_count(self, address, block_identifier):
+        return self.nonces[block_identifier]
+
+
+class FakeWeb3:
+    def __init__(self):
+        self.eth = FakeEth()
+
+    def to_hex(self, value):
+        return "0x" + bytes(value).hex()
+
+
+@pytest.fixture
+def web3():
+    return FakeWeb3()
+
+
+@pytest.fixture
+def fast_backoff(monkeypatch):
+    delays = []
+
+    def backoff_delay(attempt, base=None, cap=None):
+        delays.append((attempt, cap))
+        return 0.01
+
+    monkeypatch.setattr(confirmations, "backoff_delay", backoff_delay)
+    return delays
+
+
+@pytest.fixture
+def watchers():
+    started = []
+    yield started
+    for watcher in started:
+        watcher.stop()
+
+
+def start_watcher(watchers, web3, monkeypatch, fake_websocket, poll_interval=0.01):
+    monkeypatch.setattr(confirmations, "websocket", fake_websocket)
+    watcher = HeadWatcher(web3, ws_url="ws://localhost:8546", poll_interval=poll_interval)
+    watchers.append(watcher)
+    return watcher.start()
+
+
+def test_heads_reach_new_head_listeners(web3, monkeypatch, watchers, fast_backoff):
+    socket = FakeSocket()
+    watcher = start_watcher(watchers, web3, monkeypatch, FakeWebsocket(socket))
+    seen = []
+    watcher.on_new_head(seen.append)
+
+    socket.messages.put(SUBSCRIBED)
+    for number in (101, 102, 102, 101, 103):
+        socket.messages.put(head_message(number))
+
+    wait_until(lambda: seen == [101, 102, 103])
+    assert socket.sent[0]["method"] == "eth_subscribe" and socket.sent[0]["params"] == ["newHeads"]
+    assert watcher.ws_connected
+    assert watcher.block_number == 103
+    assert web3.eth.block_number_calls == 0
+
+
+def test_polls_over_http_when_websocket_client_is_missing(web3, monkeypatch):
+    monkeypatch.setattr(confirmations, "websocket", None)
+    watcher = HeadWatcher(web3, ws_url="ws://localhost:8546", poll_interval=0.01).start()
+    assert watcher._thread is None
+
+    threading.Timer(0.05, lambda: setattr(web3.eth, "head", 101)).start()
+    assert watcher.wait_for_block(after=100, timeout=5) == 101
+    assert web3.eth.block_number_calls > 1
+
+
+def test_polls_over_http_when_the_socket_drops(web3, monkeypatch, watchers, fast_backoff):
+    socket = FakeSocket()
+    watcher = start_watcher(watchers, web3, monkeypatch, FakeWebsocket(socket))
+    socket.messages.put(SUBSCRIBED)
+    socket.messages.put(head_message(100))
+    wait_until(lambda: watcher.block_number == 100)
+
+    socket.messages.put(ConnectionResetError("socket dropped"))
+    wait_until(lambda: not watcher.ws_connected)
+    web3.eth.head = 101
+    assert watcher.wait_for_block(after=100, timeout=5) == 101
+    assert web3.eth.block_number_calls > 0
+
+
+def test_reconnects_with_backoff(web3, monkeypatch, watchers, fast_backoff):
+    socket = FakeSocket()
+    fake_websocket = FakeWebsocket(ConnectionRefusedError("down"), ConnectionRefusedError("still down"), socket)
+    watcher = start_watcher(watchers, web3, monkeypatch, fake_websocket)
+    socket.messages.put(SUBSCRIBED)
+    socket.messages.put(head_message(105))
+
+    wait_until(lambda: watcher.block_number == 105)
+    assert fake_websocket.connects == 3
+    # Backoff grows with each failed attempt and is capped by BACKOFF_CAP
+    assert fast_backoff[:2] == [(0, config.BACKOFF_CAP), (1, config.BACKOFF_CAP)]
+
+
+def test_refused_subscription_counts_as_a_failed_connection(web3, monkeypatch, watchers, fast_backoff):
+    refused, socket = FakeSocket(), FakeSocket()
+    refused.messages.put({"jsonrpc": "2.0", "id": 1, "error": {"code": -32601, "message": "method not found"}})
+    fake_websocket = FakeWebsocket(refused, socket)
+    watcher = start_watcher(watchers, web3, monkeypatch, fake_websocket)
+    socket.messages.put(SUBSCRIBED)
+    socket.messages.put(head_message(110))
+
+    wait_until(lambda: watcher.block_number == 110)
+    assert fake_websocket.connects == 2
+
+
+def test_wait_for_receipts_resolves_on_a_new_head(web3, monkeypatch, watchers, fast_backoff):
+    monkeypatch.setattr(config, "DROP_CHECK_INTERVAL", 60)
+    socket = FakeSocket()
+    # A poll interval this long means only a pushed head can wake the waiter in time
+    watcher = start_watcher(watchers, web3, monkeypatch, FakeWebsocket(socket), poll_interval=30)
+    socket.messages.put(SUBSCRIBED)
+    socket.messages.put(head_message(100))
+    wait_until(lambda: watcher.block_number == 100)
+
+    tx_hash = "0x" + "ab" * 32
+    receipt = {"transactionHash": tx_hash, "blockNumber": 101, "status": 1}
+
+    def mine():
+        web3.eth.receipts[tx_hash] = receipt
+        socket.messages.put(head_message(101))
+
+    threading.Timer(0.1, mine).start()
+    tracker = PendingTracker(web3, head_watcher=watcher)
+    started = time.time()
+    receipts = tracker.wait_for_receipts([tx_hash], timeout=10)
+
+    assert receipts == {tx_hash: receipt}
+    assert time.time() - started < 5
+    assert tracker.outcomes[tx_hash] == confirmations.MINED
+    assert web3.eth.block_number_calls == 0
+    included, confirmed = tracker.receipt_times(tx_hash, receipt)
+    assert included <= confirmed
+
+
+class StillWatcher:
+    """Head watcher whose chain never moves, for status checks that need no heads"""
+    block_number = 100
+
+    def wait_for_block(self, after=None, timeout=None):
+        time.sleep(min(timeout or 0, 0.01))
+        return self.block_number
+
+
+SENDER = "0x" + "11" * 20
+TX_HASH = "0x" + "cd" * 32
+
+
+def tracked(web3, nonce=5):
+    tracker = PendingTracker(web3, head_watcher=StillWatcher())
+    tracker.track(TX_HASH, b"\x02raw", SENDER, nonce)
+    return tracker
+
+
+def test_status_is_pending_while_a_node_has_the_transaction(web3):
+    web3.eth.pool.add(TX_HASH)
+    assert tracked(web3).status(TX_HASH) == confirmations.PENDING
+
+
+def test_status_is_dropped_when_no_node_has_it_and_the_nonce_is_free(web3):
+    web3.eth.nonces = {"latest": 5, "pending": 5}
+    assert tracked(web3, nonce=5).status(TX_HASH) == confirmations.DROPPED
+
+
+def test_status_is_dropped_for_an_unknown_untracked_hash(web3):
+    tracker = PendingTracker(web3, head_watcher=StillWatcher())
+    assert tracker.status(TX_HASH) == confirmations.DROPPED
+
+
+@pytest.mark.parametrize("latest, pending", [(6, 6), (5, 6)])
+def test_status_is_replaced_when_another_transaction_took_the_nonce(web3, latest, pending):
+    web3.eth.nonces = {"latest": latest, "pending": pending}
+    assert tracked(web3, nonce=5).status(TX_HASH) == confirmations.REPLACED
+
+
+def test_status_is_mined_when_the_receipt_shows_up_with_the_nonce(web3):
+    web3.eth.nonces = {"latest": 6, "pending": 6}
+    tracker = tracked(web3, nonce=5)
+    fetches = []
+
+    def get_transaction_receipt(tx_hash):
+        # Mined between the first receipt lookup and the nonce check
+        fetches.append(tx_hash)
+        if len(fetches) == 1:
+            raise LookupError("TransactionNotFound")
+        return {"transactionHash": tx_hash, "status": 1}
+
+    web3.eth.get_transaction_receipt = get_transaction_receipt
+    assert tracker.status(TX_HASH) == confirmations.MINED
+
+
+def test_dropped_transaction_is_resent(web3, monkeypatch):
+    monkeypatch.setattr(config, "DROP_CHECK_INTERVAL", 0)
+    resent = []
+    monkeypatch.setattr(confirmations, "send_raw_transaction", lambda web3, raw: resent.append(raw))
+    web3.eth.nonces = {"latest": 5, "pending": 5}
+    tracker = tracked(web3, nonce=5)
+
+    assert tracker.wait_for_receipts([TX_HASH], timeout=0.2) == {TX_HASH: None}
+    assert resent and resent[0] == b"\x02raw"
+    assert tracker.outcomes[TX_HASH] == confirmations.DROPPED
+
+
+def test_wait_for_receipt_raises_when_replaced(web3, monkeypatch):
+    monkeypatch.setattr(config, "DROP_CHECK_INTERVAL", 0)
+    web3.eth.nonces = {"latest": 6, "pending": 6}
+    tracker = tracked(web3, nonce=5)
+
+    started = time.time()
+    with pytest.raises(confirmations.TransactionReplaced):
+        tracker.wait_for_receipt(TX_HASH, timeout=10)
+    # Stops waiting as soon as the nonce is known to be taken
+    assert time.time() - started < 5
@@ -0,0 +1,138 @@
+import pytest
+from web3 import Web3
+from disperse import DISPERSE_INIT, DISPERSE_RUNTIME, MAX_AMOUNT, encode_batch
+
+# Runs the contract on an in-process dev chain (eth-tester on py-evm)
+eth_tester = pytest.importorskip("eth_tester", reason="eth-tester[py-evm] is needed for the dev chain")
+pytest.importorskip("eth", reason="py-evm is needed for the dev chain")
+from web3 import EthereumTesterProvider  # noqa: E402
+
+# Runtime code that reverts on every call, so paying it fails: PUSH1 0 DUP1 REVERT
+REVERTER_RUNTIME = bytes.fromhex("600080fd")
+REVERTER_INIT = bytes.fromhex("6004600c60003960046000f3") + REVERTER_RUNTIME
+
+GAS = 1000000
+
+
+@pytest.fixture
+def web3():
+    return Web3(EthereumTesterProvider(eth_tester.EthereumTester(eth_tester.PyEVMBackend())))
+
+
+@pytest.fixture
+def sender(web3):
+    return web3.eth.accounts[0]
+
+
+def deploy(web3, sender, init_code):
+    receipt = web3.eth.wait_for_transaction_receipt(web3.eth.send_transaction({"from": sender, "data": init_code}))
+    assert receipt.status == 1
+    return receipt.contractAddress
+
+
+@pytest.fixture
+def disperse(web3, sender):
+    return deploy(web3, sender, DISPERSE_INIT)
+
+
+def fresh_accounts(count):
+    return [Web3.to_checksum_address("0x" + f"{index + 1:02x}" * 20) for index in range(count)]
+
+
+def send_batch(web3, sender, contract, payments, value, data=None):
+    tx_hash = web3.eth.send_transaction({
+        "from": sender,
+        "to": contract,
+        "value": value,
+        "data": encode_batch(payments) if data is None else data,
+        "gas": GAS,
+    })
+    return web3.eth.wait_for_transaction_receipt(tx_hash)
+
+
+def gas_cost(receipt):
+    return receipt.gasUsed * receipt.effectiveGasPrice
+
+
+def test_init_code_deploys_the_runtime(web3, disperse):
+    assert bytes(web3.eth.get_code(disperse)) == DISPERSE_RUNTIME
+
+
+def test_pays_each_recipient_exactly(web3, sender, disperse):
+    recipients = fresh_accounts(5)
+    amounts = [1, 10**18, 12345678901234567, 3, MAX_AMOUNT // 10**6]
+    payments = list(zip(recipients, amounts))
+    sender_before = web3.eth.get_balance(sender)
+
+    receipt = send_batch(web3, sender, disperse, payments, sum(amounts))
+
+    assert receipt.status == 1
+    assert [web3.eth.get_balance(recipient) for recipient in recipients] == amounts
+    assert web3.eth.get_balance(disperse) == 0
+    assert sender_before - web3.eth.get_balance(sender) == sum(amounts) + gas_cost(receipt)
+
+
+def test_same_recipient_twice_is_paid_twice(web3, sender, disperse):
+    recipient = fresh_accounts(1)[0]
+    receipt = send_batch(web3, sender, disperse, [(recipient, 5), (recipient, 7)], 12)
+    assert receipt.status == 1
+    assert web3.eth.get_balance(recipient) == 12
+
+
+def test_refunds_excess_value_to_the_caller(web3, sender, disperse):
+    recipients = fresh_accounts(2)
+    payments = [(recipients[0], 10**15), (recipients[1], 2 * 10**15)]
+    excess = 10**18
+    sender_before = web3.eth.get_balance(sender)
+
+    receipt = send_batch(web3, sender, disperse, payments, 3 * 10**15 + excess)
+
+    assert receipt.status == 1
+    assert web3.eth.get_balance(disperse) == 0
+    assert sender_before - web3.eth.get_balance(sender) == 3 * 10**15 + gas_cost(receipt)
+
+
+def test_empty_batch_refunds_everything(web3, sender, disperse):
+    sender_before = web3.eth.get_balance(sender)
+    receipt = send_batch(web3, sender, disperse, [], 10**18)
+    assert receipt.status == 1
+    assert sender_before - web3.eth.get_balance(sender) == gas_cost(receipt)
+
+
+def test_reverts_when_underfunded(web3, sender, disperse):
+    recipients = fresh_accounts(2)
+    payments = [(recipients[0], 5), (recipients[1], 7)]
+
+    receipt = send_batch(web3, sender, disperse, payments, 11)
+
+    assert receipt.status == 0
+    assert [web3.eth.get_balance(recipient) for recipient in recipients] == [0, 0]
+    assert web3.eth.get_balance(disperse) == 0
+
+
+def test_one_reverting_recipient_reverts_the_whole_batch(web3, sender, disperse):
+    reverter = deploy(web3, sender, REVERTER_INIT)
+    first, last = fresh_accounts(2)
+    payments = [(first, 5), (reverter, 1), (last, 7)]
+    sender_before = web3.eth.get_balance(sender)
+
+    receipt = send_batch(web3, sender, disperse, payments, 13)
+
+    assert receipt.status == 0
+    assert [web3.eth.get_balance(account) for account in (first, reverter, last)] == [0, 0, 0]
+    assert sender_before - web3.eth.get_balance(sender) == gas_cost(receipt)
+
+
+def test_reverts_on_calldata_that_is_not_whole_entries(web3, sender, disperse):
+    recipient = fresh_accounts(1)[0]
+    data = encode_batch([(recipient, 5)]) + b"\x00"
+    receipt = send_batch(web3, sender, disperse, None, 5, data=data)
+    assert receipt.status == 0
+    assert web3.eth.get_balance(recipient) == 0
+
+
+def test_encode_batch_rejects_amounts_over_96_bits():
+    with pytest.raises(ValueError):
+        encode_batch([(fresh_accounts(1)[0], MAX_AMOUNT + 1)])
+    with pytest.raises(ValueError):
+        encode_batch([(fresh_accounts(1)[0], -1)])
@@ -0,0 +1,170 @@
+import pytest
+from web3 import Web3
+import config
+import indexer
+from events import INCREASE_LIQUIDITY_TOPIC, TRANSFER_TOPIC
+from indexer import EventIndexer
+
+WALLET = "0x" + "11" * 20
+BOB = "0x" + "22" * 20
+ZERO = "0x" + "00" * 20
+NPM = config.POSITION_MANAGER_ADDRESS.lower()
+TOKEN0 = "0x" + "aa" * 20
+TOKEN1 = "0x" + "bb" * 20
+HEAD = 1000
+
+BALANCE_OF = bytes.fromhex("70a08231")
+TOKEN_OF_OWNER_BY_INDEX = bytes.fromhex("2f745c59")
+POSITIONS = bytes.fromhex("99fbab88")
+
+
+def word(value):
+    return (value % 2**256).to_bytes(32, "big")
+
+
+def topic(value):
+    return "0x" + word(value).hex()
+
+
+def address_topic(address):
+    return "0x" + "00" * 12 + address[2:]
+
+
+class FakeChain:
+    """Position manager state at the head, plus the logs that led there"""
+    def __init__(self):
+        self.owners = {}
+        self.liquidity = {}
+        self.logs = []
+        self.enumerations = 0
+
+    def mint(self, token_id, owner, liquidity, block):
+        self.transfer(token_id, ZERO, owner, block)
+        self.liquidity[token_id] = liquidity
+        self.logs.append({
+            "address": NPM, "blockNumber": block, "logIndex": len(self.logs),
+            "transactionHash": topic(len(self.logs) + 1),
+            "topics": ["0x" + INCREASE_LIQUIDITY_TOPIC.hex(), topic(token_id)],
+            "data": "0x" + (word(liquidity) + word(1) + word(2)).hex(),
+        })
+
+    def transfer(self, token_id, sender, recipient, block):
+        self.owners[token_id] = recipient
+        self.logs.append({
+            "address": NPM, "blockNumber": block, "logIndex": len(self.logs),
+            "transactionHash": topic(len(self.logs) + 1),
+            "topics": ["0x" + TRANSFER_TOPIC.hex(), address_topic(sender), address_topic(recipient), topic(token_id)],
+            "data": "0x",
+        })
+
+    def get_logs(self, params):
+        def matches(log):
+            if not params["fromBlock"] <= log["blockNumber"] <= params["toBlock"]:
+                return False
+            if "address" in params and log["address"] != params["address"].lower():
+                return False
+            for wanted, actual in zip(params["topics"], log["topics"]):
+                if wanted is not None and actual not in (wanted if isinstance(wanted, list) else [wanted]):
+                    return False
+            return len(params["topics"]) <= len(log["topics"])
+        return [log for log in self.logs if matches(log)]
+
+    def call(self, data):
+        selector, args = data[:4], data[4:]
+        if selector == BALANCE_OF:
+            self.enumerations += 1
+            owner = "0x" + args[12:32].hex()
+            return word(sum(1 for holder in self.owners.values() if holder == owner))
+        if selector == TOKEN_OF_OWNER_BY_INDEX:
+            owner = "0x" + args[12:32].hex()
+            held = sorted(token_id for token_id, holder in self.owners.items() if holder == owner)
+            return word(held[int.from_bytes(args[32:64], "big")])
+        if selector == POSITIONS:
+            token_id = int.from_bytes(args[:32], "big")
+            return b"".join([
+                word(0), word(0), bytes(12) + bytes.fromhex(TOKEN0[2:]), bytes(12) + bytes.fromhex(TOKEN1[2:]),
+                word(3000), word(-600), word(600), word(self.liquidity[token_id]), word(0), word(0), word(0), word(0),
+            ])
+        raise AssertionError(f"unexpected call {data.hex()}")
+
+
+class FakeEth:
+    def __init__(self, chain):
+        self.chain = chain
+        self.block_number = HEAD
+
+    def contract(self, address, abi):
+        return Web3().eth.contract(address=address, abi=abi)
+
+    def get_logs(self, params):
+        return self.chain.get_logs(params)
+
+
+class FakeWeb3:
+    def __init__(self, chain):
+        self.eth = FakeEth(chain)
+
+    def to_checksum_address(self, address):
+        return Web3.to_checksum_address(address)
+
+
+@pytest.fixture
+def chain(monkeypatch):
+    chain = FakeChain()
+
+    def batch_eth_call(web3, calls, block_identifier="latest"):
+        assert block_identifier == web3.eth.block_number
+        return [chain.call(bytes.fromhex(call["data"][2:])) for call in calls]
+
+    monkeypatch.setattr(indexer, "batch_eth_call", batch_eth_call)
+    monkeypatch.setattr(config, "INDEXER_START_BLOCK", None)
+    monkeypatch.setattr(config, "INDEXER_LOOKBACK_BLOCKS", 500)
+    return chain
+
+
+@pytest.fixture
+def event_indexer(chain, tmp_path):
+    event_indexer = EventIndexer(FakeWeb3(chain), [Web3.to_checksum_address(WALLET)], str(tmp_path / "indexer.db"))
+    yield event_indexer
+    event_indexer.close()
+
+
+def test_position_minted_before_the_lookback_window_is_found(chain, event_indexer):
+    chain.mint(7, WALLET, 5000, block=100)
+
+    assert event_indexer.sync() == 500
+    positions = event_indexer.get_positions(WALLET)
+    assert [position["token_id"] for position in positions] == [7]
+    assert positions[0]["liquidity"] == 5000
+    assert positions[0]["token0"] == Web3.to_checksum_address(TOKEN0)
+    assert positions[0]["tick_lower"] == -600
+
+
+def test_positions_follow_logs_after_the_first_sync(chain, event_indexer):
+    chain.mint(7, WALLET, 5000, block=100)
+    event_indexer.sync()
+    assert chain.enumerations == 1
+
+    chain.mint(8, WALLET, 10, block=1001)
+    chain.transfer(7, WALLET, BOB, block=1002)
+    event_indexer.web3.eth.block_number = 1002
+
+    assert event_indexer.sync() == 2
+    # The snapshot is only taken once, later syncs follow the logs
+    assert chain.enumerations == 1
+    assert [position["token_id"] for position in event_indexer.get_positions(WALLET)] == [8]
+    assert [position["token_id"] for position in event_indexer.get_positions(BOB)] == [7]
+
+
+def test_window_logs_do_not_undo_the_snapshot(chain, event_indexer):
+    # Sent away and back inside the window, then one sent away for good
+    chain.mint(7, WALLET, 5000, block=100)
+    chain.transfer(7, WALLET, BOB, block=700)
+    chain.transfer(7, BOB, WALLET, block=800)
+    chain.mint(9, WALLET, 20, block=600)
+    chain.transfer(9, WALLET, BOB, block=900)
+
+    event_indexer.sync()
+
+    assert [position["token_id"] for position in event_indexer.get_positions(WALLET)] == [7]
+    assert [position["token_id"] for position in event_indexer.get_positions(BOB)] == [9]
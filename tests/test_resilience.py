@@ -0,0 +1,118 @@
+import time
+import pytest
+import config
+from resilience import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError, breaker_for, call_with_retry
+from rpc_pool import PooledHTTPProvider
+
+
+class Response:
+    def __init__(self, status_code):
+        self.status_code = status_code
+        self.headers = {}
+
+
+@pytest.fixture(autouse=True)
+def no_pauses(monkeypatch):
+    monkeypatch.setattr(config, "LIMITER_OVERLOAD_PAUSE", 0)
+    monkeypatch.setattr(config, "BACKOFF_BASE", 0.001)
+
+
+def half_open(breaker):
+    """Open the breaker and let its reset timeout pass"""
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+    assert breaker.state == OPEN
+    breaker.opened_at = time.time() - breaker.reset_timeout
+    assert breaker.state == HALF_OPEN
+    return breaker
+
+
+def test_half_open_breaker_lets_one_probe_through():
+    breaker = half_open(CircuitBreaker("probe-once"))
+    assert breaker.allow()
+    assert not breaker.allow()
+
+
+def test_released_probe_can_probe_again():
+    breaker = half_open(CircuitBreaker("probe-release"))
+    assert breaker.allow()
+    breaker.release_probe()
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CLOSED
+
+
+def test_failed_probe_reopens_the_breaker():
+    breaker = half_open(CircuitBreaker("probe-fail"))
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert breaker.retry_after() > 0
+
+
+def test_overloaded_probe_in_call_with_retry_does_not_wedge_the_breaker():
+    endpoint = "api.probe-overload.test"
+    breaker = half_open(breaker_for(endpoint))
+    answers = [Response(429), Response(200)]
+    calls = []
+
+    def request():
+        calls.append(1)
+        return answers.pop(0)
+
+    not_ok = lambda response: response.status_code != 200  # noqa: E731
+    assert call_with_retry(endpoint, request, attempts=1, should_retry=not_ok).status_code == 429
+    assert breaker.state == HALF_OPEN
+
+    # Probe again: the request is sent instead of failing with CircuitOpenError
+    assert call_with_retry(endpoint, request, attempts=1, should_retry=not_ok).status_code == 200
+    assert len(calls) == 2
+    assert breaker.state == CLOSED
+
+
+def test_overloaded_timeout_probe_in_call_with_retry_is_given_back():
+    endpoint = "api.probe-timeout.test"
+    breaker = half_open(breaker_for(endpoint))
+
+    def request():
+        raise TimeoutError("read timed out")
+
+    with pytest.raises(TimeoutError):
+        call_with_retry(endpoint, request, attempts=1)
+    assert breaker.allow()
+
+
+class FakeEndpoint:
+    def __init__(self, *answers):
+        self.answers = list(answers)
+        self.requests = 0
+
+    def make_request(self, method, params):
+        self.requests += 1
+        answer = self.answers.pop(0)
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+
+
+@pytest.mark.parametrize("overload", [
+    {"jsonrpc": "2.0", "id": 1, "error": {"code": -32005, "message": "rate limit exceeded"}},
+    {"jsonrpc": "2.0", "id": 1, "error": {"code": 429, "message": "too many requests"}},
+    TimeoutError("read timed out"),
+], ids=["-32005", "429", "timeout"])
+def test_overloaded_probe_in_the_rpc_pool_does_not_wedge_the_endpoint(overload):
+    endpoint = f"http://pool-probe-{id(overload)}.test"
+    pool = PooledHTTPProvider([endpoint], rounds=1)
+    fake = FakeEndpoint(overload, {"jsonrpc": "2.0", "id": 2, "result": "0x10"})
+    pool.providers[endpoint] = fake
+    breaker = half_open(breaker_for(endpoint))
+
+    with pytest.raises((ConnectionError, TimeoutError)) as raised:
+        pool.make_request("eth_blockNumber", [])
+    assert not isinstance(raised.value, CircuitOpenError)
+    assert breaker.state == HALF_OPEN
+
+    assert pool.make_request("eth_blockNumber", [])["result"] == "0x10"
+    assert fake.requests == 2
+    assert breaker.state == CLOSED
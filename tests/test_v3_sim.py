@@ -0,0 +1,134 @@
+from decimal import Decimal, getcontext
+import pytest
+from v3_sim import (
+    MAX_SQRT_RATIO, MAX_TICK, MIN_SQRT_RATIO, MIN_TICK, PoolState, compute_swap_step, get_next_sqrt_price_from_input,
+    get_sqrt_ratio_at_tick, get_tick_at_sqrt_ratio
+)
+
+getcontext().prec = 80
+
+
+def encode_price_sqrt(reserve1, reserve0):
+    """sqrt(reserve1 / reserve0) as a Q64.96, like encodePriceSqrt in the V3 core tests"""
+    return int((Decimal(reserve1) / Decimal(reserve0)).sqrt() * 2**96)
+
+
+def expand_to_18_decimals(amount):
+    return amount * 10**18
+
+
+# TickMath.getSqrtRatioAtTick results from the V3 core tests
+@pytest.mark.parametrize("tick, sqrt_ratio", [
+    (MIN_TICK, MIN_SQRT_RATIO),
+    (-50, 79030349367926598376800521322),
+    (0, 2**96),
+    (50, 79426470787362580746886972461),
+    (MAX_TICK, MAX_SQRT_RATIO),
+])
+def test_sqrt_ratio_at_tick(tick, sqrt_ratio):
+    assert get_sqrt_ratio_at_tick(tick) == sqrt_ratio
+
+
+@pytest.mark.parametrize("tick", [MIN_TICK - 1, MAX_TICK + 1])
+def test_sqrt_ratio_at_tick_rejects_out_of_range_ticks(tick):
+    with pytest.raises(ValueError):
+        get_sqrt_ratio_at_tick(tick)
+
+
+@pytest.mark.parametrize("sqrt_ratio, tick", [
+    (MIN_SQRT_RATIO, MIN_TICK),
+    (MIN_SQRT_RATIO + 1, MIN_TICK),
+    (79030349367926598376800521322, -50),
+    (79030349367926598376800521321, -51),
+    (2**96, 0),
+    (79426470787362580746886972461, 50),
+    (79426470787362580746886972460, 49),
+    (MAX_SQRT_RATIO - 1, MAX_TICK - 1),
+])
+def test_tick_at_sqrt_ratio(sqrt_ratio, tick):
+    assert get_tick_at_sqrt_ratio(sqrt_ratio) == tick
+
+
+@pytest.mark.parametrize("sqrt_ratio", [MIN_SQRT_RATIO - 1, MAX_SQRT_RATIO])
+def test_tick_at_sqrt_ratio_rejects_out_of_range_prices(sqrt_ratio):
+    with pytest.raises(ValueError):
+        get_tick_at_sqrt_ratio(sqrt_ratio)
+
+
+# SwapMath.computeSwapStep exact-input cases from the V3 core tests
+
+def test_exact_amount_in_capped_at_the_price_target():
+    price = encode_price_sqrt(1, 1)
+    target = encode_price_sqrt(101, 100)
+    sqrt_next, amount_in, amount_out, fee_amount = compute_swap_step(
+        price, target, expand_to_18_decimals(2), expand_to_18_decimals(1), 600
+    )
+    assert (amount_in, amount_out, fee_amount) == (9975124224178055, 9925619580021728, 5988667735148)
+    assert amount_in + fee_amount < expand_to_18_decimals(1)
+    assert sqrt_next == target
+
+
+def test_exact_amount_in_fully_spent():
+    price = encode_price_sqrt(1, 1)
+    target = encode_price_sqrt(1000, 100)
+    liquidity = expand_to_18_decimals(2)
+    sqrt_next, amount_in, amount_out, fee_amount = compute_swap_step(
+        price, target, liquidity, expand_to_18_decimals(1), 600
+    )
+    assert (amount_in, amount_out, fee_amount) == (999400000000000000, 666399946655997866, 600000000000000)
+    assert amount_in + fee_amount == expand_to_18_decimals(1)
+    assert sqrt_next < target
+    assert sqrt_next == get_next_sqrt_price_from_input(price, liquidity, amount_in, False)
+
+
+def test_entire_input_amount_taken_as_fee():
+    assert compute_swap_step(2413, 79887613182836312, 1985041575832132834610021537970, 10, 1872) == (2413, 0, 0, 10)
+
+
+def test_step_with_no_price_movement_takes_nothing():
+    assert compute_swap_step(2**96, 2**96, 10**18, 10**18, 3000) == (2**96, 0, 0, 0)
+
+
+# Two positions on a 60-spaced pool: [-600, 600] with 1e18 and [-120, 120] with 2e18
+LIQUIDITY_NET = {-600: 10**18, -120: 2 * 10**18, 120: -2 * 10**18, 600: -10**18}
+
+
+def pool_state():
+    bitmap = {}
+    for tick in LIQUIDITY_NET:
+        compressed = tick // 60
+        bitmap[compressed >> 8] = bitmap.get(compressed >> 8, 0) | 1 << (compressed % 256)
+    return PoolState("0x" + "00" * 20, 3000, 60, 2**96, 0, 3 * 10**18, bitmap, dict(LIQUIDITY_NET))
+
+
+def test_swap_crossing_an_initialized_tick():
+    pool = pool_state()
+    amount = 3 * 10**16
+
+    # The same swap step by step: down to tick -120 with both positions, then on with the wide one
+    first = compute_swap_step(2**96, get_sqrt_ratio_at_tick(-120), 3 * 10**18, amount, 3000)
+    assert first[0] == get_sqrt_ratio_at_tick(-120)
+    remaining = amount - first[1] - first[3]
+    second = compute_swap_step(first[0], get_sqrt_ratio_at_tick(-600), 10**18, remaining, 3000)
+    assert second[0] > get_sqrt_ratio_at_tick(-600)
+
+    sqrt_price, tick, liquidity, amount_in, amount_out, complete = pool.swap_steps(True, 2**96, 0, 3 * 10**18, amount)
+    assert complete
+    assert sqrt_price == second[0]
+    assert liquidity == 10**18
+    assert tick == get_tick_at_sqrt_ratio(second[0])
+    assert -600 <= tick < -120
+    assert amount_in == amount
+    assert amount_out == first[2] + second[2]
+
+    quote = pool.quote(True, amount)
+    assert (quote["amount_in"], quote["amount_out"], quote["sqrt_price_x96"], quote["tick"]) == (
+        amount, amount_out, sqrt_price, tick
+    )
+    assert quote["complete"]
+
+
+def test_quote_many_matches_single_quotes_across_ticks():
+    amounts = [10**15, 2 * 10**16, 3 * 10**16, 10**16, 0]
+    quotes = pool_state().quote_many(True, amounts)
+    assert quotes == [pool_state().quote(True, amount) for amount in amounts]
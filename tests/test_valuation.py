@@ -0,0 +1,125 @@
+import pytest
+import valuation
+from v3_sim import get_amount0_delta, get_amount1_delta, get_sqrt_ratio_at_tick
+from valuation import Q128, UINT256_MOD, value_positions
+
+LIQUIDITY = 10**18
+TICK = 100
+SQRT_PRICE = get_sqrt_ratio_at_tick(TICK) + 123456789
+
+
+def position(token_id, tick_lower, tick_upper, liquidity=LIQUIDITY, **overrides):
+    values = {
+        "token_id": token_id,
+        "tick_lower": tick_lower,
+        "tick_upper": tick_upper,
+        "liquidity": liquidity,
+        "fee_growth_inside0_last_X128": 0,
+        "fee_growth_inside1_last_X128": 0,
+        "tokens_owed0": 0,
+        "tokens_owed1": 0,
+    }
+    values.update(overrides)
+    return values
+
+
+def pool_for(positions, global0=0, global1=0, outside=None):
+    outside = dict(outside or {})
+    for p in positions:
+        outside.setdefault(p["tick_lower"], (0, 0))
+        outside.setdefault(p["tick_upper"], (0, 0))
+    return {
+        "sqrt_price_x96": SQRT_PRICE,
+        "tick": TICK,
+        "fee_growth_global0_x128": global0,
+        "fee_growth_global1_x128": global1,
+        "fee_growth_outside": outside,
+    }
+
+
+@pytest.fixture(params=["scalar", "numpy"])
+def math_path(request, monkeypatch):
+    if request.param == "numpy":
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setattr(valuation, "np", None)
+    return request.param
+
+
+@pytest.mark.parametrize("tick_lower, tick_upper, in_range", [
+    (600, 1200, False),     # range above the price: all token0
+    (-600, 600, True),
+    (100, 160, True),       # the current tick is the lower bound
+    (-1200, -600, False),   # range below the price: all token1
+    (-600, 100, False),     # the current tick is the upper bound
+])
+def test_amounts_match_sqrt_price_math(math_path, tick_lower, tick_upper, in_range):
+    p = position(1, tick_lower, tick_upper)
+    sqrt_lower, sqrt_upper = get_sqrt_ratio_at_tick(tick_lower), get_sqrt_ratio_at_tick(tick_upper)
+    # Burning all liquidity rounds both amounts down
+    if TICK < tick_lower:
+        expected = (get_amount0_delta(sqrt_lower, sqrt_upper, LIQUIDITY, False), 0)
+    elif TICK >= tick_upper:
+        expected = (0, get_amount1_delta(sqrt_lower, sqrt_upper, LIQUIDITY, False))
+    else:
+        expected = (
+            get_amount0_delta(SQRT_PRICE, sqrt_upper, LIQUIDITY, False),
+            get_amount1_delta(sqrt_lower, SQRT_PRICE, LIQUIDITY, False),
+        )
+
+    [result] = value_positions([p], pool_for([p]))
+
+    assert (result["amount0"], result["amount1"]) == expected
+    assert result["in_range"] == in_range
+    assert (result["fees0"], result["fees1"]) == (0, 0)
+
+
+def test_fee_growth_wraps_around_when_outside_exceeds_global(math_path):
+    # feeGrowthInside = global - outside below - outside above underflows to 2**256 - 60 * Q128
+    p = position(
+        2, -600, 600,
+        fee_growth_inside0_last_X128=UINT256_MOD - 65 * Q128,
+        fee_growth_inside1_last_X128=UINT256_MOD - Q128,
+        tokens_owed0=7,
+        tokens_owed1=3,
+    )
+    pool = pool_for([p], global0=100 * Q128, global1=Q128, outside={-600: (150 * Q128, 2 * Q128), 600: (10 * Q128, 0)})
+
+    [result] = value_positions([p], pool)
+
+    # Inside growth moved from -65 to -60 (token0) and stayed at -1 (token1), in Q128 units modulo 2**256
+    assert result["fees0"] == 5 * LIQUIDITY + 7
+    assert result["fees1"] == 3
+
+
+def test_fee_growth_outside_is_flipped_for_bounds_the_price_is_under(math_path):
+    # Price above the range: growth inside is outside(upper) - outside(lower)
+    p = position(3, -1200, -600, fee_growth_inside0_last_X128=Q128)
+    pool = pool_for([p], global0=50 * Q128, outside={-1200: (10 * Q128, 0), -600: (14 * Q128, 0)})
+
+    [result] = value_positions([p], pool)
+
+    assert result["fees0"] == 3 * LIQUIDITY
+
+
+def test_numpy_path_matches_the_scalar_path(monkeypatch):
+    pytest.importorskip("numpy")
+    positions = [
+        position(10, 600, 1200),
+        position(11, -600, 600, liquidity=2**128 - 1, fee_growth_inside0_last_X128=UINT256_MOD - 5 * Q128),
+        position(12, -1200, -600, liquidity=1, tokens_owed1=2**127),
+        position(13, -600, 600, liquidity=0, tokens_owed0=9),
+        position(14, 100, 160, fee_growth_inside1_last_X128=3 * Q128 + 1),
+        position(15, -887220, 887220, liquidity=12345678901234567890),
+    ]
+    pool = pool_for(
+        positions, global0=UINT256_MOD - Q128, global1=40 * Q128 + 17,
+        outside={-600: (UINT256_MOD - 3 * Q128, 5 * Q128), 600: (Q128, 50 * Q128), 100: (0, 2 * Q128)}
+    )
+
+    vectorized = value_positions(positions, pool)
+    monkeypatch.setattr(valuation, "np", None)
+    scalar = value_positions(positions, pool)
+
+    assert vectorized == scalar
+    assert all(type(value) is int for result in vectorized for value in result.values() if not isinstance(value, bool))
@@ -0,0 +1,137 @@
+import json
+import os
+import threading
+import weakref
+from datetime import datetime
+from decimal import Context, Decimal, ROUND_DOWN
+import config
+from rpc_batch import batch_eth_call, encode_call
+
+# Native PHRS has no contract to ask
+NATIVE_DECIMALS = 18
+NATIVE_SYMBOL = "PHRS"
+
+# Enough digits for any uint256, so conversions never round
+EXACT = Context(prec=80)
+
+
+def log_error(message):
+    timestamp = datetime.now().strftime("%H:%M:%S")
+    print(f"[{timestamp}] [ERROR] ❌ {message}")
+
+
+def _decode_symbol(result):
+    """symbol() as an ABI string, or as bytes32 for older tokens"""
+    if len(result) >= 96 and int.from_bytes(result[:32], "big") == 32:
+        length = int.from_bytes(result[32:64], "big")
+        return result[64:64 + length].decode("utf-8", errors="replace")
+    return result[:32].rstrip(b"\x00").decode("utf-8", errors="replace")
+
+
+class TokenRegistry:
+    """
+    Decimals and symbols of ERC-20 tokens, read once per token and cached on disk
+
+    Amount conversions go through Decimal and integer base units only, so an amount is never
+    scaled by the wrong number of decimals or rounded by a float. Pass token=None for native PHRS.
+    """
+    def __init__(self, web3, cache_file=None):
+        self.web3 = web3
+        self.cache_file = cache_file or config.TOKEN_CACHE_FILE
+        self.tokens = {}  # lower-case address -> {"symbol": ..., "decimals": ...}
+        self._lock = threading.Lock()
+        self._load_cache()
+
+    def _load_cache(self):
+        if not os.path.exists(self.cache_file):
+            return
+        try:
+            with open(self.cache_file, "r") as f:
+                cached = json.load(f)
+        except Exception:
+            return
+        if cached.get("chain_id") == config.CHAIN_ID:
+            self.tokens = cached.get("tokens", {})
+
+    def _save_cache(self):
+        try:
+            with open(self.cache_file, "w") as f:
+                json.dump({"chain_id": config.CHAIN_ID, "tokens": self.tokens}, f, indent=2)
+        except Exception as e:
+            log_error(f"Failed to save token cache: {str(e)}")
+
+    def load(self, tokens):
+        """
+        Make sure metadata for all tokens is known, reading the missing ones in one batch
+
+        Raises:
+        - ValueError when a token's decimals cannot be read
+        """
+        with self._lock:
+            missing = sorted({token.lower() for token in tokens if token} - set(self.tokens))
+            if not missing:
+                return
+
+            contracts = [
+                self.web3.eth.contract(address=self.web3.to_checksum_address(token), abi=config.TOKEN_METADATA_ABI)
+                for token in missing
+            ]
+            calls = []
+            for contract in contracts:
+                calls.append({"to": contract.address, "data": encode_call(contract, "decimals", [])})
+                calls.append({"to": contract.address, "data": encode_call(contract, "symbol", [])})
+            results = batch_eth_call(self.web3, calls)
+
+            for i, token in enumerate(missing):
+                decimals, symbol = results[2 * i], results[2 * i + 1]
+                if not decimals or len(decimals) < 32:
+                    raise ValueError(f"Could not read decimals of token {token}")
+                self.tokens[token] = {
+                    "symbol": _decode_symbol(symbol) if symbol else token[:8],
+                    "decimals": int.from_bytes(decimals[:32], "big")
+                }
+            self._save_cache()
+
+    def _get(self, token):
+        if token is None:
+            return {"symbol": NATIVE_SYMBOL, "decimals": NATIVE_DECIMALS}
+        token = token.lower()
+        if token not in self.tokens:
+            self.load([token])
+        return self.tokens[token]
+
+    def decimals(self, token):
+        return self._get(token)["decimals"]
+
+    def symbol(self, token):
+        return self._get(token)["symbol"]
+
+    def to_base_units(self, token, amount):
+        """Whole-token amount (int, float, str or Decimal) -> integer base units, rounded down"""
+        scaled = Decimal(str(amount)).scaleb(self.decimals(token), context=EXACT)
+        return int(scaled.to_integral_value(rounding=ROUND_DOWN))
+
+    def from_base_units(self, token, amount):
+        """Integer base units -> exact whole-token Decimal"""
+        return Decimal(int(amount)).scaleb(-self.decimals(token), context=EXACT)
+
+    def format(self, token, amount, places=8):
+        """Base units as a readable whole-token string, e.g. '12.500000 USDC' (rounded down to places)"""
+        value = self.from_base_units(token, amount)
+        places = min(places, self.decimals(token))
+        value = value.quantize(Decimal(1).scaleb(-places), rounding=ROUND_DOWN, context=EXACT)
+        return f"{value:f} {self.symbol(token)}"
+
+
+_registries = weakref.WeakKeyDictionary()
+_registries_lock = threading.Lock()
+
+
+def token_registry_for(web3):
+    """Shared TokenRegistry for a Web3 instance"""
+    with _registries_lock:
+        registry = _registries.get(web3)
+        if registry is None:
+            registry = TokenRegistry(web3)
+            _registries[web3] = registry
+        return registry
@@ -0,0 +1,141 @@
+from web3.exceptions import ContractLogicError
+from simulation import decode_revert_reason
+
+# Error classes for transaction submission
+RETRYABLE_NETWORK = "retryable-network"
+NONCE_CONFLICT = "nonce-conflict"
+UNDERPRICED = "underpriced"
+INSUFFICIENT_FUNDS = "insufficient-funds"
+DETERMINISTIC_REVERT = "deterministic-revert"
+
+# What to do for each class. Aborting classes fail the same way on every attempt,
+# so retrying them only burns time.
+RETRY_POLICIES = {
+    RETRYABLE_NETWORK: {"action": "retry", "max_attempts": 4, "delay": 1},
+    NONCE_CONFLICT: {"action": "resync_nonce", "max_attempts": 3, "delay": 0},
+    UNDERPRICED: {"action": "bump_fee", "max_attempts": 4, "delay": 0},
+    INSUFFICIENT_FUNDS: {"action": "abort", "max_attempts": 1, "delay": 0},
+    DETERMINISTIC_REVERT: {"action": "abort", "max_attempts": 1, "delay": 0},
+}
+
+# Replacement transactions need at least a 10% higher price on geth-style pools
+FEE_BUMP_PERCENT = 125
+
+# JSON-RPC error codes that identify the class on their own
+RPC_CODE_CLASSES = {
+    3: DETERMINISTIC_REVERT,        # execution reverted (EIP-1474, with revert data)
+    -32015: DETERMINISTIC_REVERT,   # VM execution error
+    -32600: DETERMINISTIC_REVERT,   # invalid request
+    -32602: DETERMINISTIC_REVERT,   # invalid params
+    -32005: RETRYABLE_NETWORK,      # limit exceeded / rate limited
+    -32603: RETRYABLE_NETWORK,      # internal error
+    -32099: RETRYABLE_NETWORK,      # server busy / timeout on some nodes
+    429: RETRYABLE_NETWORK,
+}
+
+# Message fragments checked in order, first match wins
+MESSAGE_CLASSES = [
+    ("replacement transaction underpriced", UNDERPRICED),
+    ("transaction underpriced", UNDERPRICED),
+    ("fee too low", UNDERPRICED),
+    ("less than block base fee", UNDERPRICED),
+    ("gas price too low", UNDERPRICED),
+    ("nonce too low", NONCE_CONFLICT),
+    ("nonce too high", NONCE_CONFLICT),
+    ("already known", NONCE_CONFLICT),
+    ("known transaction", NONCE_CONFLICT),
+    ("invalid nonce", NONCE_CONFLICT),
+    ("replaced by another transaction", NONCE_CONFLICT),
+    ("insufficient funds", INSUFFICIENT_FUNDS),
+    ("execution reverted", DETERMINISTIC_REVERT),
+    ("always failing transaction", DETERMINISTIC_REVERT),
+    ("gas required exceeds allowance", DETERMINISTIC_REVERT),
+    ("intrinsic gas too low", DETERMINISTIC_REVERT),
+    ("invalid sender", DETERMINISTIC_REVERT),
+    ("rate limit", RETRYABLE_NETWORK),
+    ("too many requests", RETRYABLE_NETWORK),
+    ("timeout", RETRYABLE_NETWORK),
+    ("timed out", RETRYABLE_NETWORK),
+    ("connection", RETRYABLE_NETWORK),
+    ("header not found", RETRYABLE_NETWORK),
+    ("502", RETRYABLE_NETWORK),
+    ("503", RETRYABLE_NETWORK),
+    ("504", RETRYABLE_NETWORK),
+]
+
+# Exception type names that always mean the request never got a usable answer
+NETWORK_EXCEPTION_NAMES = ("ConnectionError", "Timeout", "ReadTimeout", "ConnectTimeout", "TimeExhausted", "ChunkedEncodingError")
+
+
+def _rpc_error(error):
+    """JSON-RPC error dict carried by the exception, across web3.py versions"""
+    rpc_response = getattr(error, "rpc_response", None)
+    if isinstance(rpc_response, dict) and isinstance(rpc_response.get("error"), dict):
+        return rpc_response["error"]
+    if error.args and isinstance(error.args[0], dict):
+        return error.args[0]
+    return {}
+
+
+def classify_error(error):
+    """
+    Map a transaction error to one of the error classes
+
+    Parameters:
+    - error: Exception raised while building, simulating or sending a transaction
+
+    Returns:
+    - Dict with 'kind', 'code', 'message' and decoded revert 'reason' (if any)
+    """
+    rpc_error = _rpc_error(error)
+    code = rpc_error.get("code")
+    message = str(rpc_error.get("message") or error)
+    data = getattr(error, "data", None) or rpc_error.get("data")
+    if isinstance(data, dict):
+        data = data.get("data")
+
+    reason = None
+    if data and isinstance(data, (str, bytes, bytearray)):
+        reason = decode_revert_reason(data)
+
+    lowered = message.lower()
+    kind = None
+
+    if isinstance(error, ContractLogicError):
+        kind = DETERMINISTIC_REVERT
+    elif type(error).__name__ in NETWORK_EXCEPTION_NAMES or isinstance(error, (ConnectionError, TimeoutError)):
+        kind = RETRYABLE_NETWORK
+    else:
+        # Messages are more specific than -32000, which nodes use for nearly everything
+        for fragment, fragment_kind in MESSAGE_CLASSES:
+            if fragment in lowered:
+                kind = fragment_kind
+                break
+        if kind is None and code in RPC_CODE_CLASSES:
+            kind = RPC_CODE_CLASSES[code]
+
+    status_code = getattr(getattr(error, "response", None), "status_code", None)
+    if kind is None and status_code is not None and (status_code == 429 or status_code >= 500):
+        kind = RETRYABLE_NETWORK
+
+    if kind is None:
+        # Unknown errors are treated like transient ones, but with the network retry limit
+        kind = RETRYABLE_NETWORK
+
+    return {"kind": kind, "code": code, "message": message, "reason": reason}
+
+
+def is_already_known(failure):
+    """The node already holds this exact signed transaction, so the send effectively succeeded"""
+    lowered = failure["message"].lower()
+    return "already known" in lowered or "known transaction" in lowered
+
+
+def retry_policy(kind):
+    """Retry policy dict ('action', 'max_attempts', 'delay') for an error class"""
+    return RETRY_POLICIES[kind]
+
+
+def bump_gas_price(gas_price):
+    """Gas price for a replacement after an underpriced rejection"""
+    return gas_price * FEE_BUMP_PERCENT // 100 + 1
@@ -0,0 +1,298 @@
+import csv
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+import config
+
+# Lifecycle stages in order; each is a Unix time, None when the operation never got there.
+# 'included' is when the block holding the transaction was first seen, 'confirmed' when its receipt was read.
+STAGES = ("planned", "signed", "broadcast", "included", "confirmed")
+
+FIELDS = (
+    "run_id", "kind", "name", "wallet", "nonce", "tx_hash", "status",
+) + STAGES + (
+    "block", "gas_used", "effective_gas_price", "endpoint", "retries", "rpc_calls", "error",
+)
+
+
+def log_info(message):
+    timestamp = datetime.now().strftime("%H:%M:%S")
+    print(f"[{timestamp}] [INFO] ℹ️  {message}")
+
+
+def log_error(message):
+    timestamp = datetime.now().strftime("%H:%M:%S")
+    print(f"[{timestamp}] [ERROR] ❌ {message}")
+
+
+class TxRecord:
+    """
+    One operation's way from plan to confirmation
+
+    status is 'planned', 'sent', 'success', 'failed' or 'skipped'. rpc_calls counts the RPC
+    requests sent on its behalf (a share of them when several operations were waited for together).
+    """
+    __slots__ = FIELDS
+
+    def __init__(self, kind, name, wallet=None, run_id=None):
+        self.run_id = run_id
+        self.kind = kind
+        self.name = name
+        self.wallet = wallet
+        self.nonce = None
+        self.tx_hash = None
+        self.status = "planned"
+        self.planned = time.time()
+        self.signed = None
+        self.broadcast = None
+        self.included = None
+        self.confirmed = None
+        self.block = None
+        self.gas_used = None
+        self.effective_gas_price = None
+        self.endpoint = None
+        self.retries = 0
+        self.rpc_calls = 0
+        self.error = None
+
+    def mark(self, stage):
+        setattr(self, stage, time.time())
+
+    def sent(self, tx_hash, nonce, endpoint=None):
+        self.mark("broadcast")
+        self.status = "sent"
+        self.tx_hash = tx_hash
+        self.nonce = nonce
+        self.endpoint = endpoint
+
+    def apply_receipt(self, receipt, included_at=None, confirmed_at=None, gas_price=None):
+        """Take block, gas and status from a receipt; times default to now"""
+        self.confirmed = confirmed_at or time.time()
+        self.included = included_at or self.confirmed
+        if self.broadcast is not None:
+            self.included = max(self.included, self.broadcast)
+        self.block = receipt.get("blockNumber")
+        self.gas_used = receipt.get("gasUsed")
+        self.effective_gas_price = receipt.get("effectiveGasPrice") or gas_price
+        self.status = "success" if receipt.get("status") == 1 else "failed"
+        if self.status == "failed":
+            self.error = f"reverted in block {self.block}"
+
+    def fail(self, error, status="failed"):
+        self.status = status
+        self.error = error
+
+    def as_dict(self):
+        row = {field: getattr(self, field) for field in FIELDS}
+        for stage in STAGES:
+            if row[stage] is not None:
+                row[stage] = round(row[stage], 3)
+        row["rpc_calls"] = round(self.rpc_calls, 2)
+        return row
+
+
+class TxRecorder:
+    """
+    Records of every operation of a run, safe to share between wallet threads
+
+    Records made active on a thread (active()) are charged for the RPC requests that thread
+    sends; one request made for several records at once is split evenly between them.
+    """
+    def __init__(self):
+        self.run_id = datetime.now().strftime("%Y%m%d-%H%M%S")
+        self.records = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def start(self, kind, name=None, wallet=None):
+        """New record, planned now"""
+        record = TxRecord(kind, name or kind, wallet, self.run_id)
+        with self._lock:
+            self.records.append(record)
+        return record
+
+    def activate(self, *records):
+        """Charge this thread's RPC requests to records from now on (no records: stop charging)"""
+        self._local.records = [record for record in records if record is not None]
+
+    @contextmanager
+    def active(self, *records):
+        previous = getattr(self._local, "records", [])
+        self.activate(*records)
+        try:
+            yield
+        finally:
+            self._local.records = previous
+
+    def count_rpc_call(self, calls=1):
+        records = getattr(self._local, "records", None)
+        if records:
+            share = calls / len(records)
+            for record in records:
+                record.rpc_calls += share
+
+    def rows(self):
+        with self._lock:
+            return [record.as_dict() for record in self.records]
+
+    def write_jsonl(self, path=None):
+        """Append this run's records to a JSONL file (default TX_RECORDS_FILE), returns how many"""
+        rows = self.rows()
+        with open(path or config.TX_RECORDS_FILE, "a") as f:
+            for row in rows:
+                f.write(json.dumps(row) + "\n")
+        return len(rows)
+
+
+# Process-wide recorder, like metrics.metrics
+recorder = TxRecorder()
+
+
+def load_records(path=None, run_id="last"):
+    """
+    Records from a JSONL file
+
+    Parameters:
+    - path: File written by write_jsonl (default TX_RECORDS_FILE)
+    - run_id: Run to keep, 'last' for the most recent one, None for all runs
+
+    Returns:
+    - List of record dicts
+    """
+    rows = []
+    with open(path or config.TX_RECORDS_FILE, "r") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                rows.append(json.loads(line))
+    if run_id == "last" and rows:
+        run_id = rows[-1].get("run_id")
+    if run_id is not None:
+        rows = [row for row in rows if row.get("run_id") == run_id]
+    return rows
+
+
+def write_csv(rows, path):
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDS, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(rows)
+    return len(rows)
+
+
+def percentile(values, p):
+    """p-th percentile (0-100) with linear interpolation, None for no values"""
+    values = sorted(values)
+    if not values:
+        return None
+    position = (len(values) - 1) * p / 100
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+def _between(rows, start, end):
+    return [row[end] - row[start] for row in rows if row.get(start) is not None and row.get(end) is not None]
+
+
+def _summary(values):
+    return {
+        "count": len(values),
+        "p50": percentile(values, 50),
+        "p90": percentile(values, 90),
+        "p99": percentile(values, 99),
+        "mean": sum(values) / len(values) if values else None,
+    }
+
+
+def report(rows):
+    """
+    Latency and RPC cost of the operations in rows
+
+    Returns:
+    - Dict with 'statuses' (status -> count) and 'kinds', per operation kind (plus 'all'):
+      'inclusion' (broadcast -> included), 'total' (planned -> confirmed), 'stages' (each step
+      between consecutive stages), 'rpc_calls' and 'retries', each a count/p50/p90/p99/mean summary
+    """
+    statuses = {}
+    for row in rows:
+        statuses[row.get("status")] = statuses.get(row.get("status"), 0) + 1
+
+    kinds = {}
+    for kind in sorted({row.get("kind") for row in rows}, key=str) + ["all"]:
+        selected = rows if kind == "all" else [row for row in rows if row.get("kind") == kind]
+        kinds[kind] = {
+            "inclusion": _summary(_between(selected, "broadcast", "included")),
+            "total": _summary(_between(selected, "planned", "confirmed")),
+            "stages": {
+                f"{start}->{end}": _summary(_between(selected, start, end))
+                for start, end in zip(STAGES, STAGES[1:])
+            },
+            "rpc_calls": _summary([row.get("rpc_calls") or 0 for row in selected]),
+            "retries": _summary([row.get("retries") or 0 for row in selected]),
+        }
+    return {"statuses": statuses, "kinds": kinds}
+
+
+def _fmt(value, unit=""):
+    return "-" if value is None else f"{value:.2f}{unit}"
+
+
+def report_lines(rows):
+    """Readable report, one line per kind and measure"""
+    result = report(rows)
+    statuses = ", ".join(f"{status} {count}" for status, count in sorted(result["statuses"].items(), key=str))
+    lines = [f"{len(rows)} operations: {statuses}"]
+    for kind, measures in result["kinds"].items():
+        lines.append(f"[{kind}]")
+        measured = [("time to inclusion", measures["inclusion"], "s"), ("planned to confirmed", measures["total"], "s")]
+        measured += [(f"  {stage}", summary, "s") for stage, summary in measures["stages"].items()]
+        measured += [("RPC calls per operation", measures["rpc_calls"], ""), ("retries per operation", measures["retries"], "")]
+        for label, summary, unit in measured:
+            if not summary["count"]:
+                continue
+            lines.append(
+                f"{label:<26} n={summary['count']:<5} p50={_fmt(summary['p50'], unit):<9} "
+                f"p90={_fmt(summary['p90'], unit):<9} p99={_fmt(summary['p99'], unit):<9} mean={_fmt(summary['mean'], unit)}"
+            )
+        # The stage with the largest mean is where this kind of operation spends its time
+        stages = [(summary["mean"], stage) for stage, summary in measures["stages"].items() if summary["mean"] is not None]
+        if stages:
+            lines.append(f"{'slowest stage':<26} {max(stages)[1]}")
+    return lines
+
+
+def main(args):
+    usage = (
+        "Usage: python tx_records.py report [records.jsonl] [--all]\n"
+        "       python tx_records.py export out.csv [records.jsonl] [--all]"
+    )
+    run_id = None if "--all" in args else "last"
+    args = [arg for arg in args if arg != "--all"]
+    if not args or args[0] not in ("report", "export") or (args[0] == "export" and len(args) < 2):
+        print(usage)
+        return 1
+
+    command, rest = args[0], args[1:]
+    if command == "export":
+        out, rest = rest[0], rest[1:]
+    source = rest[0] if rest else config.TX_RECORDS_FILE
+    if not os.path.exists(source):
+        log_error(f"{source} not found, run the bot first")
+        return 1
+    rows = load_records(source, run_id)
+
+    if command == "export":
+        log_info(f"Wrote {write_csv(rows, out)} records to {out}")
+    else:
+        for line in report_lines(rows):
+            print(line)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,457 @@
+import math
+import threading
+from bisect import bisect_left
+from datetime import datetime
+import config
+from confirmations import head_watcher_for
+from metrics import metrics
+from rpc_batch import batch_eth_call, encode_call
+
+# TickMath bounds
+MIN_TICK = -887272
+MAX_TICK = 887272
+MIN_SQRT_RATIO = 4295128739
+MAX_SQRT_RATIO = 1461446703485210103287273052203988822378723970342
+
+Q96 = 1 << 96
+UINT256_MAX = (1 << 256) - 1
+FEE_DENOMINATOR = 1000000
+
+# Remaining input used to walk a pool all the way to its price limit
+UNLIMITED = (1 << 255) - 1
+
+# getSqrtRatioAtTick factors: sqrt(1.0001)^-(2^i) as Q128.128, for each bit of |tick|
+_TICK_FACTORS = (
+    (0x2, 0xfff97272373d413259a46990580e213a),
+    (0x4, 0xfff2e50f5f656932ef12357cf3c7fdcc),
+    (0x8, 0xffe5caca7e10e4e61c3624eaa0941cd0),
+    (0x10, 0xffcb9843d60f6159c9db58835c926644),
+    (0x20, 0xff973b41fa98c081472e6896dfb254c0),
+    (0x40, 0xff2ea16466c96a3843ec78b326b52861),
+    (0x80, 0xfe5dee046a99a2a811c461f1969c3053),
+    (0x100, 0xfcbe86c7900a88aedcffc83b479aa3a4),
+    (0x200, 0xf987a7253ac413176f2b074cf7815e54),
+    (0x400, 0xf3392b0822b70005940c7a398e4b70f3),
+    (0x800, 0xe7159475a2c29b7443b29c7fa6e889d9),
+    (0x1000, 0xd097f3bdfd2022b8845ad8f792aa5825),
+    (0x2000, 0xa9f746462d870fdf8a65dc1f90e061e5),
+    (0x4000, 0x70d869a156d2a1b890bb3df62baf32f7),
+    (0x8000, 0x31be135f97d08fd981231505542fcfa6),
+    (0x10000, 0x9aa508b5b7a84e1c677de54f3e99bc9),
+    (0x20000, 0x5d6af8dedb81196699c329225ee604),
+    (0x40000, 0x2216e584f5fa1ea926041bedfe98),
+    (0x80000, 0x48a170391f7dc42444e8fa2),
+)
+
+
+def log_info(message):
+    timestamp = datetime.now().strftime("%H:%M:%S")
+    print(f"[{timestamp}] [INFO] ℹ️  {message}")
+
+def log_error(message):
+    timestamp = datetime.now().strftime("%H:%M:%S")
+    print(f"[{timestamp}] [ERROR] ❌ {message}")
+
+
+# Integer ports of the V3 core libraries (TickMath, FullMath, SqrtPriceMath, SwapMath).
+# Python ints do not overflow, so only the branches whose rounding depends on an overflow
+# check are kept; everything else is the plain formula with the same rounding direction.
+
+def get_sqrt_ratio_at_tick(tick):
+    """sqrt(1.0001^tick) as a Q64.96, rounded up exactly like TickMath.getSqrtRatioAtTick"""
+    abs_tick = abs(tick)
+    if abs_tick > MAX_TICK:
+        raise ValueError(f"Tick {tick} is out of range")
+
+    ratio = 0xfffcb933bd6fad37aa2d162d1a594001 if abs_tick & 0x1 else 1 << 128
+    for bit, factor in _TICK_FACTORS:
+        if abs_tick & bit:
+            ratio = (ratio * factor) >> 128
+    if tick > 0:
+        ratio = UINT256_MAX // ratio
+    return (ratio >> 32) + (0 if ratio % (1 << 32) == 0 else 1)
+
+
+def get_tick_at_sqrt_ratio(sqrt_price_x96):
+    """Greatest tick whose sqrt ratio is <= sqrt_price_x96 (TickMath.getTickAtSqrtRatio)"""
+    if not MIN_SQRT_RATIO <= sqrt_price_x96 < MAX_SQRT_RATIO:
+        raise ValueError("sqrtPriceX96 is out of range")
+    # The float estimate is off by at most one tick, the exact ratios settle it
+    tick = math.floor(2 * math.log(sqrt_price_x96 / Q96) / math.log(1.0001))
+    tick = max(MIN_TICK, min(MAX_TICK - 1, tick))
+    while tick > MIN_TICK and get_sqrt_ratio_at_tick(tick) > sqrt_price_x96:
+        tick -= 1
+    while get_sqrt_ratio_at_tick(tick + 1) <= sqrt_price_x96:
+        tick += 1
+    return tick
+
+
+def _div_rounding_up(a, b):
+    return -(-a // b)
+
+
+def _mul_div_rounding_up(a, b, denominator):
+    return _div_rounding_up(a * b, denominator)
+
+
+def get_amount0_delta(sqrt_a, sqrt_b, liquidity, round_up):
+    """Token0 between two prices for a liquidity amount"""
+    if sqrt_a > sqrt_b:
+        sqrt_a, sqrt_b = sqrt_b, sqrt_a
+    numerator1 = liquidity << 96
+    numerator2 = sqrt_b - sqrt_a
+    if round_up:
+        return _div_rounding_up(_mul_div_rounding_up(numerator1, numerator2, sqrt_b), sqrt_a)
+    return (numerator1 * numerator2 // sqrt_b) // sqrt_a
+
+
+def get_amount1_delta(sqrt_a, sqrt_b, liquidity, round_up):
+    """Token1 between two prices for a liquidity amount"""
+    if sqrt_a > sqrt_b:
+        sqrt_a, sqrt_b = sqrt_b, sqrt_a
+    if round_up:
+        return _mul_div_rounding_up(liquidity, sqrt_b - sqrt_a, Q96)
+    return liquidity * (sqrt_b - sqrt_a) // Q96
+
+
+def _next_sqrt_price_from_amount0(sqrt_price, liquidity, amount):
+    if amount == 0:
+        return sqrt_price
+    numerator1 = liquidity << 96
+    product = amount * sqrt_price
+    # The contract only takes the precise form when neither product nor denominator overflow
+    if product <= UINT256_MAX and numerator1 + product <= UINT256_MAX:
+        return _mul_div_rounding_up(numerator1, sqrt_price, numerator1 + product)
+    return _div_rounding_up(numerator1, numerator1 // sqrt_price + amount)
+
+
+def _next_sqrt_price_from_amount1(sqrt_price, liquidity, amount):
+    return sqrt_price + (amount << 96) // liquidity
+
+
+def get_next_sqrt_price_from_input(sqrt_price, liquidity, amount_in, zero_for_one):
+    if zero_for_one:
+        return _next_sqrt_price_from_amount0(sqrt_price, liquidity, amount_in)
+    return _next_sqrt_price_from_amount1(sqrt_price, liquidity, amount_in)
+
+
+def compute_swap_step(sqrt_current, sqrt_target, liquidity, amount_remaining, fee_pips):
+    """
+    One exact-input step of a swap inside a single tick range (SwapMath.computeSwapStep)
+
+    Returns:
+    - (sqrt price after the step, amount in, amount out, fee amount)
+    """
+    zero_for_one = sqrt_current >= sqrt_target
+    remaining_less_fee = amount_remaining * (FEE_DENOMINATOR - fee_pips) // FEE_DENOMINATOR
+    if zero_for_one:
+        amount_in = get_amount0_delta(sqrt_target, sqrt_current, liquidity, True)
+    else:
+        amount_in = get_amount1_delta(sqrt_current, sqrt_target, liquidity, True)
+
+    if remaining_less_fee >= amount_in:
+        sqrt_next = sqrt_target
+    else:
+        sqrt_next = get_next_sqrt_price_from_input(sqrt_current, liquidity, remaining_less_fee, zero_for_one)
+
+    reached = sqrt_next == sqrt_target
+    if zero_for_one:
+        if not reached:
+            amount_in = get_amount0_delta(sqrt_next, sqrt_current, liquidity, True)
+        amount_out = get_amount1_delta(sqrt_next, sqrt_current, liquidity, False)
+    else:
+        if not reached:
+            amount_in = get_amount1_delta(sqrt_current, sqrt_next, liquidity, True)
+        amount_out = get_amount0_delta(sqrt_current, sqrt_next, liquidity, False)
+
+    if reached:
+        fee_amount = _mul_div_rounding_up(amount_in, fee_pips, FEE_DENOMINATOR - fee_pips)
+    else:
+        # Whatever input is left over after the price moved is kept as fee
+        fee_amount = amount_remaining - amount_in
+    return sqrt_next, amount_in, amount_out, fee_amount
+
+
+def _signed(word):
+    # ABI words hold signed ints sign-extended to 256 bits
+    value = int.from_bytes(word, "big")
+    return value - (1 << 256) if value >= 1 << 255 else value
+
+
+def _word(result, index):
+    return result[index * 32:(index + 1) * 32]
+
+
+class PoolState:
+    """
+    Snapshot of a V3 pool at one block: price, active liquidity and the initialized ticks
+    of the bitmap words loaded around the current tick
+    """
+    def __init__(self, address, fee, tick_spacing, sqrt_price_x96, tick, liquidity, bitmap, liquidity_net, token0=None, token1=None, block=None):
+        self.address = address
+        self.fee = fee
+        self.tick_spacing = tick_spacing
+        self.sqrt_price_x96 = sqrt_price_x96
+        self.tick = tick
+        self.liquidity = liquidity
+        self.bitmap = bitmap  # word position -> 256-bit word, only for loaded words
+        self.liquidity_net = liquidity_net  # initialized tick -> liquidityNet
+        self.token0 = token0
+        self.token1 = token1
+        self.block = block
+        self._paths = {}
+
+    def next_initialized_tick(self, tick, lte):
+        """
+        Next initialized tick within one bitmap word (TickBitmap.nextInitializedTickWithinOneWord)
+
+        Returns:
+        - (tick, initialized), or None when the word was not loaded
+        """
+        spacing = self.tick_spacing
+        compressed = tick // spacing
+        if not lte:
+            compressed += 1
+        word_pos, bit_pos = compressed >> 8, compressed % 256
+        word = self.bitmap.get(word_pos)
+        if word is None:
+            return None
+
+        if lte:
+            masked = word & ((1 << (bit_pos + 1)) - 1)
+            if masked:
+                return (compressed - (bit_pos - (masked.bit_length() - 1))) * spacing, True
+            return (compressed - bit_pos) * spacing, False
+
+        masked = word & ~((1 << bit_pos) - 1) & UINT256_MAX
+        if masked:
+            return (compressed + ((masked & -masked).bit_length() - 1 - bit_pos)) * spacing, True
+        return (compressed + (255 - bit_pos)) * spacing, False
+
+    def swap_steps(self, zero_for_one, sqrt_price, tick, liquidity, remaining, on_step=None):
+        """
+        Run the exact-input swap loop of UniswapV3Pool.swap from a given state
+
+        Returns:
+        - (sqrt price, tick, liquidity, amount in, amount out, complete); complete is False
+          when the swap ran past the loaded ticks
+        """
+        limit = MIN_SQRT_RATIO + 1 if zero_for_one else MAX_SQRT_RATIO - 1
+        amount_in = amount_out = 0
+        while remaining != 0 and sqrt_price != limit:
+            found = self.next_initialized_tick(tick, zero_for_one)
+            if found is None:
+                return sqrt_price, tick, liquidity, amount_in, amount_out, False
+            tick_next, initialized = found
+            tick_next = max(MIN_TICK, min(MAX_TICK, tick_next))
+
+            start = sqrt_price
+            sqrt_next = get_sqrt_ratio_at_tick(tick_next)
+            if (sqrt_next < limit) if zero_for_one else (sqrt_next > limit):
+                target = limit
+            else:
+                target = sqrt_next
+            sqrt_price, step_in, step_out, step_fee = compute_swap_step(sqrt_price, target, liquidity, remaining, self.fee)
+            remaining -= step_in + step_fee
+            amount_in += step_in + step_fee
+            amount_out += step_out
+
+            if sqrt_price == sqrt_next:
+                if initialized:
+                    net = self.liquidity_net.get(tick_next, 0)
+                    liquidity += -net if zero_for_one else net
+                tick = tick_next - 1 if zero_for_one else tick_next
+            elif sqrt_price != start:
+                tick = get_tick_at_sqrt_ratio(sqrt_price)
+
+            if on_step is not None:
+                on_step(sqrt_price, tick, liquidity, amount_in, amount_out)
+        return sqrt_price, tick, liquidity, amount_in, amount_out, True
+
+    def _path(self, zero_for_one):
+        """Loop state at every step boundary of a swap that walks to the price limit (built once per direction)"""
+        path = self._paths.get(zero_for_one)
+        if path is None:
+            states = [(self.sqrt_price_x96, self.tick, self.liquidity, 0, 0)]
+            self.swap_steps(
+                zero_for_one, self.sqrt_price_x96, self.tick, self.liquidity, UNLIMITED,
+                on_step=lambda *state: states.append(state)
+            )
+            path = (states, [state[3] for state in states])
+            self._paths[zero_for_one] = path
+        return path
+
+    def quote_many(self, zero_for_one, amounts_in):
+        """
+        Exact output of exact-input swaps for many amounts against this snapshot
+
+        The pool is walked to its price limit once; each amount then only needs a bisect over
+        the step boundaries and the exact swap loop from the last boundary it fully crosses.
+
+        Parameters:
+        - zero_for_one: True to sell token0 for token1
+        - amounts_in: Input amounts in base units (fee included, as passed to the router)
+
+        Returns:
+        - List of dicts with 'amount_in' (less than asked when the price limit is hit),
+          'amount_out', 'sqrt_price_x96', 'tick', 'price_impact' (shortfall against the spot
+          price, fee included) and 'complete' (False when the swap ran past the loaded ticks)
+        """
+        states, boundaries = self._path(zero_for_one)
+        spot = (self.sqrt_price_x96 / Q96) ** 2
+        quotes = []
+        for amount in amounts_in:
+            # A swap stops at the first boundary that uses up its input exactly
+            index = bisect_left(boundaries, amount)
+            if index == len(boundaries) or boundaries[index] != amount:
+                index -= 1
+            sqrt_price, tick, liquidity, amount_in, amount_out = states[index]
+            sqrt_price, tick, _, step_in, step_out, complete = self.swap_steps(
+                zero_for_one, sqrt_price, tick, liquidity, amount - amount_in
+            )
+            amount_in += step_in
+            amount_out += step_out
+
+            if amount_in and amount_out:
+                rate = amount_out / amount_in
+                price_impact = 1 - (rate / spot if zero_for_one else rate * spot)
+            else:
+                price_impact = 0.0 if amount_in == 0 else 1.0
+            quotes.append({
+                "amount_in": amount_in,
+                "amount_out": amount_out,
+                "sqrt_price_x96": sqrt_price,
+                "tick": tick,
+                "price_impact": price_impact,
+                "complete": complete
+            })
+        metrics.incr("v3_sim.quotes", value=len(quotes))
+        return quotes
+
+    def quote(self, zero_for_one, amount_in):
+        """Single-amount form of quote_many"""
+        return self.quote_many(zero_for_one, [amount_in])[0]
+
+
+def load_pool_state(web3, pool_address, words=None, block_identifier=None):
+    """
+    Read everything the simulator needs from a pool in three batched requests
+
+    Parameters:
+    - web3: Web3 instance
+    - pool_address: Pool contract address
+    - words: Bitmap words to load on each side of the current one (default V3_SIM_WORDS);
+      each word covers 256 * tickSpacing ticks
+    - block_identifier: Block to read (default: the latest, pinned so all reads agree)
+
+    Returns:
+    - PoolState
+    """
+    words = config.V3_SIM_WORDS if words is None else words
+    pool = web3.eth.contract(address=web3.to_checksum_address(pool_address), abi=config.POOL_ABI)
+    block = web3.eth.block_number if block_identifier is None else block_identifier
+
+    def call(fn_name, args=()):
+        return {"to": pool.address, "data": encode_call(pool, fn_name, list(args))}
+
+    header = batch_eth_call(web3, [
+        call("slot0"), call("liquidity"), call("fee"), call("tickSpacing"), call("token0"), call("token1")
+    ], block)
+    if any(result is None or len(result) < 32 for result in header):
+        raise ValueError(f"Could not read pool {pool_address}")
+    slot0, liquidity, fee, spacing, token0, token1 = header
+    sqrt_price_x96 = int.from_bytes(_word(slot0, 0), "big")
+    tick = _signed(_word(slot0, 1))
+    tick_spacing = _signed(_word(spacing, 0))
+
+    center = (tick // tick_spacing) >> 8
+    positions = list(range(center - words, center + words + 1))
+    bitmap = {}
+    for position, result in zip(positions, batch_eth_call(web3, [call("tickBitmap", [p]) for p in positions], block)):
+        if result is None or len(result) < 32:
+            raise ValueError(f"Could not read tick bitmap word {position} of pool {pool_address}")
+        bitmap[position] = int.from_bytes(result[:32], "big")
+
+    initialized = []
+    for position, word in bitmap.items():
+        while word:
+            bit = (word & -word).bit_length() - 1
+            initialized.append(((position << 8) + bit) * tick_spacing)
+            word &= word - 1
+
+    liquidity_net = {}
+    for tick_index, result in zip(initialized, batch_eth_call(web3, [call("ticks", [t]) for t in initialized], block)):
+        if result is None or len(result) < 64:
+            raise ValueError(f"Could not read tick {tick_index} of pool {pool_address}")
+        liquidity_net[tick_index] = _signed(_word(result, 1))
+
+    metrics.incr("v3_sim.snapshots")
+    return PoolState(
+        pool.address,
+        int.from_bytes(_word(fee, 0), "big"),
+        tick_spacing,
+        sqrt_price_x96,
+        tick,
+        int.from_bytes(_word(liquidity, 0), "big"),
+        bitmap,
+        liquidity_net,
+        token0="0x" + _word(token0, 0)[12:].hex(),
+        token1="0x" + _word(token1, 0)[12:].hex(),
+        block=block
+    )
+
+
+class LocalQuoter:
+    """
+    Quotes direct swaps from pool snapshots instead of quoter eth_calls
+
+    Each pool is read once per block (three batched requests) and reused for every amount
+    quoted until the next head arrives.
+    """
+    def __init__(self, web3, pools):
+        self.web3 = web3
+        self.pools = pools  # (token_a, token_b, fee) -> pool address, e.g. RouteFinder.pools
+        self.heads = head_watcher_for(web3)
+        self._states = {}
+        self._lock = threading.Lock()
+
+    def pool_state(self, pool_address):
+        """Snapshot of a pool at the latest block, loaded on first use in that block"""
+        block = self.heads.block_number
+        if block is None or not self.heads.ws_connected:
+            block = self.heads.poll()
+        with self._lock:
+            state = self._states.get(pool_address)
+            if state is not None and state.block == block:
+                return state
+        state = load_pool_state(self.web3, pool_address, block_identifier=block)
+        with self._lock:
+            self._states[pool_address] = state
+        return state
+
+    def quote_many(self, token_in, token_out, amounts_in):
+        """
+        Best direct-pool quote for each amount
+
+        Returns:
+        - List of quote dicts (see PoolState.quote_many) with the pool 'fee' added, None for
+          amounts no loaded pool can fill completely
+        """
+        token_in, token_out = token_in.lower(), token_out.lower()
+        best = [None] * len(amounts_in)
+        for (token_a, token_b, fee), pool_address in self.pools.items():
+            if {token_a, token_b} != {token_in, token_out}:
+                continue
+            try:
+                state = self.pool_state(pool_address)
+            except Exception as e:
+                log_error(f"Could not load pool {pool_address} for local quotes: {str(e)}")
+                continue
+            zero_for_one = token_in == state.token0.lower()
+            for index, (amount, quote) in enumerate(zip(amounts_in, state.quote_many(zero_for_one, amounts_in))):
+                if not quote["complete"] or quote["amount_in"] != amount:
+                    continue
+                if best[index] is None or quote["amount_out"] > best[index]["amount_out"]:
+                    quote["fee"] = fee
+                    best[index] = quote
+        return best
@@ -0,0 +1,198 @@
+from datetime import datetime
+import config
+from metrics import metrics
+from rpc_batch import batch_eth_call, encode_call
+from v3_sim import Q96, get_sqrt_ratio_at_tick
+
+try:
+    import numpy as np  # optional: values all positions of a pool in one pass of array operations
+except ImportError:
+    np = None
+
+Q128 = 1 << 128
+
+# Fee growth counters are uint256 and meant to wrap around
+UINT256_MOD = 1 << 256
+
+ZERO_ADDRESS = "0x0000000000000000000000000000000000000000"
+
+
+def log_error(message):
+    timestamp = datetime.now().strftime("%H:%M:%S")
+    print(f"[{timestamp}] [ERROR] ❌ {message}")
+
+
+def _select(condition, if_true, if_false):
+    return if_true if condition else if_false
+
+
+def _position_math(select, pool, liquidity, tick_lower, tick_upper, sqrt_lower, sqrt_upper,
+                   outside_lower0, outside_lower1, outside_upper0, outside_upper1,
+                   inside_last0, inside_last1, owed0, owed1):
+    """
+    Amounts and owed fees of positions in one pool
+
+    Written once for both plain ints (select=_select) and NumPy object arrays (select=np.where);
+    every operation is exact integer math either way.
+    """
+    tick = pool["tick"]
+    # The price clamped to the range covers all three cases: only token0 below, only token1 above
+    price = select(tick < tick_lower, sqrt_lower, select(tick >= tick_upper, sqrt_upper, pool["sqrt_price_x96"]))
+    amount0 = (liquidity * Q96 * (sqrt_upper - price) // sqrt_upper) // price
+    amount1 = liquidity * (price - sqrt_lower) // Q96
+
+    fees = []
+    for fee_growth_global, outside_lower, outside_upper, inside_last, owed in (
+        (pool["fee_growth_global0_x128"], outside_lower0, outside_upper0, inside_last0, owed0),
+        (pool["fee_growth_global1_x128"], outside_lower1, outside_upper1, inside_last1, owed1),
+    ):
+        # Tick.getFeeGrowthInside, then Position.update
+        below = select(tick >= tick_lower, outside_lower, fee_growth_global - outside_lower)
+        above = select(tick < tick_upper, outside_upper, fee_growth_global - outside_upper)
+        inside = (fee_growth_global - below - above) % UINT256_MOD
+        fees.append(owed + (inside - inside_last) % UINT256_MOD * liquidity // Q128)
+    return amount0, amount1, fees[0], fees[1]
+
+
+def value_positions(positions, pool):
+    """
+    Underlying token amounts and owed fees of positions in one pool, without RPC calls
+
+    Parameters:
+    - positions: Position dicts as returned by get_liquidity_positions (all in the pool)
+    - pool: Dict with 'sqrt_price_x96', 'tick', 'fee_growth_global0_x128',
+      'fee_growth_global1_x128' and 'fee_growth_outside' (tick -> (outside0, outside1)
+      for every tick bound used by the positions), see load_pool_valuation_state
+
+    Returns:
+    - List of dicts with 'token_id', 'amount0', 'amount1' (what removing all liquidity would
+      return), 'fees0', 'fees1' (collectable fees, tokens owed included) and 'in_range'
+    """
+    if not positions:
+        return []
+
+    # Positions share a handful of bounds, so each distinct tick is converted only once
+    bounds = {p["tick_lower"] for p in positions} | {p["tick_upper"] for p in positions}
+    sqrt_ratios = {tick: get_sqrt_ratio_at_tick(tick) for tick in bounds}
+    outside = pool["fee_growth_outside"]
+
+    rows = [
+        (
+            p["liquidity"], p["tick_lower"], p["tick_upper"], sqrt_ratios[p["tick_lower"]], sqrt_ratios[p["tick_upper"]],
+            outside[p["tick_lower"]][0], outside[p["tick_lower"]][1],
+            outside[p["tick_upper"]][0], outside[p["tick_upper"]][1],
+            p["fee_growth_inside0_last_X128"], p["fee_growth_inside1_last_X128"],
+            p["tokens_owed0"], p["tokens_owed1"]
+        )
+        for p in positions
+    ]
+    if np is not None:
+        # One pass over whole columns; object arrays keep Python's arbitrary-precision ints
+        columns = [np.array(column, dtype=object) for column in zip(*rows)]
+        results = zip(*[result.tolist() for result in _position_math(np.where, pool, *columns)])
+    else:
+        results = [_position_math(_select, pool, *row) for row in rows]
+
+    valuations = []
+    for position, (amount0, amount1, fees0, fees1) in zip(positions, results):
+        valuations.append({
+            "token_id": position["token_id"],
+            "amount0": int(amount0),
+            "amount1": int(amount1),
+            "fees0": int(fees0),
+            "fees1": int(fees1),
+            "in_range": position["tick_lower"] <= pool["tick"] < position["tick_upper"]
+        })
+    metrics.incr("valuation.positions", value=len(valuations))
+    return valuations
+
+
+def load_pool_valuation_state(web3, pool_address, ticks, block_identifier="latest"):
+    """
+    Read the pool state value_positions needs in two batched requests
+
+    Parameters:
+    - web3: Web3 instance
+    - pool_address: Pool contract address
+    - ticks: Tick bounds used by the positions
+    - block_identifier: Block to read (use one number for all pools of a report)
+
+    Returns:
+    - Pool dict for value_positions
+    """
+    pool = web3.eth.contract(address=web3.to_checksum_address(pool_address), abi=config.POOL_ABI)
+
+    def call(fn_name, args=()):
+        return {"to": pool.address, "data": encode_call(pool, fn_name, list(args))}
+
+    slot0, global0, global1 = batch_eth_call(web3, [
+        call("slot0"), call("feeGrowthGlobal0X128"), call("feeGrowthGlobal1X128")
+    ], block_identifier)
+    if any(result is None or len(result) < 32 for result in (slot0, global0, global1)):
+        raise ValueError(f"Could not read pool {pool_address}")
+
+    ticks = sorted(set(ticks))
+    fee_growth_outside = {}
+    for tick, result in zip(ticks, batch_eth_call(web3, [call("ticks", [tick]) for tick in ticks], block_identifier)):
+        if result is None or len(result) < 128:
+            raise ValueError(f"Could not read tick {tick} of pool {pool_address}")
+        fee_growth_outside[tick] = (int.from_bytes(result[64:96], "big"), int.from_bytes(result[96:128], "big"))
+
+    tick = int.from_bytes(slot0[32:64], "big")
+    return {
+        "address": pool.address,
+        "sqrt_price_x96": int.from_bytes(slot0[:32], "big"),
+        "tick": tick - UINT256_MOD if tick >= 1 << 255 else tick,
+        "fee_growth_global0_x128": int.from_bytes(global0[:32], "big"),
+        "fee_growth_global1_x128": int.from_bytes(global1[:32], "big"),
+        "fee_growth_outside": fee_growth_outside
+    }
+
+
+def value_wallet_positions(web3, positions):
+    """
+    Value every position of a wallet: one pool lookup batch, then two batches per pool
+
+    Parameters:
+    - web3: Web3 instance
+    - positions: Position dicts as returned by get_liquidity_positions
+
+    Returns:
+    - Valuation dicts (see value_positions) in the order of positions, each with its
+      'token0', 'token1' and 'fee'; positions whose pool could not be read are left out
+    """
+    by_pool = {}
+    for position in positions:
+        key = (position["token0"], position["token1"], position["fee"])
+        by_pool.setdefault(key, []).append(position)
+    if not by_pool:
+        return []
+
+    factory = web3.eth.contract(address=web3.to_checksum_address(config.FACTORY), abi=config.FACTORY_ABI)
+    keys = list(by_pool)
+    block = web3.eth.block_number
+    lookups = batch_eth_call(web3, [
+        {"to": factory.address, "data": encode_call(factory, "getPool", [
+            web3.to_checksum_address(token0), web3.to_checksum_address(token1), fee
+        ])}
+        for token0, token1, fee in keys
+    ], block)
+
+    valued = {}
+    for key, result in zip(keys, lookups):
+        pool_address = "0x" + result[12:32].hex() if result and len(result) >= 32 else ZERO_ADDRESS
+        if pool_address == ZERO_ADDRESS:
+            log_error(f"No pool found for {key[0]}/{key[1]} ({key[2]})")
+            continue
+        pool_positions = by_pool[key]
+        ticks = [p["tick_lower"] for p in pool_positions] + [p["tick_upper"] for p in pool_positions]
+        try:
+            pool = load_pool_valuation_state(web3, pool_address, ticks, block)
+        except Exception as e:
+            log_error(f"Could not value positions in pool {pool_address}: {str(e)}")
+            continue
+        for position, valuation in zip(pool_positions, value_positions(pool_positions, pool)):
+            valuation.update({"token0": key[0], "token1": key[1], "fee": key[2]})
+            valued[id(position)] = valuation
+
+    return [valued[id(position)] for position in positions if id(position) in valued]
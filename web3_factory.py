@@ -0,0 +1,159 @@
+import json
+import threading
+import time
+import weakref
+from datetime import datetime
+from web3 import Web3
+from web3.providers import JSONBaseProvider
+import config
+from rpc_pool import PooledHTTPProvider
+
+try:
+    from web3.middleware import AttributeDictMiddleware as attrdict_middleware  # web3 >= 7
+except ImportError:
+    from web3.middleware import attrdict_middleware  # web3 6
+
+# The only middleware the bots rely on: results as AttributeDicts (receipt.status, block.number...).
+# The rest of web3's default stack is dropped: ENS name resolution, the gas price strategy and gas
+# estimate buffering only act on names and eth_sendTransaction (transactions here are signed locally
+# and sent raw), and validation asks the node for eth_chainId before every eth_call and estimate.
+LEAN_MIDDLEWARE = ((attrdict_middleware, "attrdict"),)
+
+
+def log_info(message):
+    timestamp = datetime.now().strftime("%H:%M:%S")
+    print(f"[{timestamp}] [INFO] ℹ️  {message}")
+
+
+def lean_web3(provider=None):
+    """Web3 over provider (default: the RPC pool) with only LEAN_MIDDLEWARE; makes no requests"""
+    web3 = Web3(provider if provider is not None else PooledHTTPProvider())
+    web3.middleware_onion.clear()
+    for middleware, name in LEAN_MIDDLEWARE:
+        web3.middleware_onion.add(middleware, name)
+    return web3
+
+
+_chain_ids = weakref.WeakKeyDictionary()
+_chain_ids_lock = threading.Lock()
+
+
+def chain_id_for(web3, expected=None):
+    """
+    Chain id of the node behind web3, read once per Web3 instance
+
+    Parameters:
+    - web3: Web3 instance
+    - expected: Chain id the node must serve (default: config.CHAIN_ID)
+
+    Raises:
+    - ValueError when the node serves another chain
+    """
+    expected = expected or config.CHAIN_ID
+    with _chain_ids_lock:
+        chain_id = _chain_ids.get(web3)
+    if chain_id is None:
+        chain_id = web3.eth.chain_id
+        if chain_id != expected:
+            raise ValueError(f"RPC node serves chain {chain_id}, expected {expected}")
+        with _chain_ids_lock:
+            _chain_ids[web3] = chain_id
+    return chain_id
+
+
+_shared = {}
+_shared_lock = threading.Lock()
+
+
+def connect(endpoints=None, request_kwargs=None):
+    """
+    Lean Web3 over the RPC pool, checked against CHAIN_ID
+
+    Instances are shared: every module asking for the same endpoints and request settings
+    gets the same Web3, provider and chain id check.
+
+    Parameters:
+    - endpoints: RPC endpoints (default: config.RPC_ENDPOINTS)
+    - request_kwargs: requests options for the endpoints (proxies, timeout)
+
+    Returns:
+    - Web3 instance
+
+    Raises:
+    - ValueError when the node serves another chain, otherwise the RPC error of the check
+    """
+    endpoints = list(endpoints or config.RPC_ENDPOINTS)
+    key = (tuple(endpoints), json.dumps(request_kwargs or {}, sort_keys=True, default=str))
+    with _shared_lock:
+        web3 = _shared.get(key)
+    if web3 is not None:
+        return web3
+
+    web3 = lean_web3(PooledHTTPProvider(endpoints, request_kwargs=request_kwargs))
+    chain_id_for(web3)
+    with _shared_lock:
+        return _shared.setdefault(key, web3)
+
+
+class _StubProvider(JSONBaseProvider):
+    """Answers every request locally and counts them, so only web3's own overhead is timed"""
+    RESULTS = {
+        "eth_chainId": hex(config.CHAIN_ID),
+        "eth_blockNumber": "0x1",
+        "eth_call": "0x" + "00" * 32,
+        "eth_getBalance": "0x0",
+        "eth_estimateGas": "0x5208",
+        "eth_gasPrice": "0x3b9aca00",
+    }
+
+    def __init__(self):
+        super().__init__()
+        self.requests = 0
+
+    def make_request(self, method, params):
+        self.requests += 1
+        return {"jsonrpc": "2.0", "id": 0, "result": self.RESULTS.get(method, "0x0")}
+
+
+def benchmark(iterations=2000):
+    """
+    Per-call cost of web3's default middleware against the lean stack, with a local stub node
+
+    Returns:
+    - Dict of call name -> {'default'|'lean' -> (microseconds per call, RPC requests per call)}
+    """
+    address = Web3.to_checksum_address(config.SWAP_ROUTER_ADDRESS)
+    calls = {
+        "eth_call": lambda web3: web3.eth.call({"to": address, "data": "0x70a08231" + "00" * 32}),
+        "get_balance": lambda web3: web3.eth.get_balance(address),
+        "estimate_gas": lambda web3: web3.eth.estimate_gas({"from": address, "to": address, "value": 0}),
+    }
+    stacks = {"default": lambda: Web3(_StubProvider()), "lean": lambda: lean_web3(_StubProvider())}
+
+    results = {}
+    for name, call in calls.items():
+        results[name] = {}
+        for stack, build in stacks.items():
+            web3 = build()
+            call(web3)  # warm up web3's per-method caches
+            web3.provider.requests = 0
+            start = time.perf_counter()
+            for _ in range(iterations):
+                call(web3)
+            elapsed = time.perf_counter() - start
+            results[name][stack] = (elapsed / iterations * 1e6, web3.provider.requests / iterations)
+    return results
+
+
+def main():
+    log_info("Timing web3 call overhead against a local stub node (no network)")
+    print(f"{'call':<14}{'default µs':>12}{'lean µs':>10}{'saved':>8}{'default RPCs':>15}{'lean RPCs':>11}")
+    for name, stacks in benchmark().items():
+        default_us, default_rpcs = stacks["default"]
+        lean_us, lean_rpcs = stacks["lean"]
+        saved = 1 - lean_us / default_us if default_us else 0
+        print(f"{name:<14}{default_us:>12.1f}{lean_us:>10.1f}{saved:>8.0%}{default_rpcs:>15.1f}{lean_rpcs:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()